@@ -0,0 +1,148 @@
+# aggregation.py
+#
+# 数据库行的服务端聚合 (count / sum / avg / min / max / distinct，可按属性分组)。
+# 行按页流式传入，逐行折叠进每个分组的累加器，内存只与分组数有关，与行数无关。
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from notionProperties import is_empty, property_value
+
+AGGREGATE_FUNCTIONS = ("count", "sum", "avg", "min", "max", "distinct")
+
+GroupKey = Tuple[Any, ...]
+
+
+class _Fold:
+    """一个聚合函数在一个分组上的累加状态"""
+
+    __slots__ = ("function", "count", "total", "minimum", "maximum", "distinct")
+
+    def __init__(self, function: str):
+        self.function = function
+        self.count = 0
+        self.total = 0.0
+        self.minimum: Any = None
+        self.maximum: Any = None
+        self.distinct: Optional[Set[Any]] = set() if function == "distinct" else None
+
+    def add(self, value: Any) -> None:
+        if is_empty(value):
+            return
+        if self.function in ("sum", "avg"):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return
+            self.total += value
+        elif self.function in ("min", "max"):
+            try:
+                if self.minimum is None or value < self.minimum:
+                    self.minimum = value
+                if self.maximum is None or value > self.maximum:
+                    self.maximum = value
+            except TypeError:
+                # 同一属性混合了不可比较的类型 (例如 formula)，跳过
+                return
+        elif self.distinct is not None:
+            for item in value if isinstance(value, (list, tuple)) else [value]:
+                self.distinct.add(item)
+        self.count += 1
+
+    def result(self) -> Any:
+        if self.function == "count":
+            return self.count
+        if self.function == "sum":
+            return _number(self.total)
+        if self.function == "avg":
+            return _number(self.total / self.count) if self.count else None
+        if self.function == "min":
+            return self.minimum
+        if self.function == "max":
+            return self.maximum
+        return len(self.distinct or ())
+
+
+def _sort_value(value: Any) -> Tuple[bool, int, Any]:
+    # 分组键排序：数字按大小，其余按字符串，空值在最后
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (False, 0, value)
+    return (value is None, 1, "" if value is None else str(value))
+
+
+def _number(value: float) -> Any:
+    return int(value) if value.is_integer() else round(value, 6)
+
+
+class Aggregator:
+    def __init__(
+        self,
+        group_by: Optional[List[str]] = None,
+        aggregates: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.group_by = list(group_by or [])
+        self.aggregates = list(aggregates or [{"function": "count"}])
+        for aggregate in self.aggregates:
+            function = aggregate.get("function")
+            if function not in AGGREGATE_FUNCTIONS:
+                raise ValueError(
+                    f"Unknown aggregate function: {function}. "
+                    f"Expected one of {', '.join(AGGREGATE_FUNCTIONS)}"
+                )
+            if function != "count" and not aggregate.get("property"):
+                raise ValueError(f"Aggregate '{function}' requires a property")
+        self.groups: Dict[GroupKey, List[_Fold]] = {}
+        self.row_count = 0
+
+    def add(self, row: Dict[str, Any]) -> None:
+        properties = row.get("properties") or {}
+        values = [
+            (
+                property_value(properties.get(aggregate["property"]))
+                if aggregate.get("property")
+                else True
+            )
+            for aggregate in self.aggregates
+        ]
+        for key in self._group_keys(properties):
+            folds = self.groups.get(key)
+            if folds is None:
+                folds = [_Fold(aggregate["function"]) for aggregate in self.aggregates]
+                self.groups[key] = folds
+            for fold, value in zip(folds, values):
+                fold.add(value)
+        self.row_count += 1
+
+    def _group_keys(self, properties: Dict[str, Any]) -> List[GroupKey]:
+        """一行所属的分组；多值属性 (multi_select、people 等) 的每个值各算一组"""
+        keys: List[GroupKey] = [()]
+        for name in self.group_by:
+            value = property_value(properties.get(name))
+            if isinstance(value, (list, tuple)):
+                choices = list(value) or [None]
+            else:
+                choices = [None if is_empty(value) else value]
+            keys = [key + (choice,) for key in keys for choice in choices]
+        return keys
+
+    def columns(self) -> List[str]:
+        labels = [
+            (
+                f"{aggregate['function']}({aggregate['property']})"
+                if aggregate.get("property")
+                else aggregate["function"]
+            )
+            for aggregate in self.aggregates
+        ]
+        return self.group_by + labels
+
+    def result(self) -> Dict[str, Any]:
+        ordered = sorted(
+            self.groups.items(),
+            key=lambda item: [_sort_value(value) for value in item[0]],
+        )
+        return {
+            "object": "aggregation",
+            "columns": self.columns(),
+            "rows": [
+                list(key) + [fold.result() for fold in folds] for key, folds in ordered
+            ],
+            "row_count": self.row_count,
+        }
@@ -0,0 +1,218 @@
+# batchWriter.py
+#
+# 批量写入：一次工具调用提交多条写操作，在限速额度内并发执行，逐条返回结果。
+# 单条失败不影响其他条目；带幂等键的条目成功后记录结果，整批重试时不会重复创建。
+# 幂等键按写入目标 (例如数据库 ID) 划分作用域，并记录条目内容的指纹：
+# 同一个键携带不同内容时拒绝执行，而不是把之前的结果当作这次写入的结果返回。
+# 可选的持久化存储 (见 sqliteIdempotency.py) 让多个 worker 共享幂等键，重启后仍然有效。
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+DEFAULT_CONCURRENCY = 8
+
+# 其他 worker 正在执行同一个键时，轮询其结果的间隔 (秒)
+_POLL_INTERVAL = 0.1
+
+Write = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class IdempotencyConflict(ValueError):
+    """幂等键已被内容不同的写入使用"""
+
+
+def fingerprint(item: Dict[str, Any]) -> str:
+    """条目内容 (不含幂等键) 的指纹，与字段顺序无关"""
+    payload = {name: value for name, value in item.items() if name != "idempotency_key"}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """幂等键 -> 成功写入的响应；同一个键正在执行时，后来者等待同一个结果"""
+
+    def __init__(
+        self,
+        ttl: float = 24 * 3600,
+        max_entries: int = 10000,
+        store: Optional[Any] = None,
+        lease: float = 300.0,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.store = store
+        # 持久化存储中认领的租约：认领者在租约内没有写回结果 (例如进程崩溃)，键可以被重新认领
+        self.lease = lease
+        # 键 -> (写入时间, 内容指纹, 响应)
+        self._results: "OrderedDict[str, Tuple[float, str, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        self._inflight: Dict[str, Tuple[str, "asyncio.Future[Dict[str, Any]]"]] = {}
+        self.replayed = 0
+        self.conflicts = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """返回 (内容指纹, 响应)"""
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        stored_at, digest, response = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._results[key]
+            return None
+        return digest, response
+
+    def _store(self, key: str, digest: str, response: Dict[str, Any]) -> None:
+        self._results[key] = (time.monotonic(), digest, response)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def _check(self, key: str, digest: str, previous: str) -> None:
+        if digest != previous:
+            self.conflicts += 1
+            raise IdempotencyConflict(
+                f"Idempotency key {key!r} was already used with a different payload"
+            )
+
+    async def run(
+        self, key: str, fn: Callable[[], Awaitable[Dict[str, Any]]], digest: str = ""
+    ) -> Tuple[Dict[str, Any], bool]:
+        """返回 (响应, 是否为之前结果的重放)；失败不记录，可以重试
+
+        digest 是写入内容的指纹：与之前使用同一个键的内容不同时抛出 IdempotencyConflict。
+        """
+        stored = self.get(key)
+        if stored is not None:
+            self._check(key, digest, stored[0])
+            self.replayed += 1
+            return stored[1], True
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._check(key, digest, inflight[0])
+            self.replayed += 1
+            response, _ = await asyncio.shield(inflight[1])
+            return response, True
+
+        future = asyncio.ensure_future(self._execute(key, fn, digest))
+        self._inflight[key] = (digest, future)
+        try:
+            response, replayed = await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key, (None, None))[1] is future:
+                del self._inflight[key]
+        self._store(key, digest, response)
+        if replayed:
+            self.replayed += 1
+        return response, replayed
+
+    async def _execute(
+        self, key: str, fn: Callable[[], Awaitable[Dict[str, Any]]], digest: str
+    ) -> Tuple[Dict[str, Any], bool]:
+        if self.store is None:
+            return await fn(), False
+        # 先在持久化存储中认领键：其他 worker (或重启前的本进程) 可能已经写入过
+        while True:
+            state, previous, response = await asyncio.to_thread(
+                self.store.claim, key, digest, self.lease
+            )
+            if state == "claimed":
+                break
+            self._check(key, digest, previous)
+            if state == "done" and response is not None:
+                return response, True
+            await asyncio.sleep(_POLL_INTERVAL)
+        try:
+            response = await fn()
+        except BaseException:
+            await asyncio.to_thread(self.store.release, key)
+            raise
+        await asyncio.to_thread(self.store.complete, key, digest, response)
+        return response, False
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "keys": len(self._results),
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+        }
+        if self.store is not None:
+            stats["store"] = self.store.stats()
+        return stats
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+
+
+def describe_error(error: Exception) -> Dict[str, Any]:
+    """把异常转换为可返回给调用方的错误描述"""
+    if isinstance(error, IdempotencyConflict):
+        return {"code": "idempotency_conflict", "message": str(error)}
+    if isinstance(error, httpx.HTTPStatusError):
+        response = error.response
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        return {
+            "status": response.status_code,
+            "code": body.get("code"),
+            "message": body.get("message") or response.text[:500],
+        }
+    return {"message": str(error) or type(error).__name__}
+
+
+async def run_batch(
+    items: List[Dict[str, Any]],
+    write: Write,
+    idempotency: IdempotencyStore,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    scope: str = "",
+) -> Dict[str, Any]:
+    """并发执行 items 中的每一条写操作，按原顺序返回逐条结果
+
+    scope 是幂等键的作用域 (例如目标数据库)：不同作用域中相同的键互不影响。
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_item(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        key = item.get("idempotency_key")
+        async with semaphore:
+            try:
+                if key:
+                    response, replayed = await idempotency.run(
+                        f"{scope}:{key}", lambda: write(item), fingerprint(item)
+                    )
+                else:
+                    response, replayed = await write(item), False
+            except Exception as e:
+                return {"index": index, "status": "error", "error": describe_error(e)}
+        result: Dict[str, Any] = {
+            "index": index,
+            "status": "ok",
+            "id": response.get("id"),
+        }
+        if response.get("url"):
+            result["url"] = response["url"]
+        if key:
+            result["idempotency_key"] = key
+            result["replayed"] = replayed
+        return result
+
+    results = await asyncio.gather(
+        *(run_item(index, item) for index, item in enumerate(items))
+    )
+    failed = sum(1 for result in results if result["status"] == "error")
+    return {
+        "object": "batch_result",
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results,
+    }
@@ -0,0 +1,584 @@
+# fakeNotion.py
+#
+# 本地的 Notion API 替身，用于基准测试 (不需要真实 token，也不访问线上 API)。
+# 按固定随机种子生成示例工作区：一个大数据库、一棵深层块树、用户和评论；
+# 可以注入网络延迟、429 限速和 5xx 错误，分页行为与 Notion 一致 (page_size 最多 100)。
+#
+#   python benchmarks/fakeNotion.py --port 8765 --rows 5000 --latency 0.05 --rate-429 0.02
+
+import argparse
+import asyncio
+import random
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+MAX_PAGE_SIZE = 100
+TIMESTAMP = "2024-01-01T00:00:00.000Z"
+
+# 固定 ID，基准场景直接引用
+LARGE_DATABASE_ID = "db000000-0000-4000-8000-000000000001"
+DEEP_PAGE_ID = "pg000000-0000-4000-8000-000000000001"
+WRITE_PAGE_ID = "pg000000-0000-4000-8000-000000000002"
+
+_WORDS = (
+    "notion api block page database query cache latency token budget sync "
+    "index markdown render table column filter sort cursor stream batch "
+    "retry schedule request response worker session tenant metric"
+).split()
+_STATUSES = ("Not started", "In progress", "Blocked", "Done")
+_TAGS = ("backend", "frontend", "infra", "docs", "bug", "feature", "perf", "ops")
+
+
+class FakeNotionConfig:
+    def __init__(
+        self,
+        rows: int = 5000,
+        tree_depth: int = 4,
+        tree_fanout: int = 8,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_429: float = 0.0,
+        retry_after: float = 0.1,
+        rate_500: float = 0.0,
+        seed: int = 42,
+    ):
+        self.rows = rows
+        self.tree_depth = tree_depth
+        self.tree_fanout = tree_fanout
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rate_500 = rate_500
+        self.seed = seed
+
+
+def _rich_text(text: str, bold: bool = False, code: bool = False) -> Dict[str, Any]:
+    return {
+        "type": "text",
+        "text": {"content": text, "link": None},
+        "annotations": {
+            "bold": bold,
+            "italic": False,
+            "strikethrough": False,
+            "underline": False,
+            "code": code,
+            "color": "default",
+        },
+        "plain_text": text,
+        "href": None,
+    }
+
+
+def _user(index: int) -> Dict[str, Any]:
+    return {
+        "object": "user",
+        "id": str(uuid.UUID(int=0x5000 + index)),
+        "type": "person",
+        "name": f"User {index}",
+        "avatar_url": None,
+        "person": {"email": f"user{index}@example.com"},
+    }
+
+
+class Workspace:
+    """按种子确定性生成的工作区数据；块树按 ID 惰性生成，不占用内存"""
+
+    def __init__(self, config: FakeNotionConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.users = [_user(i) for i in range(20)]
+        self.rows = [self._row(i) for i in range(config.rows)]
+        self.rows_by_id = {row["id"]: row for row in self.rows}
+        self.database = self._database()
+
+    def _sentence(self, rng: random.Random, words: int) -> str:
+        return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize()
+
+    def _row(self, index: int) -> Dict[str, Any]:
+        rng = self.random
+        owner = self.users[index % len(self.users)]
+        tags = rng.sample(_TAGS, rng.randint(0, 3))
+        return {
+            "object": "page",
+            "id": str(uuid.UUID(int=0x10000 + index)),
+            "created_time": TIMESTAMP,
+            "last_edited_time": f"2024-{1 + index % 12:02d}-{1 + index % 28:02d}T00:00:00.000Z",
+            "created_by": {"object": "user", "id": owner["id"]},
+            "last_edited_by": {"object": "user", "id": owner["id"]},
+            "cover": None,
+            "icon": None,
+            "parent": {"type": "database_id", "database_id": LARGE_DATABASE_ID},
+            "archived": False,
+            "in_trash": False,
+            "url": f"https://www.notion.so/row-{index}",
+            "public_url": None,
+            "properties": {
+                "Name": {
+                    "id": "title",
+                    "type": "title",
+                    "title": [_rich_text(f"Task {index}: {self._sentence(rng, 4)}")],
+                },
+                "Status": {
+                    "id": "st",
+                    "type": "select",
+                    "select": {
+                        "id": f"s{index % 4}",
+                        "name": _STATUSES[index % 4],
+                        "color": "blue",
+                    },
+                },
+                "Tags": {
+                    "id": "tg",
+                    "type": "multi_select",
+                    "multi_select": [
+                        {"id": f"t{_TAGS.index(tag)}", "name": tag, "color": "gray"}
+                        for tag in tags
+                    ],
+                },
+                "Points": {
+                    "id": "pt",
+                    "type": "number",
+                    "number": rng.choice((None, 1, 2, 3, 5, 8, 13)),
+                },
+                "Done": {"id": "dn", "type": "checkbox", "checkbox": index % 4 == 3},
+                "Due": {
+                    "id": "du",
+                    "type": "date",
+                    "date": {
+                        "start": f"2024-{1 + index % 12:02d}-{1 + index % 28:02d}",
+                        "end": None,
+                        "time_zone": None,
+                    },
+                },
+                "Owner": {
+                    "id": "ow",
+                    "type": "people",
+                    "people": [{"object": "user", "id": owner["id"]}],
+                },
+                "Notes": {
+                    "id": "nt",
+                    "type": "rich_text",
+                    "rich_text": [_rich_text(self._sentence(rng, 12))],
+                },
+            },
+        }
+
+    def _database(self) -> Dict[str, Any]:
+        return {
+            "object": "database",
+            "id": LARGE_DATABASE_ID,
+            "created_time": TIMESTAMP,
+            "last_edited_time": TIMESTAMP,
+            "title": [_rich_text("Tasks")],
+            "description": [],
+            "is_inline": False,
+            "parent": {"type": "page_id", "page_id": DEEP_PAGE_ID},
+            "url": "https://www.notion.so/tasks",
+            "properties": {
+                "Name": {"id": "title", "name": "Name", "type": "title", "title": {}},
+                "Status": {
+                    "id": "st",
+                    "name": "Status",
+                    "type": "select",
+                    "select": {
+                        "options": [
+                            {"id": f"s{i}", "name": name, "color": "blue"}
+                            for i, name in enumerate(_STATUSES)
+                        ]
+                    },
+                },
+                "Tags": {
+                    "id": "tg",
+                    "name": "Tags",
+                    "type": "multi_select",
+                    "multi_select": {
+                        "options": [
+                            {"id": f"t{i}", "name": name, "color": "gray"}
+                            for i, name in enumerate(_TAGS)
+                        ]
+                    },
+                },
+                "Points": {
+                    "id": "pt",
+                    "name": "Points",
+                    "type": "number",
+                    "number": {"format": "number"},
+                },
+                "Done": {
+                    "id": "dn",
+                    "name": "Done",
+                    "type": "checkbox",
+                    "checkbox": {},
+                },
+                "Due": {"id": "du", "name": "Due", "type": "date", "date": {}},
+                "Owner": {"id": "ow", "name": "Owner", "type": "people", "people": {}},
+                "Notes": {
+                    "id": "nt",
+                    "name": "Notes",
+                    "type": "rich_text",
+                    "rich_text": {},
+                },
+            },
+        }
+
+    # --- 块树：子块 ID 为 <父块 ID>.<序号>，深度由 ID 推出 ---
+
+    def depth(self, block_id: str) -> int:
+        return block_id.count(".")
+
+    def block(self, block_id: str) -> Dict[str, Any]:
+        depth = self.depth(block_id)
+        parent_id = block_id.rsplit(".", 1)[0] if depth else DEEP_PAGE_ID
+        rng = random.Random(f"{self.config.seed}:{block_id}")
+        expandable = depth < self.config.tree_depth and rng.random() < 0.4
+        if expandable:
+            block_type = "toggle"
+        else:
+            block_type = rng.choice(
+                (
+                    "paragraph",
+                    "paragraph",
+                    "heading_2",
+                    "bulleted_list_item",
+                    "to_do",
+                    "code",
+                )
+            )
+        data: Dict[str, Any] = {
+            "rich_text": [
+                _rich_text(self._sentence(rng, 6)),
+                _rich_text(rng.choice(_WORDS), bold=True),
+                _rich_text(" " + self._sentence(rng, 8)),
+            ],
+            "color": "default",
+        }
+        if block_type == "to_do":
+            data["checked"] = rng.random() < 0.5
+        elif block_type == "code":
+            data = {
+                "rich_text": [_rich_text(f"print({rng.randint(0, 999)})", code=True)],
+                "language": "python",
+                "caption": [],
+            }
+        return {
+            "object": "block",
+            "id": block_id,
+            "parent": (
+                {"type": "block_id", "block_id": parent_id}
+                if depth
+                else {"type": "page_id", "page_id": DEEP_PAGE_ID}
+            ),
+            "created_time": TIMESTAMP,
+            "last_edited_time": TIMESTAMP,
+            "has_children": expandable,
+            "archived": False,
+            "in_trash": False,
+            "type": block_type,
+            block_type: data,
+        }
+
+    def children(self, parent_id: str) -> List[Dict[str, Any]]:
+        if parent_id == DEEP_PAGE_ID:
+            prefix = "blk"
+        elif parent_id.startswith("blk") and self.block(parent_id)["has_children"]:
+            prefix = parent_id
+        else:
+            return []
+        return [
+            self.block(f"{prefix}.{index}")
+            for index in range(self.config.tree_fanout * (3 if prefix == "blk" else 1))
+        ]
+
+    def page(self, page_id: str) -> Dict[str, Any]:
+        row = self.rows_by_id.get(page_id)
+        if row is not None:
+            return row
+        return {
+            "object": "page",
+            "id": page_id,
+            "created_time": TIMESTAMP,
+            "last_edited_time": TIMESTAMP,
+            "parent": {"type": "workspace", "workspace": True},
+            "archived": False,
+            "url": f"https://www.notion.so/{page_id}",
+            "properties": {
+                "title": {"id": "title", "type": "title", "title": [_rich_text("Page")]}
+            },
+        }
+
+
+def _paginate(
+    items: List[Dict[str, Any]], start_cursor: Optional[str], page_size: Any
+) -> Dict[str, Any]:
+    start = int(start_cursor or 0)
+    size = min(int(page_size or MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+    page = items[start : start + size]
+    more = start + size < len(items)
+    return {
+        "object": "list",
+        "results": page,
+        "has_more": more,
+        "next_cursor": str(start + size) if more else None,
+    }
+
+
+def create_app(config: FakeNotionConfig) -> Starlette:
+    workspace = Workspace(config)
+    fault_random = random.Random(config.seed + 1)
+    stats: Dict[str, Any] = {"requests": 0, "rate_limited": 0, "errors": 0}
+    counter = [0]
+
+    async def respond(payload: Any, status: int = 200) -> JSONResponse:
+        stats["requests"] += 1
+        delay = config.latency
+        if config.jitter:
+            delay = max(0.0, fault_random.gauss(config.latency, config.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if config.rate_429 and fault_random.random() < config.rate_429:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                {"object": "error", "status": 429, "code": "rate_limited"},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)},
+            )
+        if config.rate_500 and fault_random.random() < config.rate_500:
+            stats["errors"] += 1
+            return JSONResponse(
+                {"object": "error", "status": 502, "code": "bad_gateway"},
+                status_code=502,
+            )
+        return JSONResponse(payload, status_code=status)
+
+    async def body_of(request: Request) -> Dict[str, Any]:
+        raw = await request.body()
+        return await request.json() if raw else {}
+
+    def new_id() -> str:
+        counter[0] += 1
+        return str(uuid.UUID(int=0x90000000 + counter[0]))
+
+    # --- Blocks ---
+
+    async def retrieve_block(request: Request) -> JSONResponse:
+        return await respond(workspace.block(request.path_params["id"]))
+
+    async def retrieve_children(request: Request) -> JSONResponse:
+        params = request.query_params
+        children = workspace.children(request.path_params["id"])
+        return await respond(
+            dict(
+                _paginate(
+                    children, params.get("start_cursor"), params.get("page_size")
+                ),
+                type="block",
+                block={},
+            )
+        )
+
+    async def append_children(request: Request) -> JSONResponse:
+        body = await body_of(request)
+        children = body.get("children") or []
+        if len(children) > MAX_PAGE_SIZE:
+            return await respond(
+                {"object": "error", "status": 400, "code": "validation_error"}, 400
+            )
+        results = [
+            dict(
+                {key: value for key, value in child.items() if key != "children"},
+                object="block",
+                id=new_id(),
+                has_children=False,
+            )
+            for child in children
+        ]
+        return await respond({"object": "list", "results": results})
+
+    async def update_block(request: Request) -> JSONResponse:
+        block = workspace.block(request.path_params["id"])
+        if request.method == "DELETE":
+            block["archived"] = True
+        return await respond(block)
+
+    # --- Pages ---
+
+    async def retrieve_page(request: Request) -> JSONResponse:
+        return await respond(workspace.page(request.path_params["id"]))
+
+    async def update_page(request: Request) -> JSONResponse:
+        body = await body_of(request)
+        page = dict(workspace.page(request.path_params["id"]))
+        page["properties"] = dict(page["properties"], **body.get("properties", {}))
+        return await respond(page)
+
+    async def create_page(request: Request) -> JSONResponse:
+        body = await body_of(request)
+        return await respond(
+            {
+                "object": "page",
+                "id": new_id(),
+                "created_time": TIMESTAMP,
+                "last_edited_time": TIMESTAMP,
+                "parent": body.get("parent"),
+                "properties": body.get("properties", {}),
+                "url": "https://www.notion.so/new",
+            }
+        )
+
+    # --- Databases ---
+
+    async def retrieve_database(request: Request) -> JSONResponse:
+        return await respond(workspace.database)
+
+    async def query_database(request: Request) -> JSONResponse:
+        body = await body_of(request)
+        rows = workspace.rows if request.path_params["id"] == LARGE_DATABASE_ID else []
+        return await respond(
+            dict(
+                _paginate(rows, body.get("start_cursor"), body.get("page_size")),
+                type="page_or_database",
+                page_or_database={},
+            )
+        )
+
+    async def search(request: Request) -> JSONResponse:
+        body = await body_of(request)
+        query = (body.get("query") or "").lower()
+        items = [workspace.database] + workspace.rows
+        if query:
+            items = [
+                item
+                for item in items
+                if query in str(item.get("properties", {}).get("Name", "")).lower()
+            ]
+        return await respond(
+            _paginate(items, body.get("start_cursor"), body.get("page_size"))
+        )
+
+    # --- Users / comments ---
+
+    async def list_users(request: Request) -> JSONResponse:
+        params = request.query_params
+        return await respond(
+            _paginate(
+                workspace.users, params.get("start_cursor"), params.get("page_size")
+            )
+        )
+
+    async def retrieve_user(request: Request) -> JSONResponse:
+        user_id = request.path_params["id"]
+        if user_id == "me":
+            return await respond(
+                {"object": "user", "id": new_id(), "type": "bot", "name": "Benchmark"}
+            )
+        user = next((u for u in workspace.users if u["id"] == user_id), None)
+        if user is None:
+            return await respond({"object": "error", "status": 404}, 404)
+        return await respond(user)
+
+    async def comments(request: Request) -> JSONResponse:
+        if request.method == "POST":
+            body = await body_of(request)
+            return await respond(
+                {
+                    "object": "comment",
+                    "id": new_id(),
+                    "discussion_id": body.get("discussion_id") or new_id(),
+                    "rich_text": body.get("rich_text", []),
+                    "created_time": TIMESTAMP,
+                    "created_by": {"object": "user", "id": workspace.users[0]["id"]},
+                }
+            )
+        params = request.query_params
+        block_id = params.get("block_id", "")
+        items = [
+            {
+                "object": "comment",
+                "id": str(uuid.UUID(int=0x70000 + index)),
+                "parent": {"type": "block_id", "block_id": block_id},
+                "discussion_id": str(uuid.UUID(int=0x80000 + index // 5)),
+                "created_time": TIMESTAMP,
+                "created_by": {
+                    "object": "user",
+                    "id": workspace.users[index % len(workspace.users)]["id"],
+                },
+                "rich_text": [_rich_text(f"Comment {index}")],
+            }
+            for index in range(30)
+        ]
+        return await respond(
+            _paginate(items, params.get("start_cursor"), params.get("page_size"))
+        )
+
+    async def handle_stats(request: Request) -> JSONResponse:
+        return JSONResponse(stats)
+
+    return Starlette(
+        routes=[
+            Route("/v1/blocks/{id}/children", retrieve_children, methods=["GET"]),
+            Route("/v1/blocks/{id}/children", append_children, methods=["PATCH"]),
+            Route("/v1/blocks/{id}", retrieve_block, methods=["GET"]),
+            Route("/v1/blocks/{id}", update_block, methods=["PATCH", "DELETE"]),
+            Route("/v1/pages", create_page, methods=["POST"]),
+            Route("/v1/pages/{id}", retrieve_page, methods=["GET"]),
+            Route("/v1/pages/{id}", update_page, methods=["PATCH"]),
+            Route("/v1/databases/{id}/query", query_database, methods=["POST"]),
+            Route("/v1/databases/{id}", retrieve_database, methods=["GET", "PATCH"]),
+            Route("/v1/search", search, methods=["POST"]),
+            Route("/v1/users", list_users, methods=["GET"]),
+            Route("/v1/users/{id}", retrieve_user, methods=["GET"]),
+            Route("/v1/comments", comments, methods=["GET", "POST"]),
+            Route("/_stats", handle_stats, methods=["GET"]),
+        ]
+    )
+
+
+def parse_args(
+    argv: Optional[List[str]] = None,
+) -> Tuple[argparse.Namespace, FakeNotionConfig]:
+    parser = argparse.ArgumentParser(description="Local Notion API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--rows", type=int, default=5000, help="rows in the large database"
+    )
+    parser.add_argument("--tree-depth", type=int, default=4)
+    parser.add_argument("--tree-fanout", type=int, default=8)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per response"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--rate-429", type=float, default=0.0, help="fraction of 429 responses"
+    )
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument(
+        "--rate-500", type=float, default=0.0, help="fraction of 502 responses"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    config = FakeNotionConfig(
+        rows=args.rows,
+        tree_depth=args.tree_depth,
+        tree_fanout=args.tree_fanout,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        rate_500=args.rate_500,
+        seed=args.seed,
+    )
+    return args, config
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    ARGS, CONFIG = parse_args()
+    uvicorn.run(create_app(CONFIG), host=ARGS.host, port=ARGS.port, log_level="warning")
@@ -0,0 +1,443 @@
+# runBenchmarks.py
+#
+# 基准测试：启动本地 Notion 替身 (fakeNotion.py) 和 MCP 服务器两个子进程，
+# 用多个并发 MCP 会话通过 /mcp 调用各个工具，统计每个场景的吞吐 (req/s)、
+# p50/p95/p99 延迟、响应大小以及服务器进程内存，结果写成 JSON。
+# 指定 --baseline 时与之前的结果比较，超出容差的场景视为回归 (退出码 1)。
+#
+#   python benchmarks/runBenchmarks.py --sessions 8 --duration 10 --output bench.json
+#   python benchmarks/runBenchmarks.py --latency 0.05 --rate-429 0.02 --baseline bench.json
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from fakeNotion import (  # noqa: E402
+    DEEP_PAGE_ID,
+    LARGE_DATABASE_ID,
+    WRITE_PAGE_ID,
+)
+
+Arguments = Dict[str, Any]
+
+_MARKDOWN_DOCUMENT = "\n".join(
+    f"## Section {i}\n\nSome **bold** text, `code` and a [link](https://example.com/{i}).\n\n"
+    f"- item one\n  - nested item\n- [ ] todo\n\n```python\nprint({i})\n```\n"
+    for i in range(40)
+)
+
+
+def _row_id(index: int) -> str:
+    import uuid
+
+    return str(uuid.UUID(int=0x10000 + index))
+
+
+# 场景名 -> (工具名, 参数生成函数 (会话序号, 第几次调用) -> 参数)
+SCENARIOS: Dict[str, Tuple[str, Callable[[int, int], Arguments]]] = {
+    "retrieve_page": (
+        "notion_retrieve_page",
+        lambda session, i: {"page_id": _row_id((session * 997 + i) % 1000)},
+    ),
+    "retrieve_block_children": (
+        "notion_retrieve_block_children",
+        lambda session, i: {"block_id": DEEP_PAGE_ID, "fetch_all": True},
+    ),
+    "retrieve_block_tree": (
+        "notion_retrieve_block_tree",
+        lambda session, i: {"block_id": DEEP_PAGE_ID, "max_blocks": 2000},
+    ),
+    "query_database_markdown": (
+        "notion_query_database",
+        lambda session, i: {"database_id": LARGE_DATABASE_ID, "max_items": 500},
+    ),
+    "query_database_json_all": (
+        "notion_query_database",
+        lambda session, i: {
+            "database_id": LARGE_DATABASE_ID,
+            "fetch_all": True,
+            "format": "json",
+            "compact": True,
+            "fields": ["id", "properties.Name", "properties.Status"],
+        },
+    ),
+    "aggregate_database": (
+        "notion_aggregate_database",
+        lambda session, i: {
+            "database_id": LARGE_DATABASE_ID,
+            "group_by": ["Status"],
+            "aggregates": [
+                {"function": "count"},
+                {"function": "sum", "property": "Points"},
+            ],
+        },
+    ),
+    "search": (
+        "notion_search",
+        lambda session, i: {"query": f"Task {i % 50}", "max_items": 100},
+    ),
+    "list_users": ("notion_list_all_users", lambda session, i: {"fetch_all": True}),
+    "append_markdown": (
+        "notion_append_markdown",
+        lambda session, i: {"block_id": WRITE_PAGE_ID, "markdown": _MARKDOWN_DOCUMENT},
+    ),
+    "batch_create_database_items": (
+        "notion_batch_create_database_items",
+        lambda session, i: {
+            "database_id": LARGE_DATABASE_ID,
+            "items": [
+                {
+                    "properties": {
+                        "Name": {"title": [{"text": {"content": f"Bench {i}-{k}"}}]}
+                    }
+                }
+                for k in range(20)
+            ],
+        },
+    ),
+}
+
+
+# --- 子进程 ---
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Server did not become ready: {url}")
+
+
+def _memory(pid: int) -> Dict[str, Optional[float]]:
+    """子进程的常驻内存与峰值 (MB)；只支持 Linux 的 /proc"""
+    values: Dict[str, Optional[float]] = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                key, _, value = line.partition(":")
+                if key == "VmRSS":
+                    values["rss_mb"] = round(int(value.split()[0]) / 1024, 1)
+                elif key == "VmHWM":
+                    values["peak_rss_mb"] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return values
+
+
+def serve_mcp(args: argparse.Namespace) -> None:
+    """子进程入口：以基准配置启动 MCP 服务器"""
+    import uvicorn
+    from mcp.types import Tool
+
+    import notionMcpServer
+    import schemas
+
+    # 每次调用的 INFO 日志会淹没基准输出，也会计入延迟
+    logging.getLogger().setLevel(logging.WARNING)
+
+    tools = {tool.name for tool in vars(schemas).values() if isinstance(tool, Tool)}
+    client_options = {
+        "base_url": args.notion_url,
+        "rate_limit": args.rate_limit,
+        "burst": args.rate_limit,
+        "cache_max_bytes": 0 if args.no_cache else 64 * 1024 * 1024,
+    }
+    app = asyncio.run(
+        notionMcpServer.create_mcp_app("benchmark", tools, True, client_options)
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# --- 负载 ---
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def _run_session(
+    url: str,
+    tool: str,
+    make_arguments: Callable[[int, int], Arguments],
+    session_index: int,
+    deadline: float,
+    max_requests: Optional[int],
+    samples: List[Tuple[float, int, bool]],
+) -> None:
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            iteration = 0
+            while time.monotonic() < deadline and (
+                max_requests is None or iteration < max_requests
+            ):
+                arguments = make_arguments(session_index, iteration)
+                started = time.perf_counter()
+                result = await session.call_tool(tool, arguments)
+                elapsed = time.perf_counter() - started
+                text = result.content[0].text if result.content else ""
+                failed = bool(result.isError) or text.startswith('{"error"')
+                samples.append((elapsed, len(text.encode("utf-8")), failed))
+                iteration += 1
+
+
+async def run_scenario(
+    url: str,
+    name: str,
+    sessions: int,
+    duration: float,
+    max_requests: Optional[int],
+    server_pid: int,
+) -> Dict[str, Any]:
+    tool, make_arguments = SCENARIOS[name]
+    before = _memory(server_pid)
+    samples: List[Tuple[float, int, bool]] = []
+    started = time.monotonic()
+    deadline = started + duration
+    await asyncio.gather(
+        *(
+            _run_session(
+                url, tool, make_arguments, index, deadline, max_requests, samples
+            )
+            for index in range(sessions)
+        )
+    )
+    elapsed = time.monotonic() - started
+    after = _memory(server_pid)
+
+    latencies = sorted(sample[0] for sample in samples)
+    count = len(samples)
+    peak_delta = (
+        round(after["peak_rss_mb"] - before["peak_rss_mb"], 1)
+        if after["peak_rss_mb"] is not None and before["peak_rss_mb"] is not None
+        else None
+    )
+    return {
+        "tool": tool,
+        "sessions": sessions,
+        "requests": count,
+        "errors": sum(1 for sample in samples if sample[2]),
+        "duration_s": round(elapsed, 3),
+        "rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / count * 1000, 2) if count else 0.0,
+            "p50": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        "response_bytes_mean": (
+            round(sum(sample[1] for sample in samples) / count) if count else 0
+        ),
+        "memory": dict(after, peak_rss_delta_mb=peak_delta),
+    }
+
+
+# --- 回归比较 ---
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """吞吐下降或 p95 延迟上升超过 tolerance 的场景"""
+    regressions = []
+    for name, current in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        if previous["rps"] and current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {previous['rps']} -> {current['rps']}")
+        p95, old_p95 = current["latency_ms"]["p95"], previous["latency_ms"]["p95"]
+        if old_p95 and p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{name}: p95 {old_p95}ms -> {p95}ms")
+        if current["errors"] > previous["errors"]:
+            regressions.append(
+                f"{name}: errors {previous['errors']} -> {current['errors']}"
+            )
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_table(results: Dict[str, Any]) -> None:
+    header = f"{'scenario':32} {'req':>6} {'err':>4} {'req/s':>8} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'bytes':>9} {'rssMB':>7}"
+    print(header, file=sys.stderr)
+    for name, result in results["results"].items():
+        latency = result["latency_ms"]
+        print(
+            f"{name:32} {result['requests']:>6} {result['errors']:>4} "
+            f"{result['rps']:>8} {latency['p50']:>8} {latency['p95']:>8} "
+            f"{latency['p99']:>8} {result['response_bytes_mean']:>9} "
+            f"{result['memory']['rss_mb'] or '-':>7}",
+            file=sys.stderr,
+        )
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    notion_port, mcp_port = _free_port(), _free_port()
+    fake_command = [
+        sys.executable,
+        os.path.join(BENCHMARK_DIR, "fakeNotion.py"),
+        "--port", str(notion_port),
+        "--rows", str(args.rows),
+        "--latency", str(args.latency),
+        "--jitter", str(args.jitter),
+        "--rate-429", str(args.rate_429),
+        "--rate-500", str(args.rate_500),
+        "--seed", str(args.seed),
+    ]  # fmt: skip
+    mcp_command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--serve-mcp",
+        "--port", str(mcp_port),
+        "--notion-url", f"http://127.0.0.1:{notion_port}/v1",
+        "--rate-limit", str(args.rate_limit),
+    ] + (["--no-cache"] if args.no_cache else [])  # fmt: skip
+
+    processes = [subprocess.Popen(fake_command), subprocess.Popen(mcp_command)]
+    try:
+        _wait_until_ready(f"http://127.0.0.1:{notion_port}/_stats")
+        _wait_until_ready(f"http://127.0.0.1:{mcp_port}/metrics")
+        url = f"http://127.0.0.1:{mcp_port}/mcp"
+        names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+
+        results: Dict[str, Any] = {}
+        for name in names:
+            print(f"running {name} ...", file=sys.stderr)
+            if args.warmup:
+                await run_scenario(url, name, 1, 60.0, 1, processes[1].pid)
+            results[name] = await run_scenario(
+                url,
+                name,
+                args.sessions,
+                args.duration,
+                args.requests,
+                processes[1].pid,
+            )
+        fake_stats = httpx.get(f"http://127.0.0.1:{notion_port}/_stats").json()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                key: value
+                for key, value in vars(args).items()
+                if key not in ("output", "baseline", "serve_mcp", "port", "notion_url")
+            },
+            "fake_notion": fake_stats,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the Notion MCP server")
+    parser.add_argument(
+        "--sessions", type=int, default=8, help="concurrent MCP sessions"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="seconds per scenario"
+    )
+    parser.add_argument("--requests", type=int, help="stop each session after N calls")
+    parser.add_argument(
+        "--scenarios", help=f"comma-separated subset of: {', '.join(SCENARIOS)}"
+    )
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="fake Notion latency (s)"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-500", type=float, default=0.0)
+    parser.add_argument(
+        "--rate-limit", type=float, default=1000.0, help="client rate limit (req/s)"
+    )
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--baseline", help="compare with a previous JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    # 内部使用：子进程模式
+    parser.add_argument("--serve-mcp", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--notion-url", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    ARGS = parse_args()
+    if ARGS.serve_mcp:
+        serve_mcp(ARGS)
+        sys.exit(0)
+
+    RESULTS = asyncio.run(run(ARGS))
+    _print_table(RESULTS)
+    OUTPUT = json.dumps(RESULTS, indent=2)
+    if ARGS.output:
+        with open(ARGS.output, "w") as f:
+            f.write(OUTPUT)
+    else:
+        print(OUTPUT)
+
+    if ARGS.baseline:
+        with open(ARGS.baseline) as f:
+            REGRESSIONS = compare(RESULTS, json.load(f), ARGS.tolerance)
+        for line in REGRESSIONS:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if REGRESSIONS else 0)
@@ -0,0 +1,247 @@
+# blockAppender.py
+#
+# 大量内容的分块追加。Notion 每次追加最多 100 个子块、两层嵌套、1000 个块、约 500KB，
+# 这里把任意长度、任意深度的块数组拆成合规的请求：
+# - 同一父块下的各个分块依次发送，用 after 指向上一分块最后一个块，保证顺序；
+# - 只把超出嵌套或大小限制的那几层子块去掉，等所在的块创建后再追加 (更深的内联块
+#   按位置列出子块取得 ID)，不同子树并行执行；column_list 的列、table 的行等创建时
+#   必需的子块总是内联；
+# - 某个分块失败时停止该父块的后续分块，返回可以继续追加的位置 (next_index / after)。
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from batchWriter import describe_error
+
+MAX_CHILDREN_PER_REQUEST = 100
+MAX_BLOCKS_PER_REQUEST = 1000
+MAX_PAYLOAD_BYTES = 450 * 1024  # 留出余量，Notion 的上限约 500KB
+MAX_NESTING = 2
+
+Append = Callable[[str, List[Dict[str, Any]], Optional[str]], Awaitable[Dict[str, Any]]]
+
+
+def _children(block: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """子块可以放在 block["children"] 或 block[<type>]["children"] 中"""
+    if block.get("children"):
+        return block["children"]
+    data = block.get(block.get("type", ""))
+    if isinstance(data, dict) and data.get("children"):
+        return data["children"]
+    return None
+
+
+def _without_children(block: Dict[str, Any]) -> Dict[str, Any]:
+    stripped = {key: value for key, value in block.items() if key != "children"}
+    block_type = block.get("type", "")
+    data = block.get(block_type)
+    if isinstance(data, dict) and "children" in data:
+        stripped[block_type] = {
+            key: value for key, value in data.items() if key != "children"
+        }
+    return stripped
+
+
+def _with_children(
+    block: Dict[str, Any], children: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    payload = _without_children(block)
+    if not children:
+        return payload
+    block_type = block.get("type", "")
+    if isinstance(payload.get(block_type), dict):
+        payload[block_type] = dict(payload[block_type], children=children)
+    else:
+        payload["children"] = children
+    return payload
+
+
+def _required_count(block: Dict[str, Any]) -> int:
+    """创建时必须一起发送的子块数：column_list 的所有列、column 与 table 的第一个子块"""
+    children = _children(block) or []
+    block_type = block.get("type")
+    if block_type == "column_list":
+        return len(children)
+    if block_type in ("column", "table"):
+        return min(1, len(children))
+    return 0
+
+
+def _required_depth(block: Dict[str, Any]) -> int:
+    """创建该块时必须内联的嵌套层数 (column_list -> column -> 第一个子块为 2)"""
+    count = _required_count(block)
+    if not count:
+        return 0
+    children = _children(block) or []
+    return 1 + max(_required_depth(child) for child in children[:count])
+
+
+class Deferred:
+    """块创建后还需完成的部分：追加到该块末尾的子块，以及内联子块 (按位置) 各自的待办"""
+
+    __slots__ = ("children", "nested")
+
+    def __init__(
+        self,
+        children: Optional[List[Dict[str, Any]]],
+        nested: List[Tuple[int, "Deferred"]],
+    ):
+        self.children = children
+        self.nested = nested
+
+
+def _trim(
+    block: Dict[str, Any], depth: int, limit: int, keep: int
+) -> Tuple[Dict[str, Any], Optional[Deferred]]:
+    """只保留不超过 limit 层嵌套、每层最多 keep 个 (必需的结构子块除外) 的子块，
+    其余的记入 Deferred。某个子块无法内联时，它和之后的兄弟块一起延后，保持顺序"""
+    children = _children(block)
+    if not children:
+        return block, None
+    count = 0
+    if depth < limit:
+        required = _required_count(block)
+        allowed = min(max(keep, required), MAX_CHILDREN_PER_REQUEST)
+        for index, child in enumerate(children[:allowed]):
+            if depth + 1 + _required_depth(child) > limit:
+                break
+            # 落在最深一层且自身有子块的块 (非必需时) 整体延后：之后在父块下作为第一层
+            # 追加，它的子块可以一起内联，不必为每个这样的块单独发一次请求
+            if index >= required and depth + 1 >= limit and _children(child):
+                break
+            count += 1
+    inline: List[Dict[str, Any]] = []
+    nested: List[Tuple[int, Deferred]] = []
+    for index, child in enumerate(children[:count]):
+        payload, deferred = _trim(child, depth + 1, limit, keep)
+        inline.append(payload)
+        if deferred is not None:
+            nested.append((index, deferred))
+    rest = children[count:]
+    if not rest and not nested:
+        return block, None
+    return _with_children(block, inline), Deferred(rest or None, nested)
+
+
+def _block_count(block: Dict[str, Any]) -> int:
+    return 1 + sum(_block_count(child) for child in _children(block) or [])
+
+
+def _payload_size(block: Dict[str, Any]) -> int:
+    return len(json.dumps(block, ensure_ascii=False).encode("utf-8"))
+
+
+PlannedBlock = Tuple[Dict[str, Any], Optional[Deferred]]
+
+
+def plan_chunks(blocks: List[Dict[str, Any]]) -> List[List[PlannedBlock]]:
+    """把块数组拆成若干请求。每项为 (要发送的块, 创建后还需完成的部分)"""
+    chunks: List[List[PlannedBlock]] = []
+    current: List[PlannedBlock] = []
+    current_blocks = current_bytes = 0
+    for block in blocks:
+        payload, deferred = _trim(block, 0, MAX_NESTING, MAX_CHILDREN_PER_REQUEST)
+        size, payload_bytes = _block_count(payload), _payload_size(payload)
+        if size > MAX_BLOCKS_PER_REQUEST or payload_bytes > MAX_PAYLOAD_BYTES:
+            # 子树过大：只内联创建时必需的结构，其余在创建后追加
+            payload, deferred = _trim(block, 0, _required_depth(block), 1)
+            size, payload_bytes = _block_count(payload), _payload_size(payload)
+        if current and (
+            len(current) >= MAX_CHILDREN_PER_REQUEST
+            or current_blocks + size > MAX_BLOCKS_PER_REQUEST
+            or current_bytes + payload_bytes > MAX_PAYLOAD_BYTES
+        ):
+            chunks.append(current)
+            current, current_blocks, current_bytes = [], 0, 0
+        current.append((payload, deferred))
+        current_blocks += size
+        current_bytes += payload_bytes
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+ListChildren = Callable[[str], Awaitable[List[Dict[str, Any]]]]
+
+
+class BlockAppender:
+    def __init__(self, append: Append, list_children: Optional[ListChildren] = None):
+        self.append = append
+        # 追加的响应只包含第一层块；要给更深的内联块追加子块时，按位置列出它们的 ID
+        self.list_children = list_children
+        self.requests = 0
+        self.failures: List[Dict[str, Any]] = []
+
+    async def run(
+        self,
+        parent_id: str,
+        blocks: List[Dict[str, Any]],
+        after: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """追加 blocks 到 parent_id 下，返回创建的第一层块"""
+        created: List[Dict[str, Any]] = []
+        subtrees: List["asyncio.Future[None]"] = []
+        try:
+            for chunk in plan_chunks(blocks):
+                try:
+                    self.requests += 1
+                    response = await self.append(
+                        parent_id, [payload for payload, _ in chunk], after
+                    )
+                except Exception as e:
+                    self.failures.append(
+                        {
+                            "parent_id": parent_id,
+                            "next_index": len(created),
+                            "after": after,
+                            "error": describe_error(e),
+                        }
+                    )
+                    break
+                results = response.get("results", [])
+                for block, (_, deferred) in zip(results, chunk):
+                    if deferred is not None:
+                        # 嵌套过深或过大的部分：父块已经存在，与后续分块并行完成
+                        subtrees.append(
+                            asyncio.ensure_future(self._complete(block["id"], deferred))
+                        )
+                created.extend(results)
+                if results:
+                    after = results[-1]["id"]
+        except BaseException:
+            for task in subtrees:
+                task.cancel()
+            raise
+        if subtrees:
+            await asyncio.gather(*subtrees)
+        return created
+
+    async def _complete(self, block_id: str, deferred: Deferred) -> None:
+        """在已创建的块下完成 Deferred：先定位内联子块，再并行追加各层剩余的子块"""
+        tasks: List[Awaitable[Any]] = []
+        if deferred.nested:
+            try:
+                if self.list_children is None:
+                    raise ValueError(
+                        "Cannot locate nested blocks without list_children"
+                    )
+                self.requests += 1
+                children = await self.list_children(block_id)
+            except Exception as e:
+                self.failures.append(
+                    {
+                        "parent_id": block_id,
+                        "next_index": 0,
+                        "after": None,
+                        "error": describe_error(e),
+                    }
+                )
+                children = []
+            for index, nested in deferred.nested:
+                if index < len(children):
+                    tasks.append(self._complete(children[index]["id"], nested))
+        if deferred.children:
+            tasks.append(self.run(block_id, deferred.children))
+        if tasks:
+            await asyncio.gather(*tasks)
@@ -0,0 +1,568 @@
+# columnarRows.py
+#
+# 数据库行的列式内存表示。原始 JSON 中每个属性值都包在 {"type": ..., "<type>": {...}} 里，
+# 每个富文本片段都带一份完整的 annotations，上万行时每个 worker 要占用数百 MB。
+# 这里每个属性一列：数字用 array('d')，复选框用 bytearray，选项/日期/文本用驻留字符串，
+# 选项对象、用户对象和 annotations 在列内共享。本地过滤和 Markdown 渲染直接读取列值，
+# 只有需要输出 JSON 的那一页才还原为原始结构。
+
+import copy
+import math
+import sys
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from markdownRenderer import property_to_text
+from notionProperties import property_value
+from projection import FieldTree, project_item
+
+_NULL = math.nan
+
+# 页面的顶层字段 (properties 之外)；稀疏存储的字段只记录非空值
+_META_FIELDS = ("id", "created_time", "last_edited_time", "url")
+_SPARSE_FIELDS = ("created_by", "last_edited_by", "icon", "cover", "public_url")
+
+_DEFAULT_ANNOTATIONS = {
+    "bold": False,
+    "italic": False,
+    "strikethrough": False,
+    "underline": False,
+    "code": False,
+    "color": "default",
+}
+
+# annotations 组合只有少数几种，全部行共享同一批对象
+_annotations: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+
+
+def _shared_annotations(annotations: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    annotations = annotations or _DEFAULT_ANNOTATIONS
+    key = tuple(sorted(annotations.items()))
+    return _annotations.setdefault(key, annotations)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+# --- 列 ---
+
+
+class _Column:
+    """一列属性值；子类决定存储方式。scalar() 的语义与 notionProperties.property_value 一致"""
+
+    __slots__ = ("name", "prop_id", "type")
+
+    def __init__(self, name: str, prop_id: Optional[str], prop_type: str):
+        self.name = name
+        self.prop_id = prop_id
+        self.type = prop_type
+
+    def _encode(self, value: Any) -> Any:
+        return value
+
+    def _decode(self, stored: Any) -> Any:
+        return stored
+
+    def append(self, prop: Optional[Dict[str, Any]]) -> None:
+        self.values.append(self._encode(prop.get(self.type) if prop else None))
+
+    def set(self, position: int, prop: Optional[Dict[str, Any]]) -> None:
+        self.values[position] = self._encode(prop.get(self.type) if prop else None)
+
+    def delete(self, position: int) -> None:
+        del self.values[position]
+
+    def scalar(self, position: int) -> Any:
+        return property_value(self.prop(position))
+
+    def text(self, position: int) -> str:
+        return property_to_text(self.prop(position))
+
+    def prop(self, position: int) -> Dict[str, Any]:
+        """还原为 API 格式的属性对象"""
+        return {
+            "id": self.prop_id,
+            "type": self.type,
+            self.type: self._decode(self.values[position]),
+        }
+
+
+class _RawColumn(_Column):
+    """不做压缩的类型 (relation、rollup、formula 等)：保存原始值"""
+
+    __slots__ = ("values",)
+
+    def __init__(self, name: str, prop_id: Optional[str], prop_type: str):
+        super().__init__(name, prop_id, prop_type)
+        self.values: List[Any] = []
+
+
+class _NumberColumn(_Column):
+    __slots__ = ("values",)
+
+    def __init__(self, name: str, prop_id: Optional[str], prop_type: str):
+        super().__init__(name, prop_id, prop_type)
+        self.values = array("d")
+
+    def _encode(self, value: Any) -> float:
+        return _NULL if value is None else float(value)
+
+    def _decode(self, stored: float) -> Any:
+        if math.isnan(stored):
+            return None
+        return int(stored) if stored.is_integer() else stored
+
+    def scalar(self, position: int) -> Any:
+        return self._decode(self.values[position])
+
+    def text(self, position: int) -> str:
+        value = self.scalar(position)
+        return "" if value is None else str(value)
+
+
+class _CheckboxColumn(_Column):
+    __slots__ = ("values",)
+
+    def __init__(self, name: str, prop_id: Optional[str], prop_type: str):
+        super().__init__(name, prop_id, prop_type)
+        self.values = bytearray()
+
+    def _encode(self, value: Any) -> int:
+        return 1 if value else 0
+
+    def _decode(self, stored: int) -> bool:
+        return bool(stored)
+
+    def scalar(self, position: int) -> bool:
+        return bool(self.values[position])
+
+    def text(self, position: int) -> str:
+        return "✓" if self.values[position] else "✗"
+
+
+class _StringColumn(_Column):
+    """url / email / phone_number / created_time / last_edited_time"""
+
+    __slots__ = ("values",)
+
+    def __init__(self, name: str, prop_id: Optional[str], prop_type: str):
+        super().__init__(name, prop_id, prop_type)
+        self.values: List[Optional[str]] = []
+
+    def _encode(self, value: Any) -> Optional[str]:
+        return _intern(value)
+
+    def scalar(self, position: int) -> Any:
+        value = self.values[position]
+        if self.type in ("created_time", "last_edited_time"):
+            return value
+        return value or ""
+
+    def text(self, position: int) -> str:
+        return self.values[position] or ""
+
+
+class _OptionColumn(_Column):
+    """select / status：每行只存选项名，选项对象在列内共享"""
+
+    __slots__ = ("values", "options")
+
+    def __init__(self, name: str, prop_id: Optional[str], prop_type: str):
+        super().__init__(name, prop_id, prop_type)
+        self.values: List[Optional[str]] = []
+        self.options: Dict[str, Dict[str, Any]] = {}
+
+    def _encode(self, value: Any) -> Optional[str]:
+        if not value:
+            return None
+        name = _intern(value.get("name"))
+        self.options.setdefault(name, value)
+        return name
+
+    def _decode(self, stored: Optional[str]) -> Any:
+        return self.options.get(stored) if stored is not None else None
+
+    def scalar(self, position: int) -> Optional[str]:
+        return self.values[position]
+
+    def text(self, position: int) -> str:
+        return self.values[position] or ""
+
+
+class _MultiOptionColumn(_OptionColumn):
+    """multi_select：每行存选项名元组"""
+
+    __slots__ = ()
+
+    def _encode(self, value: Any) -> Tuple[str, ...]:
+        names = []
+        for option in value or []:
+            name = _intern(option.get("name"))
+            self.options.setdefault(name, option)
+            names.append(name)
+        return tuple(names)
+
+    def _decode(self, stored: Tuple[str, ...]) -> Any:
+        return [self.options[name] for name in stored]
+
+    def scalar(self, position: int) -> Tuple[str, ...]:
+        return self.values[position]
+
+    def text(self, position: int) -> str:
+        return ", ".join(self.values[position])
+
+
+class _PeopleColumn(_Column):
+    """people：每行存用户 ID 元组，用户对象在列内共享"""
+
+    __slots__ = ("values", "users")
+
+    def __init__(self, name: str, prop_id: Optional[str], prop_type: str):
+        super().__init__(name, prop_id, prop_type)
+        self.values: List[Tuple[str, ...]] = []
+        self.users: Dict[str, Dict[str, Any]] = {}
+
+    def _encode(self, value: Any) -> Tuple[str, ...]:
+        ids = []
+        for user in value or []:
+            user_id = _intern(user.get("id"))
+            self.users.setdefault(user_id, user)
+            ids.append(user_id)
+        return tuple(ids)
+
+    def _decode(self, stored: Tuple[str, ...]) -> Any:
+        return [self.users[user_id] for user_id in stored]
+
+    def scalar(self, position: int) -> Tuple[str, ...]:
+        return self.values[position]
+
+
+class _DateColumn(_Column):
+    __slots__ = ("values",)
+
+    def __init__(self, name: str, prop_id: Optional[str], prop_type: str):
+        super().__init__(name, prop_id, prop_type)
+        self.values: List[Optional[Tuple[Any, ...]]] = []
+
+    def _encode(self, value: Any) -> Optional[Tuple[Any, ...]]:
+        if not value:
+            return None
+        return (
+            _intern(value.get("start")),
+            _intern(value.get("end")),
+            _intern(value.get("time_zone")),
+        )
+
+    def _decode(self, stored: Optional[Tuple[Any, ...]]) -> Any:
+        if stored is None:
+            return None
+        return {"start": stored[0], "end": stored[1], "time_zone": stored[2]}
+
+    def scalar(self, position: int) -> Optional[str]:
+        stored = self.values[position]
+        return stored[0] if stored else None
+
+    def text(self, position: int) -> str:
+        stored = self.values[position]
+        if not stored:
+            return ""
+        start, end = stored[0] or "", stored[1]
+        return f"{start} → {end}" if end else start
+
+
+class _RichTextColumn(_Column):
+    """title / rich_text：只有一段无格式纯文本时直接存字符串，否则存片段元组。
+    片段为 (文本, 链接, 共享 annotations)；mention / equation 等片段保留原始对象"""
+
+    __slots__ = ("values",)
+
+    def __init__(self, name: str, prop_id: Optional[str], prop_type: str):
+        super().__init__(name, prop_id, prop_type)
+        self.values: List[Any] = []
+
+    def _encode(self, value: Any) -> Any:
+        spans = []
+        for item in value or []:
+            if item.get("type") != "text":
+                spans.append(item)
+                continue
+            content = (item.get("text") or {}).get("content", "")
+            link = ((item.get("text") or {}).get("link") or {}).get("url")
+            spans.append((content, link, _shared_annotations(item.get("annotations"))))
+        if len(spans) == 1 and isinstance(spans[0], tuple):
+            content, link, annotations = spans[0]
+            if link is None and annotations is _shared_annotations(None):
+                return content
+        return tuple(spans)
+
+    def _decode(self, stored: Any) -> List[Dict[str, Any]]:
+        spans = (stored,) if isinstance(stored, str) else stored
+        items = []
+        for span in spans:
+            if isinstance(span, dict):
+                items.append(span)
+                continue
+            if isinstance(span, str):
+                span = (span, None, _shared_annotations(None))
+            content, link, annotations = span
+            items.append(
+                {
+                    "type": "text",
+                    "text": {
+                        "content": content,
+                        "link": {"url": link} if link else None,
+                    },
+                    "annotations": annotations,
+                    "plain_text": content,
+                    "href": link,
+                }
+            )
+        return items
+
+    def scalar(self, position: int) -> str:
+        stored = self.values[position]
+        if isinstance(stored, str):
+            return stored
+        return "".join(
+            span.get("plain_text", "") if isinstance(span, dict) else span[0]
+            for span in stored
+        )
+
+    def text(self, position: int) -> str:
+        return self.scalar(position)
+
+
+_COLUMN_TYPES = {
+    "number": _NumberColumn,
+    "checkbox": _CheckboxColumn,
+    "url": _StringColumn,
+    "email": _StringColumn,
+    "phone_number": _StringColumn,
+    "created_time": _StringColumn,
+    "last_edited_time": _StringColumn,
+    "select": _OptionColumn,
+    "status": _OptionColumn,
+    "multi_select": _MultiOptionColumn,
+    "people": _PeopleColumn,
+    "date": _DateColumn,
+    "title": _RichTextColumn,
+    "rich_text": _RichTextColumn,
+}
+
+
+class ColumnView(Sequence):
+    """一列的只读标量视图，按需计算，不复制整列"""
+
+    __slots__ = ("_column", "_length")
+
+    def __init__(self, column: Optional[_Column], length: int):
+        self._column = column
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, position: Any) -> Any:
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self._length))]
+        if not 0 <= position < self._length:
+            raise IndexError(position)
+        return self._column.scalar(position) if self._column is not None else None
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self[i] for i in range(self._length))
+
+
+class RowView:
+    """按位置访问一行，不复制数据"""
+
+    __slots__ = ("_table", "_position")
+
+    def __init__(self, table: "ColumnarRows", position: int):
+        self._table = table
+        self._position = position
+
+    @property
+    def id(self) -> str:
+        return self._table.meta["id"][self._position]
+
+    def __getitem__(self, name: str) -> Any:
+        return self._table.column(name)[self._position]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._table.row_dict(self._position)
+
+
+class ColumnarRows:
+    """数据库行的列式表：按行追加 API 返回的页面对象，按列读取"""
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, _Column] = {}
+        self.meta: Dict[str, List[Optional[str]]] = {
+            field: [] for field in _META_FIELDS
+        }
+        self.parents: List[Optional[str]] = []
+        # 稀疏字段：位置 -> 值，大部分行没有 icon / cover
+        self.sparse: Dict[str, Dict[int, Any]] = {field: {} for field in _SPARSE_FIELDS}
+        self._positions: Dict[str, int] = {}
+        # 字段投影 (projection.parse_fields 的结果)，在还原行时应用
+        self.projection: Optional[FieldTree] = None
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def __iter__(self) -> Iterator[RowView]:
+        return (RowView(self, position) for position in range(len(self)))
+
+    def __getitem__(self, position: int) -> RowView:
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return RowView(self, position)
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> "ColumnarRows":
+        table = cls()
+        table.extend(rows)
+        return table
+
+    # --- 写入 ---
+
+    def extend(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def append(self, row: Dict[str, Any]) -> None:
+        position = len(self)
+        self._positions[row.get("id", "")] = position
+        for field in _META_FIELDS:
+            self.meta[field].append(_intern(row.get(field)))
+        self.parents.append(_intern((row.get("parent") or {}).get("database_id")))
+        self._set_sparse(position, row)
+        properties = row.get("properties") or {}
+        for name, prop in properties.items():
+            if name not in self.columns:
+                self._add_column(name, prop, position)
+        for name, column in list(self.columns.items()):
+            prop = self._checked(name, column, properties.get(name))
+            self.columns[name].append(prop)
+
+    def replace(self, position: int, row: Dict[str, Any]) -> None:
+        for field in _META_FIELDS:
+            self.meta[field][position] = _intern(row.get(field))
+        self.parents[position] = _intern((row.get("parent") or {}).get("database_id"))
+        self._set_sparse(position, row)
+        properties = row.get("properties") or {}
+        for name, prop in properties.items():
+            if name not in self.columns:
+                self._add_column(name, prop, len(self))
+        for name, column in list(self.columns.items()):
+            prop = self._checked(name, column, properties.get(name))
+            self.columns[name].set(position, prop)
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        position = self._positions.get(row.get("id", ""))
+        if position is None:
+            self.append(row)
+        else:
+            self.replace(position, row)
+
+    def remove(self, row_id: str) -> bool:
+        position = self._positions.pop(row_id, None)
+        if position is None:
+            return False
+        for values in self.meta.values():
+            del values[position]
+        del self.parents[position]
+        for column in self.columns.values():
+            column.delete(position)
+        for field, values in self.sparse.items():
+            self.sparse[field] = {
+                p - (p > position): value
+                for p, value in values.items()
+                if p != position
+            }
+        self._positions = {row_id: i for i, row_id in enumerate(self.meta["id"])}
+        return True
+
+    def _set_sparse(self, position: int, row: Dict[str, Any]) -> None:
+        for field, values in self.sparse.items():
+            value = row.get(field)
+            if value:
+                values[position] = value
+            else:
+                values.pop(position, None)
+
+    def _add_column(self, name: str, prop: Dict[str, Any], filled: int) -> None:
+        """新出现的属性：为已有的行补空值"""
+        prop_type = prop.get("type", "")
+        column_type = _COLUMN_TYPES.get(prop_type, _RawColumn)
+        column = column_type(name, prop.get("id"), prop_type)
+        for _ in range(filled):
+            column.append(None)
+        self.columns[name] = column
+
+    def _checked(
+        self, name: str, column: _Column, prop: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        # 属性类型在两次写入之间被修改时，整列退化为原始存储 (旧类型的值置空)
+        if prop and prop.get("type") != column.type:
+            raw = _RawColumn(name, prop.get("id"), prop.get("type", ""))
+            raw.values = [None] * len(column.values)
+            self.columns[name] = raw
+        return prop
+
+    # --- 读取 ---
+
+    def column(self, name: str) -> ColumnView:
+        """属性的标量视图；"@created_time" 等表示页面的顶层字段"""
+        if name.startswith("@"):
+            return self.meta.get(name[1:]) or ColumnView(None, len(self))
+        return ColumnView(self.columns.get(name), len(self))
+
+    def property_names(self) -> List[str]:
+        """标题列在前"""
+        names = list(self.columns)
+        names.sort(key=lambda name: self.columns[name].type != "title")
+        return names
+
+    def cell_text(self, name: str, position: int) -> str:
+        column = self.columns.get(name)
+        return column.text(position) if column is not None else ""
+
+    def row_dict(self, position: int) -> Dict[str, Any]:
+        """还原一行的 API 格式 (只在输出 JSON 时调用)"""
+        row: Dict[str, Any] = {"object": "page"}
+        for field in _META_FIELDS:
+            row[field] = self.meta[field][position]
+        for field, values in self.sparse.items():
+            if position in values:
+                row[field] = values[position]
+        parent = self.parents[position]
+        if parent is not None:
+            row["parent"] = {"type": "database_id", "database_id": parent}
+        row["archived"] = False
+        row["properties"] = {
+            name: column.prop(position) for name, column in self.columns.items()
+        }
+        if self.projection:
+            return project_item(row, self.projection)
+        return row
+
+    def select(self, tree: FieldTree) -> "ColumnarRows":
+        """字段投影后的只读视图：只保留选中的属性列，列对象共享，不复制数据"""
+        view = copy.copy(self)
+        properties = tree.get("properties")
+        if properties is None:
+            view.columns = {}
+        elif properties:
+            view.columns = {
+                name: column
+                for name, column in self.columns.items()
+                if name in properties
+            }
+        view.projection = tree
+        return view
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [self.row_dict(position) for position in range(len(self))]
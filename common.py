@@ -6,11 +6,47 @@ common_id_description = " (uuidv4)"
 # 通用的 format 参数定义
 format_parameter = {
     "type": "string",
-    "description": "Format of the response. Use 'markdown' for converted content or 'json' for raw API response.",
+    "description": "Format of the response. Use 'markdown' for compact converted content or 'json' for raw API response. Markdown omits block IDs; request 'json' when you need them to update or delete blocks.",
     "enum": ["markdown", "json"],
     "default": "markdown",
 }
 
+# 自动翻页参数 (适用于所有基于游标分页的工具)
+fetch_all_parameter = {
+    "type": "boolean",
+    "description": "Follow pagination cursors server-side and return all results in one call.",
+    "default": False,
+}
+
+fields_parameter = {
+    "type": "array",
+    "description": "Only return these fields, as dot-separated paths applied to each result (e.g. ['id', 'url', 'properties.Status']). 'object' and 'id' are always kept. Omit to return everything.",
+    "items": {"type": "string"},
+}
+
+compact_parameter = {
+    "type": "boolean",
+    "description": "For 'json' format: emit compact JSON without indentation and drop null and default-valued fields (e.g. default annotations).",
+    "default": False,
+}
+
+max_items_parameter = {
+    "type": "number",
+    "description": "Maximum number of items to return when paginating server-side. Implies fetch_all.",
+}
+
+stream_parameter = {
+    "type": "boolean",
+    "description": "Process results page by page: each page is rendered into its own content item as soon as it arrives and then released, keeping server memory bounded per page, and a progress notification is sent per page when the request carries a progressToken. For paginated tools this implies fetch_all (bounded by max_items). Pagination and truncation info is returned in a final summary item.",
+    "default": False,
+}
+
+revalidate_parameter = {
+    "type": "boolean",
+    "description": "Only for page IDs: check the page's last_edited_time with one cheap request and reuse the previously fetched content if it has not changed. Any edit inside a page updates the page's last_edited_time, but a plain block's does not reflect edits to its nested children, so for non-page blocks the content is always fetched in full.",
+    "default": False,
+}
+
 # 简化的 Rich Text Schema (对应 Notion API)
 rich_text_object_schema = {
     "type": "object",
@@ -0,0 +1,543 @@
+# localQuery.py
+#
+# 在数据库行的本地快照上执行 Notion 的 filter / sorts 语法，重复查询不再发起 HTTP 请求。
+# 快照按属性惰性提取列值，并为等值类条件 (select / checkbox / number / 文本 equals、
+# multi_select / people / relation contains) 建立二级索引。
+# 本地无法复现的条件抛出 UnsupportedQuery，由调用方回退到 API。
+# 快照在后台构建，构建完成前查询照常走 API；行数超过上限的数据库不建快照。
+
+import asyncio
+import functools
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from columnarRows import ColumnarRows
+from notionProperties import is_empty
+from responseCache import normalize_id
+
+LOCAL_CURSOR_PREFIX = "local:"
+
+Predicate = Callable[[Any], bool]
+
+_TEXT_KEYS = {"title", "rich_text", "url", "email", "phone_number"}
+_NUMBER_KEYS = {"number", "unique_id"}
+_SELECT_KEYS = {"select", "status"}
+_LIST_KEYS = {
+    "multi_select",
+    "people",
+    "relation",
+    "files",
+    "created_by",
+    "last_edited_by",
+}
+_DATE_KEYS = {"date", "created_time", "last_edited_time"}
+
+# 可以走二级索引的 (条件类型, 操作符)
+_INDEXABLE_OPS = {
+    **{key: "equals" for key in _SELECT_KEYS | _NUMBER_KEYS | _TEXT_KEYS},
+    "checkbox": "equals",
+    **{key: "contains" for key in ("multi_select", "people", "relation")},
+}
+
+_RELATIVE_DATE_RANGES = {
+    "past_week": timedelta(days=-7),
+    "past_month": timedelta(days=-30),
+    "past_year": timedelta(days=-365),
+    "next_week": timedelta(days=7),
+    "next_month": timedelta(days=30),
+    "next_year": timedelta(days=365),
+}
+
+
+class UnsupportedQuery(ValueError):
+    """本地执行器无法保证与 API 语义一致的查询"""
+
+
+class SnapshotTooLarge(Exception):
+    """数据库行数超过快照上限，继续使用 API 查询"""
+
+
+# --- 条件 -> 谓词 ---
+
+
+def _index_key(value: Any) -> Any:
+    return value.casefold() if isinstance(value, str) else value
+
+
+def _text_predicate(op: str, arg: Any) -> Predicate:
+    needle = str(arg).casefold() if arg is not None else ""
+    ops: Dict[str, Predicate] = {
+        "equals": lambda v: (v or "").casefold() == needle,
+        "does_not_equal": lambda v: (v or "").casefold() != needle,
+        "contains": lambda v: needle in (v or "").casefold(),
+        "does_not_contain": lambda v: needle not in (v or "").casefold(),
+        "starts_with": lambda v: (v or "").casefold().startswith(needle),
+        "ends_with": lambda v: (v or "").casefold().endswith(needle),
+    }
+    return _with_emptiness(ops, op)
+
+
+def _number_predicate(op: str, arg: Any) -> Predicate:
+    ops: Dict[str, Predicate] = {
+        "equals": lambda v: v is not None and v == arg,
+        "does_not_equal": lambda v: v is None or v != arg,
+        "greater_than": lambda v: v is not None and v > arg,
+        "less_than": lambda v: v is not None and v < arg,
+        "greater_than_or_equal_to": lambda v: v is not None and v >= arg,
+        "less_than_or_equal_to": lambda v: v is not None and v <= arg,
+    }
+    return _with_emptiness(ops, op)
+
+
+def _checkbox_predicate(op: str, arg: Any) -> Predicate:
+    if op == "equals":
+        return lambda v: bool(v) == bool(arg)
+    if op == "does_not_equal":
+        return lambda v: bool(v) != bool(arg)
+    raise UnsupportedQuery(f"Unsupported checkbox condition: {op}")
+
+
+def _select_predicate(op: str, arg: Any) -> Predicate:
+    ops: Dict[str, Predicate] = {
+        "equals": lambda v: v == arg,
+        "does_not_equal": lambda v: v != arg,
+    }
+    return _with_emptiness(ops, op)
+
+
+def _list_predicate(op: str, arg: Any) -> Predicate:
+    ops: Dict[str, Predicate] = {
+        "contains": lambda v: arg in (v or []),
+        "does_not_contain": lambda v: arg not in (v or []),
+    }
+    return _with_emptiness(ops, op)
+
+
+def _with_emptiness(ops: Dict[str, Predicate], op: str) -> Predicate:
+    if op == "is_empty":
+        return is_empty
+    if op == "is_not_empty":
+        return lambda v: not is_empty(v)
+    if op not in ops:
+        raise UnsupportedQuery(f"Unsupported condition: {op}")
+    return ops[op]
+
+
+def _parse_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _is_date_only(value: str) -> bool:
+    return len(value) == 10
+
+
+def _date_predicate(op: str, arg: Any) -> Predicate:
+    if op in ("is_empty", "is_not_empty"):
+        return _with_emptiness({}, op)
+    if op in _RELATIVE_DATE_RANGES:
+        now = datetime.now(timezone.utc)
+        bound = now + _RELATIVE_DATE_RANGES[op]
+        low, high = min(now, bound), max(now, bound)
+        return lambda v: v is not None and low <= _parse_datetime(v) <= high
+    if not isinstance(arg, str):
+        raise UnsupportedQuery(f"Unsupported date condition: {op}")
+
+    # 只给日期的条件按日期比较，否则按时间点比较
+    if _is_date_only(arg):
+        target: Any = date.fromisoformat(arg)
+
+        def convert(v: str) -> Any:
+            return (
+                _parse_datetime(v).date()
+                if not _is_date_only(v)
+                else date.fromisoformat(v)
+            )
+
+    else:
+        target = _parse_datetime(arg)
+
+        def convert(v: str) -> Any:
+            return _parse_datetime(v)
+
+    comparisons: Dict[str, Callable[[Any], bool]] = {
+        "equals": lambda x: x == target,
+        "before": lambda x: x < target,
+        "after": lambda x: x > target,
+        "on_or_before": lambda x: x <= target,
+        "on_or_after": lambda x: x >= target,
+    }
+    if op not in comparisons:
+        raise UnsupportedQuery(f"Unsupported date condition: {op}")
+    compare = comparisons[op]
+    return lambda v: v is not None and compare(convert(v))
+
+
+def _condition_predicate(key: str, condition: Dict[str, Any]) -> Predicate:
+    """把 {"<类型>": {"<操作符>": 值}} 中的一个条件转换为谓词"""
+    if len(condition) != 1:
+        raise UnsupportedQuery(f"Expected exactly one operator in {key} condition")
+    op, arg = next(iter(condition.items()))
+    if key in _TEXT_KEYS:
+        return _text_predicate(op, arg)
+    if key in _NUMBER_KEYS:
+        return _number_predicate(op, arg)
+    if key == "checkbox":
+        return _checkbox_predicate(op, arg)
+    if key in _SELECT_KEYS:
+        return _select_predicate(op, arg)
+    if key in _LIST_KEYS:
+        return _list_predicate(op, arg)
+    if key in _DATE_KEYS:
+        return _date_predicate(op, arg)
+    if key == "formula":
+        return _nested_predicate(op, arg, {"string": "rich_text"})
+    if key == "rollup":
+        return _rollup_predicate(op, arg)
+    raise UnsupportedQuery(f"Unsupported filter type: {key}")
+
+
+def _nested_predicate(
+    key: str, condition: Dict[str, Any], aliases: Dict[str, str]
+) -> Predicate:
+    return _condition_predicate(aliases.get(key, key), condition)
+
+
+def _rollup_predicate(key: str, condition: Dict[str, Any]) -> Predicate:
+    if key in ("number", "date"):
+        return _condition_predicate(key, condition)
+    if key not in ("any", "every", "none") or len(condition) != 1:
+        raise UnsupportedQuery(f"Unsupported rollup condition: {key}")
+    inner = _condition_predicate(*next(iter(condition.items())))
+    if key == "any":
+        return lambda v: any(inner(item) for item in v or [])
+    if key == "every":
+        return lambda v: all(inner(item) for item in v or [])
+    return lambda v: not any(inner(item) for item in v or [])
+
+
+def _split_filter(flt: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+    """返回 (列名, 条件类型, 条件)"""
+    if "timestamp" in flt:
+        name = flt["timestamp"]
+        return f"@{name}", name, flt.get(name) or {}
+    if "property" not in flt:
+        raise UnsupportedQuery(
+            "Filter must have 'property', 'timestamp', 'and' or 'or'"
+        )
+    keys = [key for key in flt if key != "property"]
+    if len(keys) != 1:
+        raise UnsupportedQuery("Property filter must have exactly one condition type")
+    return flt["property"], keys[0], flt[keys[0]]
+
+
+# --- 快照 ---
+
+
+class DatabaseSnapshot:
+    """一个数据库全部行的本地快照 (列式存储)，查询结果只在输出的那一页还原为 API 格式"""
+
+    def __init__(
+        self,
+        database_id: str,
+        schema: Optional[Dict[str, Any]],
+        rows: ColumnarRows,
+    ):
+        self.database_id = database_id
+        self.schema = schema or {}
+        self.rows = rows
+        self.fetched_at = time.monotonic()
+        self._indexes: Dict[str, Dict[Any, Set[int]]] = {}
+
+    # --- 行变更 (写穿) ---
+
+    def upsert_row(self, row: Dict[str, Any]) -> None:
+        self.rows.upsert(row)
+        self._indexes.clear()
+
+    def remove_row(self, row_id: str) -> bool:
+        if self.rows.remove(row_id):
+            self._indexes.clear()
+            return True
+        return False
+
+    # --- 列与索引 ---
+
+    def column(self, name: str) -> Sequence[Any]:
+        """属性的标量列；"@created_time" 等表示页面时间戳"""
+        return self.rows.column(name)
+
+    def index(self, name: str) -> Dict[Any, Set[int]]:
+        """值 -> 行位置 的二级索引；列表类属性按每个元素建索引"""
+        index = self._indexes.get(name)
+        if index is None:
+            index = {}
+            for position, value in enumerate(self.column(name)):
+                for item in value if isinstance(value, (list, tuple)) else [value]:
+                    index.setdefault(_index_key(item), set()).add(position)
+            self._indexes[name] = index
+        return index
+
+    # --- 过滤 ---
+
+    def filter(self, flt: Optional[Dict[str, Any]]) -> List[int]:
+        if not flt:
+            return list(range(len(self.rows)))
+        return sorted(self._evaluate(flt, None))
+
+    def _evaluate(
+        self, flt: Dict[str, Any], candidates: Optional[Set[int]]
+    ) -> Set[int]:
+        if "and" in flt:
+            result = candidates
+            # 先执行能走索引的条件，尽早缩小候选集
+            for sub in sorted(flt["and"], key=lambda f: not self._indexable(f)):
+                result = self._evaluate(sub, result)
+                if not result:
+                    break
+            return result if result is not None else set(range(len(self.rows)))
+        if "or" in flt:
+            result: Set[int] = set()
+            for sub in flt["or"]:
+                result |= self._evaluate(sub, candidates)
+            return result
+
+        name, key, condition = _split_filter(flt)
+        if self._indexable(flt):
+            arg = next(iter(condition.values()))
+            matches = self.index(name).get(_index_key(arg), set())
+            if key in _SELECT_KEYS or key in _LIST_KEYS:
+                # 选项名与 ID 区分大小写，索引键只对字符串做了 casefold，这里再精确核对
+                values = self.column(name)
+                matches = {
+                    p
+                    for p in matches
+                    if (
+                        arg in values[p]
+                        if isinstance(values[p], (list, tuple))
+                        else values[p] == arg
+                    )
+                }
+            return matches & candidates if candidates is not None else set(matches)
+
+        predicate = _condition_predicate(key, condition)
+        values = self.column(name)
+        scan = candidates if candidates is not None else range(len(values))
+        return {position for position in scan if predicate(values[position])}
+
+    def _indexable(self, flt: Dict[str, Any]) -> bool:
+        if "and" in flt or "or" in flt or "timestamp" in flt:
+            return False
+        keys = [key for key in flt if key != "property"]
+        if len(keys) != 1:
+            return False
+        condition = flt[keys[0]]
+        return (
+            isinstance(condition, dict)
+            and len(condition) == 1
+            and _INDEXABLE_OPS.get(keys[0]) in condition
+            and next(iter(condition.values())) is not None
+        )
+
+    # --- 排序 ---
+
+    def sort(
+        self, positions: List[int], sorts: Optional[List[Dict[str, Any]]]
+    ) -> List[int]:
+        # 多关键字稳定排序：从最后一个关键字开始逐个排序；空值无论升降序都排在最后
+        for spec in reversed(sorts or []):
+            if "timestamp" in spec:
+                name = f"@{spec['timestamp']}"
+            elif "property" in spec:
+                name = spec["property"]
+            else:
+                raise UnsupportedQuery("Sort must have 'property' or 'timestamp'")
+            values = self.column(name)
+            sort_key = self._sort_key(name)
+            filled = [p for p in positions if not is_empty(values[p])]
+            empty = [p for p in positions if is_empty(values[p])]
+            filled.sort(
+                key=lambda p: sort_key(values[p]),
+                reverse=spec.get("direction") == "descending",
+            )
+            positions = filled + empty
+        return positions
+
+    def _sort_key(self, name: str) -> Callable[[Any], Any]:
+        # select / status / multi_select 按数据库中选项的顺序排序
+        prop_schema = (self.schema.get("properties") or {}).get(name) or {}
+        prop_type = prop_schema.get("type", "")
+        options = (prop_schema.get(prop_type) or {}).get("options")
+        if options:
+            order = {option.get("name"): i for i, option in enumerate(options)}
+
+            def option_key(value: Any) -> Any:
+                first = value[0] if isinstance(value, (list, tuple)) else value
+                return order.get(first, len(order))
+
+            return option_key
+
+        def default_key(value: Any) -> Any:
+            if isinstance(value, (list, tuple)):
+                value = value[0]
+            return value.casefold() if isinstance(value, str) else value
+
+        return default_key
+
+    # --- 查询 ---
+
+    def query(
+        self,
+        flt: Optional[Dict[str, Any]] = None,
+        sorts: Optional[List[Dict[str, Any]]] = None,
+        start_cursor: Optional[str] = None,
+        page_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """返回与 API 相同结构的一页结果，游标为 "local:<偏移量>" """
+        positions = self.sort(self.filter(flt), sorts)
+        offset = 0
+        if start_cursor:
+            try:
+                offset = int(start_cursor[len(LOCAL_CURSOR_PREFIX) :])
+            except ValueError:
+                raise UnsupportedQuery(f"Invalid local cursor: {start_cursor}")
+        size = min(page_size or 100, 100)
+        window = positions[offset : offset + size]
+        has_more = offset + size < len(positions)
+        return {
+            "object": "list",
+            "results": [self.rows.row_dict(p) for p in window],
+            "has_more": has_more,
+            "next_cursor": (
+                f"{LOCAL_CURSOR_PREFIX}{offset + size}" if has_more else None
+            ),
+            "type": "page_or_database",
+            "page_or_database": {},
+        }
+
+
+class LocalQueryEngine:
+    """管理各数据库的快照：同一数据库在 TTL 内被查询达到阈值次数后在后台建立快照"""
+
+    def __init__(self, ttl: float = 300.0, threshold: int = 2, max_rows: int = 10000):
+        self.ttl = ttl
+        self.threshold = threshold
+        # 快照的行数上限，超出的数据库在一个 TTL 内不再尝试
+        self.max_rows = max_rows
+        self.snapshots: Dict[str, DatabaseSnapshot] = {}
+        self._recent_queries: Dict[str, List[float]] = {}
+        self._building: Dict[str, "asyncio.Task[DatabaseSnapshot]"] = {}
+        # 构建期间被写入的数据库：构建结果可能缺少这次写入，完成后丢弃
+        self._stale: Set[str] = set()
+        self._oversized: Dict[str, float] = {}
+        self.local_hits = 0
+        self.fallbacks = 0
+        self.oversized = 0
+
+    def get(self, database_id: str) -> Optional[DatabaseSnapshot]:
+        key = normalize_id(database_id)
+        snapshot = self.snapshots.get(key)
+        if snapshot is not None and time.monotonic() - snapshot.fetched_at > self.ttl:
+            del self.snapshots[key]
+            return None
+        return snapshot
+
+    def should_snapshot(self, database_id: str) -> bool:
+        """记录一次查询，窗口内查询次数达到阈值时返回 True"""
+        key = normalize_id(database_id)
+        now = time.monotonic()
+        recent = [t for t in self._recent_queries.get(key, []) if now - t < self.ttl]
+        recent.append(now)
+        self._recent_queries[key] = recent
+        return len(recent) >= self.threshold
+
+    def build_in_background(self, database_id: str, load: Callable[[], Any]) -> None:
+        """开始在后台构建快照并立即返回；已在构建或已知超出上限时不重复构建"""
+        key = normalize_id(database_id)
+        if key in self._building:
+            return
+        found = self._oversized.get(key)
+        if found is not None:
+            if time.monotonic() - found < self.ttl:
+                return
+            del self._oversized[key]
+        self._start(key, load)
+
+    async def build(
+        self,
+        database_id: str,
+        load: Callable[[], Any],
+    ) -> DatabaseSnapshot:
+        """等待快照构建完成；并发请求同一数据库的快照时只构建一次"""
+        key = normalize_id(database_id)
+        task = self._building.get(key) or self._start(key, load)
+        return await asyncio.shield(task)
+
+    def _start(
+        self, key: str, load: Callable[[], Any]
+    ) -> "asyncio.Task[DatabaseSnapshot]":
+        task = asyncio.ensure_future(load())
+        self._building[key] = task
+        task.add_done_callback(functools.partial(self._finished, key))
+        return task
+
+    def _finished(self, key: str, task: "asyncio.Task[DatabaseSnapshot]") -> None:
+        self._building.pop(key, None)
+        stale = key in self._stale
+        self._stale.discard(key)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if isinstance(error, SnapshotTooLarge):
+            self._oversized[key] = time.monotonic()
+            self.oversized += 1
+        elif error is not None:
+            logging.warning(f"Failed to build snapshot of database {key}: {error}")
+        elif not stale:
+            self.snapshots[key] = task.result()
+
+    def upsert_row(self, row: Dict[str, Any]) -> None:
+        parent = row.get("parent") or {}
+        key = normalize_id(parent.get("database_id", ""))
+        if key in self._building:
+            self._stale.add(key)
+        snapshot = self.snapshots.get(key)
+        if snapshot is None:
+            return
+        if row.get("archived") or row.get("in_trash"):
+            snapshot.remove_row(row.get("id", ""))
+        else:
+            snapshot.upsert_row(row)
+
+    def remove_row(self, row_id: str) -> None:
+        # 不知道行属于哪个数据库：正在构建的快照都可能包含它
+        self._stale.update(self._building)
+        for snapshot in self.snapshots.values():
+            if snapshot.remove_row(row_id):
+                return
+
+    def invalidate(self, database_id: str) -> None:
+        key = normalize_id(database_id)
+        self.snapshots.pop(key, None)
+        if key in self._building:
+            self._stale.add(key)
+
+    def close(self) -> None:
+        for task in list(self._building.values()):
+            task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "snapshots": {
+                database_id: len(snapshot.rows)
+                for database_id, snapshot in self.snapshots.items()
+            },
+            "building": len(self._building),
+            "local_hits": self.local_hits,
+            "fallbacks": self.fallbacks,
+            "oversized": self.oversized,
+        }
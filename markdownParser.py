@@ -0,0 +1,415 @@
+# markdownParser.py
+#
+# Markdown -> Notion 块的流式解析器 (markdownRenderer 的反方向)。
+# 逐行单次遍历，每完成一个顶层块就立即产出，内存只与当前块的大小有关，
+# 多 MB 的输入可以边解析边分批追加。
+# 支持：标题、段落、无序/有序/待办列表 (按缩进嵌套)、代码块、引用、表格、分隔线，
+# 行内的粗体、斜体、删除线、行内代码和链接映射为 rich text 的 annotations。
+
+import re
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Notion 单个 text 对象最多 2000 个字符，一个 rich_text 数组最多 100 个元素
+MAX_TEXT_LENGTH = 2000
+MAX_RICH_TEXT_ITEMS = 100
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)(?:\s+#+)?\s*$")
+_DIVIDER = re.compile(r"^(?:-{3,}|\*{3,}|_{3,})$")
+_LIST_ITEM = re.compile(r"^(\s*)([-*+]|\d+[.)])\s+(.*)$")
+_TODO = re.compile(r"^\[([ xX])\]\s+(.*)$")
+_FENCE = re.compile(r"^\s*(```|~~~)\s*([\w#+.-]*)")
+_TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+
+_INLINE = re.compile(
+    r"`(?P<code>[^`]+)`"
+    r"|\*\*(?P<bold>.+?)\*\*"
+    r"|(?<!\w)__(?P<bold2>.+?)__(?!\w)"
+    r"|~~(?P<strike>.+?)~~"
+    r"|\*(?!\s)(?P<italic>[^*]+?)(?<!\s)\*"
+    r"|(?<!\w)_(?P<italic2>[^_]+?)_(?!\w)"
+    r"|\[(?P<label>[^\]]+)\]\((?P<url>[^)\s]+)\)"
+)
+
+# Notion 支持的代码语言 (部分)，常见别名映射到 Notion 的名称
+_LANGUAGE_ALIASES = {
+    "": "plain text",
+    "text": "plain text",
+    "txt": "plain text",
+    "js": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "sh": "shell",
+    "zsh": "shell",
+    "yml": "yaml",
+    "md": "markdown",
+    "cpp": "c++",
+    "cs": "c#",
+    "csharp": "c#",
+    "rb": "ruby",
+    "rs": "rust",
+    "kt": "kotlin",
+    "golang": "go",
+    "ps1": "powershell",
+}
+_LANGUAGES = {
+    "bash", "c", "c#", "c++", "css", "dart", "docker", "go", "graphql", "html",
+    "java", "javascript", "json", "kotlin", "latex", "lua", "makefile",
+    "markdown", "mermaid", "objective-c", "php", "plain text", "powershell",
+    "python", "r", "ruby", "rust", "scala", "shell", "sql", "swift",
+    "typescript", "xml", "yaml",
+}  # fmt: skip
+
+
+# --- 行内格式 ---
+
+
+def _text_items(
+    text: str, annotations: Dict[str, bool], link: Optional[str]
+) -> List[Dict[str, Any]]:
+    items = []
+    for start in range(0, len(text), MAX_TEXT_LENGTH):
+        item: Dict[str, Any] = {
+            "type": "text",
+            "text": {
+                "content": text[start : start + MAX_TEXT_LENGTH],
+                "link": {"url": link} if link else None,
+            },
+        }
+        if annotations:
+            item["annotations"] = dict(annotations)
+        items.append(item)
+    return items
+
+
+def parse_inline(
+    text: str,
+    annotations: Optional[Dict[str, bool]] = None,
+    link: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """把一行 Markdown 行内语法转换为 rich text 数组"""
+    annotations = annotations or {}
+    items: List[Dict[str, Any]] = []
+    position = 0
+    for match in _INLINE.finditer(text):
+        if match.start() > position:
+            items += _text_items(text[position : match.start()], annotations, link)
+        group = match.lastgroup
+        if group == "code":
+            items += _text_items(
+                match.group("code"), dict(annotations, code=True), link
+            )
+        elif group in ("bold", "bold2"):
+            items += parse_inline(
+                match.group(group), dict(annotations, bold=True), link
+            )
+        elif group in ("italic", "italic2"):
+            items += parse_inline(
+                match.group(group), dict(annotations, italic=True), link
+            )
+        elif group == "strike":
+            items += parse_inline(
+                match.group(group), dict(annotations, strikethrough=True), link
+            )
+        else:
+            items += parse_inline(match.group("label"), annotations, match.group("url"))
+        position = match.end()
+    if position < len(text):
+        items += _text_items(text[position:], annotations, link)
+    return items
+
+
+def _text_blocks(block_type: str, text: str, **extra: Any) -> List[Dict[str, Any]]:
+    """rich text 超过 100 个元素时拆成多个同类型的块"""
+    return _rich_text_blocks(block_type, parse_inline(text), **extra)
+
+
+def _rich_text_blocks(
+    block_type: str, rich_text: List[Dict[str, Any]], **extra: Any
+) -> List[Dict[str, Any]]:
+    blocks = []
+    for start in range(0, max(len(rich_text), 1), MAX_RICH_TEXT_ITEMS):
+        data = dict(extra, rich_text=rich_text[start : start + MAX_RICH_TEXT_ITEMS])
+        blocks.append({"object": "block", "type": block_type, block_type: data})
+    return blocks
+
+
+def _code_blocks(language: str, lines: List[str]) -> List[Dict[str, Any]]:
+    language = language.lower()
+    language = _LANGUAGE_ALIASES.get(language, language)
+    if language not in _LANGUAGES:
+        language = "plain text"
+    rich_text = _text_items("\n".join(lines), {}, None)
+    return [
+        {
+            "object": "block",
+            "type": "code",
+            "code": {
+                "language": language,
+                "rich_text": rich_text[start : start + MAX_RICH_TEXT_ITEMS],
+            },
+        }
+        for start in range(0, max(len(rich_text), 1), MAX_RICH_TEXT_ITEMS)
+    ]
+
+
+def _split_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    cells = re.split(r"(?<!\\)\|", line)
+    return [cell.strip().replace("\\|", "|") for cell in cells]
+
+
+def _table_block(rows: List[List[str]], has_header: bool) -> Dict[str, Any]:
+    width = max(len(row) for row in rows)
+    return {
+        "object": "block",
+        "type": "table",
+        "table": {
+            "table_width": width,
+            "has_column_header": has_header,
+            "has_row_header": False,
+            "children": [
+                {
+                    "object": "block",
+                    "type": "table_row",
+                    "table_row": {
+                        "cells": [
+                            parse_inline(cell)
+                            for cell in row + [""] * (width - len(row))
+                        ]
+                    },
+                }
+                for row in rows
+            ],
+        },
+    }
+
+
+def _indent_width(prefix: str) -> int:
+    return len(prefix.replace("\t", "    "))
+
+
+# --- 块级解析 ---
+
+
+class MarkdownParser:
+    """逐行喂入 Markdown，已完成的顶层块放入 ready 队列 (起始行号, 块)"""
+
+    def __init__(self) -> None:
+        self.ready: Deque[Tuple[int, Dict[str, Any]]] = deque()
+        self._line = 0
+        self._paragraph: List[str] = []
+        self._quote: List[str] = []
+        self._table: List[List[str]] = []
+        self._table_header = False
+        self._code: Optional[Tuple[str, str, List[str]]] = None
+        # 列表：(缩进, 块, 块所在的列表) 栈，栈底为当前的顶层列表项；
+        # 顶层列表项 (文字过长时拆成的多个同级块) 在 _roots 中
+        self._list: List[Tuple[int, Dict[str, Any], List[Dict[str, Any]]]] = []
+        self._roots: List[Dict[str, Any]] = []
+        self._start = 0
+
+    def feed(self, line: str) -> None:
+        self._line += 1
+        line = line.rstrip("\r\n")
+
+        if self._code is not None:
+            fence, language, lines = self._code
+            if line.strip().startswith(fence):
+                self._code = None
+                self._emit_all(_code_blocks(language, lines))
+            else:
+                lines.append(line)
+            return
+
+        stripped = line.strip()
+        if not stripped:
+            self._flush_text()
+            self._flush_table()
+            return
+
+        fence = _FENCE.match(line)
+        if fence:
+            self._flush()
+            self._start = self._line
+            self._code = (fence.group(1), fence.group(2), [])
+            return
+
+        if stripped.startswith("|"):
+            self._flush_text()
+            self._flush_list()
+            if not self._table:
+                self._start = self._line
+            if _TABLE_SEPARATOR.match(stripped):
+                # 表头分隔行
+                self._table_header = len(self._table) == 1
+            else:
+                self._table.append(_split_row(stripped))
+            return
+        self._flush_table()
+
+        heading = _HEADING.match(stripped)
+        if heading:
+            self._flush()
+            self._start = self._line
+            level = min(len(heading.group(1)), 3)
+            self._emit_all(_text_blocks(f"heading_{level}", heading.group(2)))
+            return
+
+        if _DIVIDER.match(stripped):
+            self._flush()
+            self._start = self._line
+            self._emit({"object": "block", "type": "divider", "divider": {}})
+            return
+
+        if stripped.startswith(">"):
+            self._flush_paragraph()
+            self._flush_list()
+            if not self._quote:
+                self._start = self._line
+            self._quote.append(stripped[1:].strip())
+            return
+
+        item = _LIST_ITEM.match(line)
+        if item:
+            self._flush_text()
+            self._add_list_item(
+                _indent_width(item.group(1)), item.group(2), item.group(3)
+            )
+            return
+
+        if self._list and _indent_width(line[: len(line) - len(line.lstrip())]) > 0:
+            # 缩进的续行：并入当前列表项
+            self._continue_list_item(stripped)
+            return
+
+        self._flush_list()
+        self._flush_quote()
+        if not self._paragraph:
+            self._start = self._line
+        self._paragraph.append(stripped)
+
+    def close(self) -> None:
+        if self._code is not None:
+            # 未闭合的代码块
+            _, language, lines = self._code
+            self._code = None
+            self._emit_all(_code_blocks(language, lines))
+        self._flush()
+
+    # --- 列表 ---
+
+    def _add_list_item(self, indent: int, marker: str, text: str) -> None:
+        todo = _TODO.match(text)
+        if todo:
+            block_type = "to_do"
+            extra: Dict[str, Any] = {"checked": todo.group(1) in "xX"}
+            text = todo.group(2)
+        elif marker[0].isdigit():
+            block_type, extra = "numbered_list_item", {}
+        else:
+            block_type, extra = "bulleted_list_item", {}
+        # 文字超过 100 个 rich text 元素时拆成多个同级列表项，子项挂在最后一个下面
+        blocks = _text_blocks(block_type, text, **extra)
+
+        while self._list and self._list[-1][0] >= indent:
+            self._list.pop()
+        if self._list:
+            parent = self._list[-1][1]
+            container = parent[parent["type"]].setdefault("children", [])
+        else:
+            self._flush_list()
+            self._start = self._line
+            container = self._roots
+        container.extend(blocks)
+        self._list.append((indent, blocks[-1], container))
+
+    def _continue_list_item(self, text: str) -> None:
+        indent, block, container = self._list[-1]
+        block_type = block["type"]
+        data = block[block_type]
+        rich_text = data["rich_text"] + _text_items(" ", {}, None) + parse_inline(text)
+        extra = {
+            name: value
+            for name, value in data.items()
+            if name not in ("rich_text", "children")
+        }
+        blocks = _rich_text_blocks(block_type, rich_text, **extra)
+        data["rich_text"] = blocks[0][block_type]["rich_text"]
+        if len(blocks) > 1:
+            # 溢出的部分成为紧跟其后的同级块，后续续行与子项接在最后一个块上
+            container.extend(blocks[1:])
+            self._list[-1] = (indent, blocks[-1], container)
+
+    def _flush_list(self) -> None:
+        if self._roots:
+            self._emit_all(self._roots)
+            self._list, self._roots = [], []
+
+    # --- 文本 ---
+
+    def _flush_paragraph(self) -> None:
+        if self._paragraph:
+            text = " ".join(self._paragraph)
+            self._paragraph = []
+            self._emit_all(_text_blocks("paragraph", text))
+
+    def _flush_quote(self) -> None:
+        if self._quote:
+            text = "\n".join(self._quote)
+            self._quote = []
+            self._emit_all(_text_blocks("quote", text))
+
+    def _flush_text(self) -> None:
+        self._flush_paragraph()
+        self._flush_quote()
+
+    def _flush_table(self) -> None:
+        if self._table:
+            rows, self._table = self._table, []
+            self._emit(_table_block(rows, self._table_header))
+            self._table_header = False
+
+    def _flush(self) -> None:
+        self._flush_text()
+        self._flush_list()
+        self._flush_table()
+
+    def _emit(self, block: Dict[str, Any]) -> None:
+        self.ready.append((self._start, block))
+
+    def _emit_all(self, blocks: List[Dict[str, Any]]) -> None:
+        for block in blocks:
+            self._emit(block)
+
+
+def iter_lines(text: str) -> Iterator[str]:
+    """逐行切分字符串；与 StringIO / splitlines 不同，不会一次性复制整个输入"""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """逐行解析，依次产出 (起始行号, 顶层块)"""
+    parser = MarkdownParser()
+    for line in lines:
+        parser.feed(line)
+        while parser.ready:
+            yield parser.ready.popleft()
+    parser.close()
+    while parser.ready:
+        yield parser.ready.popleft()
+
+
+def parse_markdown(text: str) -> List[Dict[str, Any]]:
+    return [block for _, block in iter_blocks(iter_lines(text))]
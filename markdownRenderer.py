@@ -0,0 +1,485 @@
+# markdownRenderer.py
+#
+# 把 Notion API 响应 (块列表、页面、数据库查询结果、用户、评论) 渲染为紧凑的 Markdown。
+# 单次遍历，所有片段直接写入同一个输出流，不为每个块拼接中间字符串。
+
+import io
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+Write = Callable[[str], Any]
+
+# 每层嵌套的缩进
+INDENT = "  "
+
+# 作为列表项渲染的块类型
+_LIST_PREFIXES = {
+    "bulleted_list_item": "- ",
+    "toggle": "▸ ",
+}
+
+# 只是容器、本身不产生内容的块类型
+_CONTAINER_TYPES = {"column_list", "column", "synced_block"}
+
+# 不渲染的块类型
+_SKIPPED_TYPES = {"table_of_contents", "breadcrumb"}
+
+_FILE_TYPES = {"image", "video", "file", "pdf", "audio"}
+_LINK_TYPES = {"bookmark", "embed", "link_preview"}
+
+
+def convert_to_markdown(response: Dict[str, Any]) -> str:
+    out = io.StringIO()
+    render(response, out.write)
+    return out.getvalue()
+
+
+def render(response: Dict[str, Any], write: Write) -> None:
+    """按对象类型分发渲染"""
+    kind = response.get("object")
+    if kind == "list":
+        _render_list(response, write)
+    elif kind == "block":
+        render_blocks([response], write)
+    elif kind == "page":
+        render_page(response, write)
+    elif kind == "database":
+        render_database(response, write)
+    elif kind == "user":
+        render_users([response], write)
+    elif kind == "comment":
+        render_comments([response], write)
+    elif kind == "aggregation":
+        render_aggregation(response, write)
+    elif kind == "batch_result":
+        render_batch_result(response, write)
+    elif kind == "append_summary":
+        render_append_summary(response, write)
+    else:
+        # 错误响应或未知对象：退回紧凑 JSON
+        write(json.dumps(response, ensure_ascii=False, separators=(",", ":")))
+
+
+def _render_list(response: Dict[str, Any], write: Write) -> None:
+    results: List[Dict[str, Any]] = response.get("results", [])
+    columnar = not isinstance(results, list)
+    kinds = set() if columnar else {item.get("object") for item in results}
+    if columnar:
+        # 列式表示的数据库行 (columnarRows.ColumnarRows)
+        render_columnar_table(results, write)
+    elif kinds == {"block"}:
+        render_blocks(results, write)
+    elif kinds == {"page"} and all(_is_database_row(item) for item in results):
+        render_rows_table(results, write)
+    elif kinds <= {"page", "database"}:
+        for item in results:
+            _render_page_line(item, write)
+    elif kinds == {"user"}:
+        render_users(results, write)
+    elif kinds == {"comment"}:
+        render_comments(results, write)
+    elif kinds == {"search_hit"}:
+        render_search_hits(results, write)
+    else:
+        for item in results:
+            render(item, write)
+            write("\n")
+
+    _render_append_failures(response, write)
+    if response.get("truncated"):
+        write(f"\n_Truncated after {response.get('block_count')} blocks._\n")
+    if response.get("has_more"):
+        write(
+            f"\n_More results available (next_cursor: {response.get('next_cursor')})._\n"
+        )
+
+
+# --- Rich text ---
+
+
+def render_rich_text(
+    items: Optional[List[Dict[str, Any]]], write: Write, indent: str = ""
+) -> None:
+    for item in items or []:
+        if item.get("type") == "equation":
+            write(f"${item.get('equation', {}).get('expression', '')}$")
+            continue
+
+        text = item.get("plain_text")
+        if text is None:
+            text = item.get("text", {}).get("content", "")
+        if not text:
+            continue
+        if indent:
+            text = text.replace("\n", "\n" + indent)
+
+        annotations = item.get("annotations") or {}
+        href = item.get("href")
+        if not href:
+            link = (item.get("text") or {}).get("link")
+            href = link.get("url") if link else None
+
+        # 标记符号不能包住首尾空白，否则 Markdown 不识别
+        stripped = text.strip()
+        if not stripped:
+            write(text)
+            continue
+        lead = text[: len(text) - len(text.lstrip())]
+        trail = text[len(text.rstrip()) :]
+
+        marks = ""
+        if annotations.get("code"):
+            marks = "`"
+        else:
+            if annotations.get("bold"):
+                marks += "**"
+            if annotations.get("italic"):
+                marks += "*"
+            if annotations.get("strikethrough"):
+                marks += "~~"
+
+        write(lead)
+        if href:
+            write("[")
+        write(marks)
+        write(stripped)
+        write(marks[::-1])
+        if href:
+            write(f"]({href})")
+        write(trail)
+
+
+def _render_code(
+    items: Optional[List[Dict[str, Any]]], write: Write, indent: str = ""
+) -> None:
+    """代码块内容原样输出：围栏内的 Markdown 标记不会被解析，注释与链接一律忽略"""
+    for item in items or []:
+        text = item.get("plain_text")
+        if text is None:
+            text = (item.get("text") or {}).get("content", "")
+        write(text.replace("\n", "\n" + indent) if indent else text)
+
+
+def plain_text(items: Optional[List[Dict[str, Any]]]) -> str:
+    return "".join(item.get("plain_text", "") for item in items or [])
+
+
+# --- Blocks ---
+
+
+def render_blocks(blocks: List[Dict[str, Any]], write: Write, indent: str = "") -> None:
+    number = 0
+    for block in blocks:
+        block_type = block.get("type", "")
+        # 连续的编号列表项共用一个计数器
+        number = number + 1 if block_type == "numbered_list_item" else 0
+        _render_block(block, block_type, write, indent, number)
+
+
+def _render_block(
+    block: Dict[str, Any], block_type: str, write: Write, indent: str, number: int
+) -> None:
+    if block_type in _SKIPPED_TYPES:
+        return
+    children = block.get("children")
+    if block_type in _CONTAINER_TYPES:
+        if children:
+            render_blocks(children, write, indent)
+        return
+    if block_type == "table":
+        _render_table(block, write, indent)
+        return
+
+    data = block.get(block_type) or {}
+    rich_text = data.get("rich_text")
+    child_indent = indent + INDENT
+
+    write(indent)
+    if block_type == "paragraph":
+        render_rich_text(rich_text, write, indent)
+    elif block_type.startswith("heading_"):
+        write("#" * int(block_type[-1]) + " ")
+        render_rich_text(rich_text, write, indent)
+    elif block_type in _LIST_PREFIXES:
+        write(_LIST_PREFIXES[block_type])
+        render_rich_text(rich_text, write, indent)
+    elif block_type == "numbered_list_item":
+        write(f"{number}. ")
+        render_rich_text(rich_text, write, indent)
+    elif block_type == "to_do":
+        write("- [x] " if data.get("checked") else "- [ ] ")
+        render_rich_text(rich_text, write, indent)
+    elif block_type in ("quote", "callout"):
+        write("> ")
+        icon = data.get("icon") or {}
+        if icon.get("emoji"):
+            write(icon["emoji"] + " ")
+        render_rich_text(rich_text, write, indent + "> ")
+    elif block_type == "code":
+        write(f"```{data.get('language', '')}\n{indent}")
+        _render_code(rich_text, write, indent)
+        write(f"\n{indent}```")
+    elif block_type == "equation":
+        write(f"$${data.get('expression', '')}$$")
+    elif block_type == "divider":
+        write("---")
+    elif block_type in _FILE_TYPES:
+        source = data.get(data.get("type", "")) or {}
+        name = plain_text(data.get("caption")) or data.get("name") or block_type
+        write(f"![{name}]" if block_type == "image" else f"[{name}]")
+        write(f"({source.get('url', '')})")
+    elif block_type in _LINK_TYPES:
+        url = data.get("url", "")
+        write(f"[{plain_text(data.get('caption')) or url}]({url})")
+    elif block_type == "child_page":
+        write(f"[Page: {data.get('title', '')}] ({block.get('id')})")
+    elif block_type == "child_database":
+        write(f"[Database: {data.get('title', '')}] ({block.get('id')})")
+    elif block_type == "link_to_page":
+        write(
+            f"[Link to {data.get('type', 'page')}: {data.get(data.get('type', ''), '')}]"
+        )
+    elif rich_text is not None:
+        render_rich_text(rich_text, write, indent)
+    else:
+        write(f"[{block_type}]")
+    write("\n")
+
+    if children:
+        render_blocks(children, write, child_indent)
+
+
+def _render_table(block: Dict[str, Any], write: Write, indent: str) -> None:
+    rows = [
+        row for row in block.get("children") or [] if row.get("type") == "table_row"
+    ]
+    if not rows:
+        write(f"{indent}[table]\n")
+        return
+    width = block.get("table", {}).get("table_width") or len(
+        rows[0]["table_row"].get("cells", [])
+    )
+    for i, row in enumerate(rows):
+        write(indent)
+        write("|")
+        for cell in row["table_row"].get("cells", []):
+            write(" ")
+            render_rich_text(cell, _cell_writer(write))
+            write(" |")
+        write("\n")
+        if i == 0:
+            write(indent + "|" + " --- |" * width + "\n")
+
+
+def _cell_writer(write: Write) -> Write:
+    """表格单元格中不能出现换行和竖线"""
+    return lambda text: write(text.replace("|", "\\|").replace("\n", " "))
+
+
+# --- Pages / databases ---
+
+
+def property_to_text(prop: Dict[str, Any]) -> str:
+    """把一个页面属性值转换为纯文本"""
+    prop_type = prop.get("type")
+    value = prop.get(prop_type) if prop_type else None
+    if value is None:
+        return ""
+    if prop_type in ("title", "rich_text"):
+        return plain_text(value)
+    if prop_type in ("select", "status"):
+        return value.get("name", "")
+    if prop_type == "multi_select":
+        return ", ".join(option.get("name", "") for option in value)
+    if prop_type == "date":
+        start, end = value.get("start") or "", value.get("end")
+        return f"{start} → {end}" if end else start
+    if prop_type == "checkbox":
+        return "✓" if value else "✗"
+    if prop_type == "people":
+        return ", ".join(person.get("name") or person.get("id", "") for person in value)
+    if prop_type == "relation":
+        return ", ".join(item.get("id", "") for item in value)
+    if prop_type == "files":
+        return ", ".join(item.get("name", "") for item in value)
+    if prop_type in ("created_by", "last_edited_by"):
+        return value.get("name") or value.get("id", "")
+    if prop_type == "formula":
+        return property_to_text(value)
+    if prop_type == "rollup":
+        if value.get("type") == "array":
+            return ", ".join(property_to_text(item) for item in value.get("array", []))
+        return property_to_text(value)
+    if prop_type == "unique_id":
+        prefix = value.get("prefix")
+        return f"{prefix}-{value.get('number')}" if prefix else str(value.get("number"))
+    return str(value)
+
+
+def page_title(page: Dict[str, Any]) -> str:
+    if page.get("object") == "database":
+        return plain_text(page.get("title")) or "Untitled"
+    for prop in (page.get("properties") or {}).values():
+        if prop.get("type") == "title":
+            return plain_text(prop.get("title")) or "Untitled"
+    return "Untitled"
+
+
+def render_page(page: Dict[str, Any], write: Write) -> None:
+    write(f"# {page_title(page)}\n")
+    write(f"id: {page.get('id')}")
+    if page.get("url"):
+        write(f" | url: {page['url']}")
+    if page.get("last_edited_time"):
+        write(f" | edited: {page['last_edited_time']}")
+    write("\n")
+    for name, prop in (page.get("properties") or {}).items():
+        if prop.get("type") == "title":
+            continue
+        write(f"- {name}: {property_to_text(prop)}\n")
+
+
+def _render_page_line(item: Dict[str, Any], write: Write) -> None:
+    write(f"- [{item.get('object')}] {page_title(item)} ({item.get('id')})\n")
+
+
+def _is_database_row(page: Dict[str, Any]) -> bool:
+    return (page.get("parent") or {}).get("type") == "database_id"
+
+
+def render_rows_table(rows: List[Dict[str, Any]], write: Write) -> None:
+    """数据库查询结果渲染为一张 Markdown 表格，标题列在前、id 列在后"""
+    columns: List[str] = []
+    for name, prop in (rows[0].get("properties") or {}).items():
+        if prop.get("type") == "title":
+            columns.insert(0, name)
+        else:
+            columns.append(name)
+
+    cell = _cell_writer(write)
+    write("| " + " | ".join(columns) + " | id |\n")
+    write("|" + " --- |" * (len(columns) + 1) + "\n")
+    for row in rows:
+        properties = row.get("properties") or {}
+        write("|")
+        for name in columns:
+            write(" ")
+            prop = properties.get(name)
+            if prop:
+                cell(property_to_text(prop))
+            write(" |")
+        write(f" {row.get('id')} |\n")
+
+
+def render_columnar_table(rows: Any, write: Write) -> None:
+    """与 render_rows_table 输出相同，但直接从列中取单元格文本，不还原行对象"""
+    if not len(rows):
+        return
+    columns: List[str] = rows.property_names()
+    cell = _cell_writer(write)
+    write("| " + " | ".join(columns) + " | id |\n")
+    write("|" + " --- |" * (len(columns) + 1) + "\n")
+    for position, row in enumerate(rows):
+        write("|")
+        for name in columns:
+            write(" ")
+            cell(rows.cell_text(name, position))
+            write(" |")
+        write(f" {row.id} |\n")
+
+
+def render_database(database: Dict[str, Any], write: Write) -> None:
+    write(f"# {page_title(database)}\n")
+    description = database.get("description")
+    if description:
+        render_rich_text(description, write)
+        write("\n")
+    write(f"id: {database.get('id')}\n")
+    for name, prop in (database.get("properties") or {}).items():
+        prop_type = prop.get("type", "")
+        write(f"- {name} ({prop_type})")
+        options = (prop.get(prop_type) or {}).get("options")
+        if options:
+            write(": " + ", ".join(option.get("name", "") for option in options))
+        write("\n")
+
+
+def render_aggregation(result: Dict[str, Any], write: Write) -> None:
+    cell = _cell_writer(write)
+    columns: List[str] = result.get("columns", [])
+    write("| " + " | ".join(columns) + " |\n")
+    write("|" + " --- |" * len(columns) + "\n")
+    for row in result.get("rows", []):
+        write("|")
+        for value in row:
+            write(" ")
+            cell("" if value is None else str(value))
+            write(" |")
+        write("\n")
+    write(f"\n_{result.get('row_count', 0)} rows scanned._\n")
+
+
+def render_batch_result(result: Dict[str, Any], write: Write) -> None:
+    write(f"{result.get('succeeded', 0)} succeeded, {result.get('failed', 0)} failed\n")
+    for item in result.get("results", []):
+        write(f"- [{item.get('index')}] ")
+        if item.get("status") == "ok":
+            write(f"ok {item.get('id')}")
+            if item.get("replayed"):
+                write(" (already written)")
+        else:
+            error = item.get("error") or {}
+            status = error.get("status")
+            write(f"error{f' {status}' if status else ''}: {error.get('message')}")
+        write("\n")
+
+
+def render_append_summary(summary: Dict[str, Any], write: Write) -> None:
+    write(
+        f"Appended {summary.get('appended', 0)} blocks in {summary.get('requests', 0)} "
+        f"requests (last block: {summary.get('last_block_id')})\n"
+    )
+    _render_append_failures(summary, write)
+
+
+def _render_append_failures(response: Dict[str, Any], write: Write) -> None:
+    for failure in response.get("failed") or []:
+        error = failure.get("error") or {}
+        line = failure.get("next_line")
+        write(
+            f"\n_Append to {failure.get('parent_id')} stopped at child "
+            f"{failure.get('next_index')}"
+            f"{f', Markdown line {line}' if line else ''}"
+            f" (resume with after: {failure.get('after')}): "
+            f"{error.get('message')}_\n"
+        )
+
+
+# --- Users / comments ---
+
+
+def render_users(users: List[Dict[str, Any]], write: Write) -> None:
+    for user in users:
+        write(f"- {user.get('name') or 'Unnamed'} ({user.get('type', 'user')}")
+        email = (user.get("person") or {}).get("email")
+        if email:
+            write(f", {email}")
+        write(f") {user.get('id')}\n")
+
+
+def render_comments(comments: List[Dict[str, Any]], write: Write) -> None:
+    for comment in comments:
+        author = comment.get("created_by") or {}
+        write(
+            f"- {comment.get('created_time', '')} {author.get('name') or author.get('id', '')}: "
+        )
+        render_rich_text(comment.get("rich_text"), write, INDENT)
+        write(f" (discussion: {comment.get('discussion_id')})\n")
+
+
+def render_search_hits(hits: List[Dict[str, Any]], write: Write) -> None:
+    for hit in hits:
+        write(f"- {hit.get('title') or 'Untitled'} ({hit.get('page_id')})")
+        if hit.get("kind") == "block":
+            write(f" block {hit.get('id')}")
+        write(f": {(hit.get('snippet') or '').replace(chr(10), ' ')}\n")
@@ -0,0 +1,326 @@
+# metrics.py
+#
+# 进程内指标：计数器、仪表、直方图，按 Prometheus 文本格式输出 (/metrics)。
+# 只在事件发生时做一次字典查找和加法，不依赖 prometheus_client。
+# 缓存命中率、重试次数等已有的统计由 collector 在抓取时读取，不重复计数。
+
+import bisect
+import re
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+# 延迟桶 (秒)：覆盖本地缓存命中到 Notion 慢请求
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)  # fmt: skip
+# 响应大小桶 (字节)
+SIZE_BUCKETS = tuple(float(256 * 4**i) for i in range(9))  # 256B .. 16MB
+
+# Notion 接口路径中的固定部分，其余段 (ID) 归一为 {id}，避免标签基数失控
+_ENDPOINT_WORDS = {
+    "blocks",
+    "children",
+    "pages",
+    "properties",
+    "databases",
+    "query",
+    "users",
+    "me",
+    "comments",
+    "search",
+}
+
+
+def endpoint_label(endpoint: str) -> str:
+    """/blocks/<id>/children -> /blocks/{id}/children"""
+    parts = endpoint.split("?", 1)[0].split("/")
+    return "/".join(
+        part if not part or part in _ENDPOINT_WORDS else "{id}" for part in parts
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各桶计数 (不累计，最后一个为 +Inf), 总和]
+        self.values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = ([0] * (len(self.buckets) + 1), [0.0])
+            self.values[labels] = entry
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        bounds = [_format_number(bound) for bound in self.buckets] + ["+Inf"]
+        names = self.label_names + ("le",)
+        for key, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(names, key + (bound,))} {cumulative}"
+                )
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total[0])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# collector 在抓取时返回 (指标名, 类型, 说明, [(标签字典, 值)])
+Sample = Tuple[Dict[str, str], float]
+Collected = Tuple[str, str, str, List[Sample]]
+Collector = Callable[[], List[Collected]]
+
+
+class Metrics:
+    """一个服务实例的全部指标。NotionClient 与 MCP 工具层共用同一个实例"""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+        # --- MCP 工具 ---
+        self.tool_duration = self.histogram(
+            "mcp_tool_duration_seconds",
+            "Tool call latency including Notion requests and serialization.",
+            ("tool", "outcome"),
+        )
+        self.tool_serialization = self.histogram(
+            "mcp_tool_serialization_seconds",
+            "Time spent converting tool responses to Markdown or JSON.",
+            ("tool", "format"),
+        )
+        self.tool_response_bytes = self.histogram(
+            "mcp_tool_response_bytes",
+            "Size of tool responses returned to the client.",
+            ("tool",),
+            SIZE_BUCKETS,
+        )
+        self.tool_in_flight = self.gauge(
+            "mcp_tool_in_flight", "Tool calls currently executing.", ("tool",)
+        )
+
+        # --- Notion API ---
+        self.api_duration = self.histogram(
+            "notion_api_request_duration_seconds",
+            "Latency of individual HTTP attempts to the Notion API.",
+            ("method", "endpoint", "status"),
+        )
+        self.api_queue = self.histogram(
+            "notion_api_queue_seconds",
+            "Time a request waited for rate-limit tokens and retry backoff before each attempt.",
+        )
+        self.api_response_bytes = self.histogram(
+            "notion_api_response_bytes",
+            "Size of Notion API response bodies.",
+            ("method", "endpoint"),
+            SIZE_BUCKETS,
+        )
+        self.api_in_flight = self.gauge(
+            "notion_api_in_flight", "HTTP requests to the Notion API in progress."
+        )
+        self.api_in_flight.set(value=0)
+        self.api_retries = self.counter(
+            "notion_api_retries_total",
+            "Retried HTTP attempts to the Notion API (after 429 or 5xx).",
+            ("method", "endpoint"),
+        )
+        self.api_rate_limited = self.counter(
+            "notion_api_rate_limited_total",
+            "Notion API responses with status 429.",
+            ("method", "endpoint"),
+        )
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    @contextmanager
+    def api_attempt(
+        self, method: str, endpoint: str, attempt: int
+    ) -> Iterator[Dict[str, Any]]:
+        """记录一次 HTTP 尝试；调用方把状态码和响应大小写入返回的字典"""
+        endpoint = endpoint_label(endpoint)
+        if attempt:
+            self.api_retries.inc(method, endpoint)
+        result: Dict[str, Any] = {"status": "error", "bytes": None}
+        self.api_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            yield result
+        finally:
+            self.api_in_flight.dec()
+            status = result["status"]
+            self.api_duration.observe(
+                time.perf_counter() - started, method, endpoint, str(status)
+            )
+            if status == 429:
+                self.api_rate_limited.inc(method, endpoint)
+            if result["bytes"] is not None:
+                self.api_response_bytes.observe(result["bytes"], method, endpoint)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            if metric.values or not metric.label_names:
+                lines += metric.render()
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(
+                        f"{name}{_format_labels(list(labels), list(labels.values()))} "
+                        f"{_format_number(value)}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+def stats_collector(
+    prefix: str,
+    stats: Callable[[], Optional[Dict[str, Any]]],
+    counters: Sequence[str] = (),
+) -> Collector:
+    """把已有的 stats() 字典中的数值字段导出为 <prefix>_<字段>；counters 中的字段是计数器"""
+    return _stats_collector(prefix, lambda: [({}, stats())], counters)
+
+
+def labeled_stats_collector(
+    prefix: str,
+    stats: Callable[[], Dict[str, Optional[Dict[str, Any]]]],
+    label: str,
+    counters: Sequence[str] = (),
+) -> Collector:
+    """stats() 返回 {标签值: 统计字典}，例如多租户模式下每个租户一份统计；
+    同一字段的各份统计导出为同一个指标下以 label 区分的样本"""
+    return _stats_collector(
+        prefix,
+        lambda: [({label: value}, values) for value, values in stats().items()],
+        counters,
+    )
+
+
+def _stats_collector(
+    prefix: str,
+    sources: Callable[[], List[Tuple[Dict[str, str], Optional[Dict[str, Any]]]]],
+    counters: Sequence[str],
+) -> Collector:
+    def collect() -> List[Collected]:
+        collected: Dict[str, Collected] = {}
+        for labels, values in sources():
+            for key, value in (values or {}).items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', key)}"
+                kind = "gauge"
+                if key in counters:
+                    name, kind = f"{name}_total", "counter"
+                if name not in collected:
+                    description = (
+                        f"{prefix.replace('_', ' ')}: {key.replace('_', ' ')}."
+                    )
+                    collected[name] = (name, kind, description, [])
+                collected[name][3].append((labels, value))
+        return list(collected.values())
+
+    return collect
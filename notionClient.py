@@ -1,29 +1,126 @@
+import asyncio
+import functools
 import requests
-import json
-from typing import Optional, List, Dict, Any, Union
+import requests.adapters
+import httpx
+import logging
+from typing import (
+    Optional,
+    List,
+    Dict,
+    Any,
+    Union,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    Tuple,
+)
 import sys
-import io
+import time
+from datetime import datetime
 
-# 强制将标准输出流设置为 UTF-8
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+from aggregation import Aggregator
+from batchWriter import DEFAULT_CONCURRENCY, IdempotencyStore, run_batch
+from blockAppender import MAX_CHILDREN_PER_REQUEST, BlockAppender
+from columnarRows import ColumnarRows
+from localQuery import (
+    LOCAL_CURSOR_PREFIX,
+    DatabaseSnapshot,
+    LocalQueryEngine,
+    SnapshotTooLarge,
+    UnsupportedQuery,
+)
+from markdownParser import iter_blocks, iter_lines
+from markdownRenderer import convert_to_markdown
+from metrics import Metrics, stats_collector
+from rateLimiter import (
+    PRIORITY_BULK,
+    RequestScheduler,
+    RetryPolicy,
+    SharedTokenBucket,
+    SyncRequestScheduler,
+    current_priority,
+)
+from responseCache import ResponseCache, normalize_id
+from searchIndex import SearchIndex
+from singleFlight import SingleFlight, request_key
+from sqliteCache import SqliteCacheStore
+from sqliteIdempotency import SqliteIdempotencyStore
+from sqliteRateLimit import SqliteRateLimitStore, bucket_key
 
+# HTTP/2 为可选依赖 (pip install h2)
+try:
+    import h2  # noqa: F401
 
-# 模拟外部导入的 markdown 转换函数
-# 实际使用时你需要实现这个逻辑或导入对应的 Python 库
-def convert_to_markdown(response: Dict[str, Any]) -> str:
-    # 这是一个占位符，实际逻辑取决于原项目的 markdown/index.js
-    return json.dumps(response, indent=2, ensure_ascii=False)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+# 强制将标准输出流设置为 UTF-8 (原地修改，不替换 sys.stdout 对象)
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(encoding="utf-8")
+
+
+# Notion 分页接口单页最多返回 100 条
+MAX_PAGE_SIZE = 100
+
+# last_edited_time 的精度 (秒)
+TIMESTAMP_GRANULARITY = 60
+
+
+def _parse_timestamp(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _is_read_request(method: str, endpoint: str) -> bool:
+    """GET 以及只读的 POST 接口 (数据库查询、搜索)"""
+    return (
+        method == "GET"
+        or endpoint == "/search"
+        or (endpoint.startswith("/databases/") and endpoint.endswith("/query"))
+    )
+
+
+# 获取块树时不展开的块类型 (子页面/子数据库是独立的页面)
+UNEXPANDED_BLOCK_TYPES = {"child_page", "child_database"}
 
 
 class NotionClientWrapper:
-    def __init__(self, token: str):
+    def __init__(
+        self,
+        token: str,
+        max_connections: int = 10,
+        base_url: str = "https://api.notion.com/v1",
+        rate_limit: float = 3.0,
+        max_retries: int = 5,
+        metrics: Optional[Metrics] = None,
+    ):
         self.notion_token = token
-        self.base_url = "https://api.notion.com/v1"
+        self.base_url = base_url
         self.headers = {
             "Authorization": f"Bearer {self.notion_token}",
             "Content-Type": "application/json",
             "Notion-Version": "2022-06-28",
         }
+        # 使用 Session 复用 TCP/TLS 连接，而不是每次调用都重新握手
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_connections
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers.update(self.headers)
+        # 限速 + 429/5xx 重试
+        self.scheduler = SyncRequestScheduler(
+            rate_limit, retry_policy=RetryPolicy(max_retries=max_retries)
+        )
+        self.metrics = metrics or Metrics()
+
+    def close(self) -> None:
+        """关闭连接池"""
+        self._session.close()
 
     def _request(
         self,
@@ -34,10 +131,21 @@ class NotionClientWrapper:
     ) -> Dict[str, Any]:
         """内部通用请求处理方法"""
         url = f"{self.base_url}{endpoint}"
+        attempts = 0
+
+        def send() -> requests.Response:
+            nonlocal attempts
+            with self.metrics.api_attempt(method, endpoint, attempts) as attempt:
+                response = self._session.request(
+                    method=method, url=url, json=body, params=params
+                )
+                attempt["status"] = response.status_code
+                attempt["bytes"] = len(response.content)
+            attempts += 1
+            return response
+
         try:
-            response = requests.request(
-                method=method, url=url, headers=self.headers, json=body, params=params
-            )
+            response = self.scheduler.run(send)
             # 如果响应状态码是 4xx 或 5xx，抛出异常
             response.raise_for_status()
             return response.json()
@@ -47,9 +155,14 @@ class NotionClientWrapper:
             raise e
 
     def append_block_children(
-        self, block_id: str, children: List[Dict[str, Any]]
+        self,
+        block_id: str,
+        children: List[Dict[str, Any]],
+        after: Optional[str] = None,
     ) -> Dict[str, Any]:
         body: Dict[str, Any] = {"children": children}
+        if after:
+            body["after"] = after
         return self._request("PATCH", f"/blocks/{block_id}/children", body=body)
 
     def retrieve_block(self, block_id: str) -> Dict[str, Any]:
@@ -220,6 +333,1155 @@ class NotionClientWrapper:
 
         return self._request("POST", "/search", body=body)
 
+    # --- 自动翻页 ---
+
+    def pages(
+        self,
+        method: Callable[..., Dict[str, Any]],
+        *args: Any,
+        start_cursor: Optional[str] = None,
+        max_items: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """对任意支持 start_cursor / page_size 的分页方法自动翻页，逐页产出"""
+        cursor = start_cursor
+        remaining = max_items
+        while True:
+            size = MAX_PAGE_SIZE if remaining is None else min(MAX_PAGE_SIZE, remaining)
+            page = method(*args, start_cursor=cursor, page_size=size)
+            yield page
+            if remaining is not None:
+                remaining -= len(page.get("results", []))
+            cursor = page.get("next_cursor")
+            if not page.get("has_more") or not cursor:
+                return
+            if remaining is not None and remaining <= 0:
+                return
+
+    def iter_block_children(
+        self, block_id: str, max_items: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        for page in self.pages(
+            self.retrieve_block_children, block_id, max_items=max_items
+        ):
+            yield from page.get("results", [])
+
+    def iter_database_rows(
+        self,
+        database_id: str,
+        filter: Optional[Dict[str, Any]] = None,
+        sorts: Optional[List[Dict[str, Any]]] = None,
+        max_items: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        for page in self.pages(
+            self.query_database, database_id, filter, sorts, max_items=max_items
+        ):
+            yield from page.get("results", [])
+
+    def iter_users(self, max_items: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        for page in self.pages(self.list_all_users, max_items=max_items):
+            yield from page.get("results", [])
+
+    def iter_comments(
+        self, block_id: str, max_items: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        for page in self.pages(self.retrieve_comments, block_id, max_items=max_items):
+            yield from page.get("results", [])
+
+    def iter_search(
+        self,
+        query: Optional[str] = None,
+        filter: Optional[Dict[str, str]] = None,
+        sort: Optional[Dict[str, str]] = None,
+        max_items: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        for page in self.pages(self.search, query, filter, sort, max_items=max_items):
+            yield from page.get("results", [])
+
+    def to_markdown(self, response: Dict[str, Any]) -> str:
+        return convert_to_markdown(response)
+
+
+def children_variant(start_cursor: Optional[str], page_size: int) -> str:
+    """子块列表的缓存变体：同一父块的不同分页"""
+    return f"{start_cursor or ''}:{page_size}"
+
+
+class _BlockTreeWalk:
+    """一次块树遍历的状态：已获取的块数以及是否因 max_depth / max_blocks 截断"""
+
+    def __init__(
+        self,
+        client: "AsyncNotionClientWrapper",
+        max_depth: Optional[int],
+        max_blocks: Optional[int],
+        fresh: bool,
+    ):
+        self.client = client
+        self.max_depth = max_depth
+        self.max_blocks = max_blocks
+        self.fresh = fresh
+        self.count = 0
+        self.truncated = False
+
+    @property
+    def exhausted(self) -> bool:
+        # 已经有块因 max_blocks 被丢弃，之后不必再请求
+        return (
+            self.truncated
+            and self.max_blocks is not None
+            and self.count >= self.max_blocks
+        )
+
+    def take(self, blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """计入一页块，超出 max_blocks 的部分丢弃"""
+        if self.max_blocks is not None and self.count + len(blocks) > self.max_blocks:
+            blocks = blocks[: max(self.max_blocks - self.count, 0)]
+            self.truncated = True
+        self.count += len(blocks)
+        return blocks
+
+    async def children(self, parent_id: str, depth: int) -> List[Dict[str, Any]]:
+        children: List[Dict[str, Any]] = []
+        if self.fresh:
+            # 内容已变化，缓存中的子块列表可能过期
+            self.client.invalidate("children", parent_id)
+        # 按 100 条翻页，与不带参数的 retrieve_block_children 使用同一个缓存条目
+        pages = self.client.pages(self.client.retrieve_block_children, parent_id)
+        try:
+            async for page in pages:
+                children.extend(self.take(page.get("results", [])))
+                if self.exhausted:
+                    return children
+        finally:
+            await pages.aclose()
+        await self.expand(children, depth)
+        return children
+
+    async def expand(self, blocks: List[Dict[str, Any]], depth: int) -> None:
+        """并发获取 blocks 中可展开块的子树，写入各块的 "children" 字段"""
+        expandable = [
+            block
+            for block in blocks
+            if block.get("has_children")
+            and block.get("type") not in UNEXPANDED_BLOCK_TYPES
+        ]
+        if self.max_depth is not None and depth >= self.max_depth:
+            if expandable:
+                self.truncated = True
+            return
+
+        subtrees = await asyncio.gather(
+            *(self.children(block["id"], depth + 1) for block in expandable)
+        )
+        for block, subtree in zip(expandable, subtrees):
+            block["children"] = subtree
+
+
+# 每个客户端导出到 /metrics 的统计：指标前缀 -> (取统计的函数, 计数器字段)
+# 单客户端时直接注册；多租户时由调用方按租户标签汇总所有客户端 (见 build_mcp_app)
+ClientStats = Callable[["AsyncNotionClientWrapper"], Optional[Dict[str, Any]]]
+CLIENT_STATS: Dict[str, Tuple[ClientStats, Tuple[str, ...]]] = {
+    "notion_pool": (
+        lambda client: client.pool_stats(),
+        ("requests", "connections_created", "reused"),
+    ),
+    "notion_scheduler": (
+        lambda client: client.scheduler.stats(),
+        ("retries", "rate_limited"),
+    ),
+    "notion_cache": (
+        lambda client: client.cache.stats() if client.cache is not None else None,
+        ("hits", "store_hits", "misses", "evictions", "invalidations"),
+    ),
+    "notion_cache_revalidation": (
+        lambda client: client.revalidation_stats,
+        ("unchanged", "changed", "restored", "not_page"),
+    ),
+    "notion_single_flight": (
+        lambda client: client.single_flight.stats(),
+        ("calls", "shared"),
+    ),
+    "notion_idempotency": (
+        lambda client: client.idempotency.stats(),
+        ("replayed", "conflicts"),
+    ),
+}
+
+
+class AsyncNotionClientWrapper:
+    """NotionClientWrapper 的异步版本，基于 httpx 的非阻塞请求，方法与同步版本一一对应"""
+
+    def __init__(
+        self,
+        token: str,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        timeout: float = 30.0,
+        base_url: str = "https://api.notion.com/v1",
+        rate_limit: float = 3.0,
+        burst: Optional[float] = None,
+        max_retries: int = 5,
+        scheduler: Optional[RequestScheduler] = None,
+        cache_max_bytes: int = 64 * 1024 * 1024,
+        cache_ttls: Optional[Dict[str, float]] = None,
+        cache_path: Optional[str] = None,
+        search_index_path: Optional[str] = None,
+        local_query_ttl: float = 0.0,
+        local_query_threshold: int = 2,
+        local_query_max_rows: int = 10000,
+        metrics: Optional[Metrics] = None,
+        rate_limit_path: Optional[str] = None,
+        idempotency_path: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.notion_token = token
+        self.base_url = base_url
+        self.headers = {
+            "Authorization": f"Bearer {self.notion_token}",
+            "Content-Type": "application/json",
+            "Notion-Version": "2022-06-28",
+        }
+        if http2 and not _HTTP2_AVAILABLE:
+            logging.warning(
+                "HTTP/2 requested but 'h2' is not installed, using HTTP/1.1"
+            )
+            http2 = False
+        # 客户端持有的连接池：复用 keep-alive 连接，可选 HTTP/2 多路复用
+        self._client = httpx.AsyncClient(
+            headers=self.headers,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+            timeout=timeout,
+            # 自定义传输层 (例如测试中的 httpx.MockTransport)
+            transport=transport,
+        )
+        # 所有请求都经过调度器：令牌桶限速 (跨会话共享)、按优先级排队、429/5xx 重试
+        # 指定 rate_limit_path 时令牌桶状态保存在 SQLite 文件中，多个 worker 进程共享
+        # 同一个 integration 的限速额度 (以及 429 后的暂停)
+        self._rate_limit_store: Optional[SqliteRateLimitStore] = None
+        bucket = None
+        if rate_limit_path and scheduler is None:
+            self._rate_limit_store = SqliteRateLimitStore(rate_limit_path)
+            bucket = SharedTokenBucket(
+                self._rate_limit_store, bucket_key(token), rate_limit, burst
+            )
+        self.scheduler = scheduler or RequestScheduler(
+            rate_limit, burst, RetryPolicy(max_retries=max_retries), bucket
+        )
+        # 读缓存 (cache_max_bytes=0 时禁用)，写操作会让相关条目失效；
+        # 指定 cache_path 时使用 SQLite 文件作为持久化二级存储，重启后仍然有效
+        self.cache: Optional[ResponseCache] = None
+        if cache_max_bytes:
+            store = SqliteCacheStore(cache_path) if cache_path else None
+            self.cache = ResponseCache(cache_max_bytes, cache_ttls, store)
+        self.revalidation_stats = {
+            "unchanged": 0,
+            "changed": 0,
+            "restored": 0,
+            "not_page": 0,
+        }
+        # 合并同一时刻完全相同的只读请求
+        self.single_flight = SingleFlight()
+        # 可选的本地全文索引，随每次 API 响应增量更新
+        self.search_index: Optional[SearchIndex] = (
+            SearchIndex(search_index_path) if search_index_path else None
+        )
+        # 可选的本地查询引擎 (local_query_ttl=0 时禁用)：同一数据库在 TTL 内被重复查询时
+        # 拉取全部行建立快照，之后的 filter / sorts 在本地执行
+        self.local_queries: Optional[LocalQueryEngine] = (
+            LocalQueryEngine(
+                local_query_ttl, local_query_threshold, local_query_max_rows
+            )
+            if local_query_ttl
+            else None
+        )
+        if self.local_queries is not None and self.cache is not None:
+            # 其他 worker 写入数据库行时经由二级存储的失效日志通知本进程，丢弃对应的快照
+            self.cache.listeners.append(self._on_shared_invalidation)
+        # 批量写入的幂等键记录；指定 idempotency_path 时保存在 SQLite 文件中，
+        # 多个 worker 共享，重启后仍然有效
+        self.idempotency = IdempotencyStore(
+            store=SqliteIdempotencyStore(idempotency_path) if idempotency_path else None
+        )
+        # 连接池统计：总请求数 / 新建连接数，二者之差即连接复用次数
+        self._request_count = 0
+        self._connect_count = 0
+        # 请求延迟、响应大小、重试等指标；已有的统计在抓取 /metrics 时读取
+        # 多个客户端共用传入的 metrics 时 (多租户)，由调用方按 CLIENT_STATS 汇总各客户端的
+        # 统计，这里不注册 collector，避免同名指标重复
+        self.metrics = metrics or Metrics()
+        if metrics is None:
+            self._add_stats_collectors()
+
+    def _add_stats_collectors(self) -> None:
+        for prefix, (stats, counters) in CLIENT_STATS.items():
+            self.metrics.add_collector(
+                stats_collector(prefix, functools.partial(stats, self), counters)
+            )
+
+    async def aclose(self) -> None:
+        """关闭连接池 (在服务器 lifespan 结束时调用)"""
+        if self.local_queries is not None:
+            self.local_queries.close()
+        await self._client.aclose()
+        if self.cache is not None and self.cache.store is not None:
+            self.cache.store.close()
+        if self.search_index is not None:
+            self.search_index.close()
+        if self._rate_limit_store is not None:
+            self._rate_limit_store.close()
+        self.idempotency.close()
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        # httpx trace 扩展回调：每新建一条 TCP 连接都会触发该事件
+        if event_name == "connection.connect_tcp.started":
+            self._connect_count += 1
+
+    def pool_stats(self) -> Dict[str, int]:
+        """返回连接池状态：打开/空闲连接数以及连接复用次数"""
+        pool = getattr(self._client._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        return {
+            "open": sum(1 for conn in connections if not conn.is_closed()),
+            "idle": sum(1 for conn in connections if conn.is_idle()),
+            "requests": self._request_count,
+            "connections_created": self._connect_count,
+            "reused": max(self._request_count - self._connect_count, 0),
+        }
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        body: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """内部通用请求处理方法 (异步)"""
+        if _is_read_request(method, endpoint):
+            return await self.single_flight.do(
+                request_key(method, endpoint, body, params),
+                lambda: self._send(method, endpoint, body, params),
+            )
+        return await self._send(method, endpoint, body, params)
+
+    async def _send(
+        self,
+        method: str,
+        endpoint: str,
+        body: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        url = f"{self.base_url}{endpoint}"
+        attempts = 0
+        waiting_since = time.perf_counter()
+        try:
+
+            async def send() -> httpx.Response:
+                nonlocal attempts, waiting_since
+                self._request_count += 1
+                # 进入调度器 (或上一次尝试结束) 到发出请求：等待令牌与重试退避的时间
+                self.metrics.api_queue.observe(time.perf_counter() - waiting_since)
+                with self.metrics.api_attempt(method, endpoint, attempts) as attempt:
+                    response = await self._client.request(
+                        method=method,
+                        url=url,
+                        json=body,
+                        params=params,
+                        extensions={"trace": self._trace},
+                    )
+                    attempt["status"] = response.status_code
+                    attempt["bytes"] = len(response.content)
+                attempts += 1
+                waiting_since = time.perf_counter()
+                return response
+
+            response = await self.scheduler.run(send)
+            # 如果响应状态码是 4xx 或 5xx，抛出异常
+            response.raise_for_status()
+            data = response.json()
+            if self.search_index is not None:
+                self.search_index.observe(method, endpoint, data)
+            return data
+        except httpx.HTTPStatusError as e:
+            # 打印错误详情以便调试
+            print(f"Notion API Error: {e.response.text}")
+            raise e
+
+    # --- 缓存 ---
+
+    async def _cached(
+        self,
+        kind: str,
+        resource_id: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        variant: str = "",
+    ) -> Dict[str, Any]:
+        """先查缓存，未命中时请求 API 并写入缓存"""
+        if self.cache is None:
+            return await fetch()
+        cached = self.cache.get(kind, resource_id, variant)
+        if cached is not None:
+            return cached
+        stamp = None
+        if kind == "children":
+            restored = await self._restore_children(resource_id, variant)
+            if restored is not None:
+                return restored
+            # 子块列表本身没有 last_edited_time：记录所在页面的时间戳 (取于拉取之前)，
+            # 供过期后重新验证；不是页面的块没有时间戳，过期后直接重新拉取
+            stamp = self.cache.last_edited_time("page", resource_id)
+        response = await fetch()
+        self.cache.set(kind, resource_id, response, variant, last_edited_time=stamp)
+        return response
+
+    async def _restore_children(
+        self, page_id: str, variant: str
+    ) -> Optional[Dict[str, Any]]:
+        """二级存储中过期的子块列表：页面 last_edited_time 未变则续期复用
+
+        页面内任意块被编辑都会更新页面的 last_edited_time，一次页面请求即可确认
+        整页子块列表 (可能是多页分页结果) 是否仍然有效，服务器重启后同样适用。
+        """
+        assert self.cache is not None
+        expired = self.cache.get_expired("children", page_id, variant)
+        if expired is None:
+            return None
+        response, stamp, stored_at = expired
+        page = await self._request("GET", f"/pages/{page_id}")
+        self.cache.set("page", page_id, page)
+        if (
+            page.get("last_edited_time") != stamp
+            # last_edited_time 只精确到分钟，见 _revalidated
+            or stored_at < _parse_timestamp(stamp) + TIMESTAMP_GRANULARITY
+        ):
+            self.revalidation_stats["changed"] += 1
+            return None
+        self.revalidation_stats["restored"] += 1
+        self.cache.set("children", page_id, response, variant, last_edited_time=stamp)
+        return response
+
+    def invalidate(self, kind: str, resource_id: Optional[str]) -> None:
+        """使某个资源 (page / block / children / database / user / snapshot) 的缓存失效
+
+        database_rows 没有对应的缓存条目，只用于在失效日志中记录数据库的行被写入。
+        """
+        if self.cache is not None and resource_id:
+            self.cache.invalidate(kind, resource_id)
+
+    def _invalidate_rows(self, row: Dict[str, Any]) -> None:
+        """数据库行被写入：其他 worker 的本地查询快照需要丢弃"""
+        self.invalidate("database_rows", (row.get("parent") or {}).get("database_id"))
+
+    def _on_shared_invalidation(self, kind: str, resource_id: str) -> None:
+        assert self.local_queries is not None
+        if kind in ("database", "database_rows"):
+            self.local_queries.invalidate(resource_id)
+
+    def _invalidate_block(self, block_id: str, response: Dict[str, Any]) -> None:
+        """块被修改/删除：块本身、以及父级的子块列表都失效"""
+        self.invalidate("block", block_id)
+        self.invalidate("snapshot", block_id)
+        parent = response.get("parent") or {}
+        parent_id = parent.get(parent.get("type", ""))
+        if isinstance(parent_id, str):
+            self.invalidate("children", parent_id)
+            self.invalidate("block", parent_id)
+            self.invalidate("snapshot", parent_id)
+
+    async def _revalidated(
+        self,
+        block_id: str,
+        variant: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """条件重新验证：先做一次廉价的元数据请求，last_edited_time 未变则直接返回快照
+
+        只对页面 ID 生效：页面内任意块被编辑都会更新页面的 last_edited_time；
+        普通块的时间戳不反映嵌套子块的变化，对它们总是完整获取。
+        """
+        if self.cache is None:
+            return await fetch()
+        # 块的类型不会改变：缓存中已知不是页面时不必再发元数据请求
+        known = self.cache.get("block", block_id)
+        if known is not None and known.get("type") != "child_page":
+            self.revalidation_stats["not_page"] += 1
+            return await fetch()
+        meta = await self._request("GET", f"/blocks/{block_id}")
+        self.cache.set("block", block_id, meta)
+        if meta.get("type") != "child_page":
+            self.revalidation_stats["not_page"] += 1
+            return await fetch()
+        stamp = meta.get("last_edited_time")
+        snapshot = self.cache.get("snapshot", block_id, variant)
+        if (
+            stamp
+            and snapshot is not None
+            and snapshot["last_edited_time"] == stamp
+            # last_edited_time 只精确到分钟：快照必须取于该分钟之后，
+            # 否则同一分钟内的后续编辑不会改变时间戳
+            and snapshot["fetched_at"]
+            >= _parse_timestamp(stamp) + TIMESTAMP_GRANULARITY
+        ):
+            self.revalidation_stats["unchanged"] += 1
+            return snapshot["response"]
+
+        self.revalidation_stats["changed"] += 1
+        fetched_at = time.time()
+        response = await fetch()
+        if stamp:
+            self.cache.set(
+                "snapshot",
+                block_id,
+                {
+                    "last_edited_time": stamp,
+                    "fetched_at": fetched_at,
+                    "response": response,
+                },
+                variant,
+            )
+        return response
+
+    def cache_stats(self) -> Dict[str, Any]:
+        if self.cache is None:
+            return {"enabled": False}
+        return dict(self.cache.stats(), revalidation=self.revalidation_stats)
+
+    async def append_block_children(
+        self,
+        block_id: str,
+        children: List[Dict[str, Any]],
+        after: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"children": children}
+        if after:
+            body["after"] = after
+        response = await self._request(
+            "PATCH", f"/blocks/{block_id}/children", body=body
+        )
+        # 父块的子块列表、has_children 以及页面的 last_edited_time 都变了
+        self.invalidate("children", block_id)
+        self.invalidate("block", block_id)
+        self.invalidate("page", block_id)
+        self.invalidate("snapshot", block_id)
+        return response
+
+    async def _list_children(self, block_id: str) -> List[Dict[str, Any]]:
+        """一个块的全部直接子块 (用于定位刚创建的嵌套块)"""
+        page = await self.collect(self.pages(self.retrieve_block_children, block_id))
+        return page["results"]
+
+    async def append_blocks(
+        self,
+        block_id: str,
+        children: List[Dict[str, Any]],
+        after: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """追加任意数量、任意深度的块：自动拆分为符合 Notion 限制的多个请求"""
+        appender = BlockAppender(self.append_block_children, self._list_children)
+        created = await appender.run(block_id, children, after)
+        response: Dict[str, Any] = {
+            "object": "list",
+            "results": created,
+            "requests": appender.requests,
+        }
+        if appender.failures:
+            response["failed"] = appender.failures
+        return response
+
+    async def append_markdown(
+        self,
+        block_id: str,
+        markdown: Union[str, Iterable[str]],
+        after: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """把 Markdown 边解析边追加到 block_id 下，每次只保留一批顶层块
+
+        markdown 可以是字符串，也可以是逐行产出的可迭代对象 (例如打开的文件)。
+        """
+        appender = BlockAppender(self.append_block_children, self._list_children)
+        appended = 0
+        last_block_id = after
+        batch: List[Dict[str, Any]] = []
+        lines: List[int] = []
+
+        async def flush() -> bool:
+            nonlocal appended, last_block_id
+            created = await appender.run(block_id, batch, last_block_id)
+            for failure in appender.failures:
+                if failure["parent_id"] == block_id and "next_line" not in failure:
+                    # 换算为整个文档中的位置：调用方可以从 next_line 行起带上 after 重试
+                    failure["next_line"] = lines[failure["next_index"]]
+                    failure["next_index"] += appended
+            appended += len(created)
+            if created:
+                last_block_id = created[-1]["id"]
+            batch.clear()
+            lines.clear()
+            return not appender.failures
+
+        source = iter_lines(markdown) if isinstance(markdown, str) else markdown
+        for line, block in iter_blocks(source):
+            batch.append(block)
+            lines.append(line)
+            if len(batch) >= MAX_CHILDREN_PER_REQUEST and not await flush():
+                break
+        else:
+            if batch:
+                await flush()
+
+        response: Dict[str, Any] = {
+            "object": "append_summary",
+            "appended": appended,
+            "requests": appender.requests,
+            "last_block_id": last_block_id,
+        }
+        if appender.failures:
+            response["failed"] = appender.failures
+        return response
+
+    async def retrieve_block(self, block_id: str) -> Dict[str, Any]:
+        return await self._cached(
+            "block", block_id, lambda: self._request("GET", f"/blocks/{block_id}")
+        )
+
+    async def retrieve_block_children(
+        self,
+        block_id: str,
+        start_cursor: Optional[str] = None,
+        page_size: Optional[int] = None,
+        revalidate: bool = False,
+    ) -> Dict[str, Any]:
+        # 不指定 page_size 时 Notion 也返回 100 条：显式写出，使默认调用与块树遍历、
+        # 后台同步 (都按 100 条翻页) 共用同一个缓存条目
+        page_size = int(page_size) if page_size else MAX_PAGE_SIZE
+        params: Dict[str, Any] = {"page_size": page_size}
+        if start_cursor:
+            params["start_cursor"] = start_cursor
+
+        variant = children_variant(start_cursor, page_size)
+
+        async def fetch() -> Dict[str, Any]:
+            return await self._request(
+                "GET", f"/blocks/{block_id}/children", params=params
+            )
+
+        if revalidate:
+            return await self._revalidated(block_id, f"children:{variant}", fetch)
+        return await self._cached("children", block_id, fetch, variant)
+
+    async def delete_block(self, block_id: str) -> Dict[str, Any]:
+        response = await self._request("DELETE", f"/blocks/{block_id}")
+        self._invalidate_block(block_id, response)
+        self.invalidate("children", block_id)
+        self._invalidate_rows(response)
+        if self.local_queries is not None:
+            self.local_queries.remove_row(block_id)
+        return response
+
+    async def update_block(
+        self, block_id: str, block: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        response = await self._request("PATCH", f"/blocks/{block_id}", body=block)
+        self._invalidate_block(block_id, response)
+        return response
+
+    async def retrieve_page(self, page_id: str) -> Dict[str, Any]:
+        return await self._cached(
+            "page", page_id, lambda: self._request("GET", f"/pages/{page_id}")
+        )
+
+    async def update_page_properties(
+        self, page_id: str, properties: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"properties": properties}
+        response = await self._request("PATCH", f"/pages/{page_id}", body=body)
+        self.invalidate("page", page_id)
+        self.invalidate("block", page_id)
+        self._invalidate_rows(response)
+        if self.local_queries is not None:
+            self.local_queries.upsert_row(response)
+        return response
+
+    async def list_all_users(
+        self, start_cursor: Optional[str] = None, page_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        params: Dict[str, Any] = {}
+        if start_cursor:
+            params["start_cursor"] = start_cursor
+        if page_size:
+            params["page_size"] = page_size
+
+        return await self._request("GET", "/users", params=params)
+
+    async def retrieve_user(self, user_id: str) -> Dict[str, Any]:
+        return await self._cached(
+            "user", user_id, lambda: self._request("GET", f"/users/{user_id}")
+        )
+
+    async def retrieve_bot_user(self) -> Dict[str, Any]:
+        return await self._request("GET", "/users/me")
+
+    async def create_database(
+        self,
+        parent: Dict[str, Any],
+        properties: Dict[str, Any],
+        title: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"parent": parent, "properties": properties}
+        if title:
+            body["title"] = title
+
+        return await self._request("POST", "/databases", body=body)
+
+    async def query_database(
+        self,
+        database_id: str,
+        filter: Optional[Dict[str, Any]] = None,
+        sorts: Optional[List[Dict[str, Any]]] = None,
+        start_cursor: Optional[str] = None,
+        page_size: Optional[int] = None,
+        local: bool = True,
+    ) -> Dict[str, Any]:
+        """local=True 时优先在本地快照上执行查询，无法本地执行时回退到 API"""
+        if local and self.local_queries is not None:
+            response = await self._query_local(
+                database_id, filter, sorts, start_cursor, page_size
+            )
+            if response is not None:
+                return response
+
+        body: Dict[str, Any] = {}
+        if filter:
+            body["filter"] = filter
+        if sorts:
+            body["sorts"] = sorts
+        if start_cursor:
+            body["start_cursor"] = start_cursor
+        if page_size:
+            body["page_size"] = page_size
+
+        return await self._request("POST", f"/databases/{database_id}/query", body=body)
+
+    async def _query_local(
+        self,
+        database_id: str,
+        filter: Optional[Dict[str, Any]],
+        sorts: Optional[List[Dict[str, Any]]],
+        start_cursor: Optional[str],
+        page_size: Optional[int],
+    ) -> Optional[Dict[str, Any]]:
+        engine = self.local_queries
+        assert engine is not None
+        if self.cache is not None:
+            # 先应用其他 worker 的写入，避免在旧快照上查询
+            self.cache.apply_shared_invalidations()
+        # API 返回的游标只能继续交给 API
+        if start_cursor and not start_cursor.startswith(LOCAL_CURSOR_PREFIX):
+            return None
+        snapshot = engine.get(database_id)
+        if snapshot is None:
+            load = functools.partial(self._load_snapshot, database_id)
+            if not start_cursor:
+                # 快照在后台构建，本次 (以及构建完成前的) 查询走 API
+                if engine.should_snapshot(database_id):
+                    engine.build_in_background(database_id, load)
+                return None
+            # 本地游标的后续页：快照已过期或因写入失效，需要重建后才能继续
+            try:
+                snapshot = await engine.build(database_id, load)
+            except SnapshotTooLarge as e:
+                raise ValueError(f"{e}; restart the query without start_cursor")
+        try:
+            response = snapshot.query(filter, sorts, start_cursor, page_size)
+        except UnsupportedQuery as e:
+            if start_cursor:
+                raise ValueError(str(e))
+            logging.debug(f"Falling back to API query: {e}")
+            engine.fallbacks += 1
+            return None
+        engine.local_hits += 1
+        return response
+
+    async def aggregate_database(
+        self,
+        database_id: str,
+        filter: Optional[Dict[str, Any]] = None,
+        group_by: Optional[List[str]] = None,
+        aggregates: Optional[List[Dict[str, Any]]] = None,
+        max_items: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """逐页查询并折叠为聚合结果，只返回分组统计表"""
+        aggregator = Aggregator(group_by, aggregates)
+        async for row in self.iter_database_rows(
+            database_id, filter, max_items=max_items
+        ):
+            aggregator.add(row)
+        return aggregator.result()
+
+    async def snapshot_database(
+        self, database_id: str, max_rows: Optional[int] = None
+    ) -> DatabaseSnapshot:
+        """拉取数据库结构与全部行，建立本地查询快照；行数超过 max_rows 时抛出 SnapshotTooLarge"""
+        schema = await self.retrieve_database(database_id)
+        rows = await self.collect_rows(
+            self.pages(
+                functools.partial(self.query_database, local=False),
+                database_id,
+                max_items=max_rows + 1 if max_rows else None,
+            )
+        )
+        if max_rows and len(rows["results"]) > max_rows:
+            raise SnapshotTooLarge(
+                f"Database {database_id} has more than {max_rows} rows"
+            )
+        return DatabaseSnapshot(database_id, schema, rows["results"])
+
+    async def _load_snapshot(self, database_id: str) -> DatabaseSnapshot:
+        # 后台构建快照使用最低优先级，不与交互式请求争抢限速额度
+        current_priority.set(PRIORITY_BULK)
+        assert self.local_queries is not None
+        return await self.snapshot_database(database_id, self.local_queries.max_rows)
+
+    async def retrieve_database(self, database_id: str) -> Dict[str, Any]:
+        return await self._cached(
+            "database",
+            database_id,
+            lambda: self._request("GET", f"/databases/{database_id}"),
+        )
+
+    async def update_database(
+        self,
+        database_id: str,
+        title: Optional[List[Dict[str, Any]]] = None,
+        description: Optional[List[Dict[str, Any]]] = None,
+        properties: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        body: Dict[str, Any] = {}
+        if title:
+            body["title"] = title
+        if description:
+            body["description"] = description
+        if properties:
+            body["properties"] = properties
+
+        response = await self._request("PATCH", f"/databases/{database_id}", body=body)
+        self.invalidate("database", database_id)
+        if self.local_queries is not None:
+            self.local_queries.invalidate(database_id)
+        return response
+
+    async def create_database_item(
+        self, database_id: str, properties: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "parent": {"database_id": database_id},
+            "properties": properties,
+        }
+        response = await self._request("POST", "/pages", body=body)
+        self.invalidate("database_rows", database_id)
+        if self.local_queries is not None:
+            self.local_queries.upsert_row(response)
+        return response
+
+    async def batch_create_database_items(
+        self,
+        database_id: str,
+        items: List[Dict[str, Any]],
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> Dict[str, Any]:
+        """items: [{"properties": {...}, "idempotency_key": "..."}]，逐条返回结果"""
+        return await run_batch(
+            items,
+            lambda item: self.create_database_item(
+                database_id, item.get("properties") or {}
+            ),
+            self.idempotency,
+            concurrency,
+            scope=f"database:{normalize_id(database_id)}",
+        )
+
+    async def batch_update_page_properties(
+        self,
+        items: List[Dict[str, Any]],
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> Dict[str, Any]:
+        """items: [{"page_id": "...", "properties": {...}, "idempotency_key": "..."}]"""
+
+        async def update(item: Dict[str, Any]) -> Dict[str, Any]:
+            if not item.get("page_id"):
+                raise ValueError("Missing page_id")
+            return await self.update_page_properties(
+                item["page_id"], item.get("properties") or {}
+            )
+
+        return await run_batch(
+            items, update, self.idempotency, concurrency, scope="pages"
+        )
+
+    async def create_comment(
+        self,
+        parent: Optional[Dict[str, str]] = None,
+        discussion_id: Optional[str] = None,
+        rich_text: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        body: Dict[str, Any] = {}
+        if rich_text:
+            body["rich_text"] = rich_text
+        if parent:
+            body["parent"] = parent
+        if discussion_id:
+            body["discussion_id"] = discussion_id
+
+        return await self._request("POST", "/comments", body=body)
+
+    async def retrieve_comments(
+        self,
+        block_id: str,
+        start_cursor: Optional[str] = None,
+        page_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"block_id": block_id}
+        if start_cursor:
+            params["start_cursor"] = start_cursor
+        if page_size:
+            params["page_size"] = page_size
+
+        return await self._request("GET", "/comments", params=params)
+
+    async def search(
+        self,
+        query: Optional[str] = None,
+        filter: Optional[Dict[str, str]] = None,
+        sort: Optional[Dict[str, str]] = None,
+        start_cursor: Optional[str] = None,
+        page_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        body: Dict[str, Any] = {}
+        if query:
+            body["query"] = query
+        if filter:
+            body["filter"] = filter
+        if sort:
+            body["sort"] = sort
+        if start_cursor:
+            body["start_cursor"] = start_cursor
+        if page_size:
+            body["page_size"] = page_size
+
+        return await self._request("POST", "/search", body=body)
+
+    # --- 自动翻页 ---
+
+    async def _iter_pages(
+        self,
+        fetch_page: Callable[[Optional[str], int], Awaitable[Dict[str, Any]]],
+        start_cursor: Optional[str] = None,
+        max_items: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """逐页产出结果，在消费当前页的同时预取下一页"""
+        remaining = max_items
+
+        def next_size() -> int:
+            # 只请求还需要的条数，保证截断点落在页边界上，next_cursor 仍然有效
+            return MAX_PAGE_SIZE if remaining is None else min(MAX_PAGE_SIZE, remaining)
+
+        task: Optional[asyncio.Future] = asyncio.ensure_future(
+            fetch_page(start_cursor, next_size())
+        )
+        try:
+            while task is not None:
+                page = await task
+                task = None
+                if remaining is not None:
+                    remaining -= len(page.get("results", []))
+                if (
+                    page.get("has_more")
+                    and page.get("next_cursor")
+                    and (remaining is None or remaining > 0)
+                ):
+                    task = asyncio.ensure_future(
+                        fetch_page(page["next_cursor"], next_size())
+                    )
+                yield page
+        finally:
+            if task is not None:
+                task.cancel()
+
+    def pages(
+        self,
+        method: Callable[..., Awaitable[Dict[str, Any]]],
+        *args: Any,
+        start_cursor: Optional[str] = None,
+        max_items: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """对任意支持 start_cursor / page_size 的分页方法自动翻页"""
+        return self._iter_pages(
+            lambda cursor, size: method(*args, start_cursor=cursor, page_size=size),
+            start_cursor,
+            max_items,
+        )
+
+    async def collect(self, pages: AsyncIterator[Dict[str, Any]]) -> Dict[str, Any]:
+        """把多页结果合并为一个 list 响应，保留最后一页的 has_more / next_cursor"""
+        results: List[Dict[str, Any]] = []
+        last: Dict[str, Any] = {}
+        async for page in pages:
+            results.extend(page.get("results", []))
+            last = page
+        return {
+            "object": "list",
+            "results": results,
+            "has_more": bool(last.get("has_more")),
+            "next_cursor": last.get("next_cursor"),
+        }
+
+    async def collect_rows(
+        self, pages: AsyncIterator[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """与 collect 相同，但数据库行逐页写入列式表，不保留原始 JSON"""
+        rows = ColumnarRows()
+        last: Dict[str, Any] = {}
+        async for page in pages:
+            rows.extend(page.get("results", []))
+            last = page
+        return {
+            "object": "list",
+            "results": rows,
+            "has_more": bool(last.get("has_more")),
+            "next_cursor": last.get("next_cursor"),
+        }
+
+    async def _iter_items(
+        self, pages: AsyncIterator[Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        async for page in pages:
+            for item in page.get("results", []):
+                yield item
+
+    def iter_block_children(
+        self, block_id: str, max_items: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        return self._iter_items(
+            self.pages(self.retrieve_block_children, block_id, max_items=max_items)
+        )
+
+    def iter_database_rows(
+        self,
+        database_id: str,
+        filter: Optional[Dict[str, Any]] = None,
+        sorts: Optional[List[Dict[str, Any]]] = None,
+        max_items: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        return self._iter_items(
+            self.pages(
+                self.query_database, database_id, filter, sorts, max_items=max_items
+            )
+        )
+
+    def iter_users(
+        self, max_items: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        return self._iter_items(self.pages(self.list_all_users, max_items=max_items))
+
+    def iter_comments(
+        self, block_id: str, max_items: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        return self._iter_items(
+            self.pages(self.retrieve_comments, block_id, max_items=max_items)
+        )
+
+    def iter_search(
+        self,
+        query: Optional[str] = None,
+        filter: Optional[Dict[str, str]] = None,
+        sort: Optional[Dict[str, str]] = None,
+        max_items: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        return self._iter_items(
+            self.pages(self.search, query, filter, sort, max_items=max_items)
+        )
+
+    # --- 整棵块树 ---
+
+    async def retrieve_block_tree(
+        self,
+        block_id: str,
+        max_depth: Optional[int] = None,
+        max_blocks: Optional[int] = None,
+        revalidate: bool = False,
+    ) -> Dict[str, Any]:
+        """递归获取一个页面/块下的完整块树，兄弟子树并发获取 (受调度器限速)
+
+        每个有子块的块会带上 "children" 字段；子页面/子数据库不展开。
+        max_depth 限制层数 (1 = 只取直接子块)，max_blocks 限制总块数。
+        revalidate=True 时根据 last_edited_time 判断是否可以直接返回上次的块树。
+        """
+        if revalidate:
+            return await self._revalidated(
+                block_id,
+                f"tree:{max_depth}:{max_blocks}",
+                lambda: self._walk_block_tree(block_id, max_depth, max_blocks, True),
+            )
+        return await self._walk_block_tree(block_id, max_depth, max_blocks, False)
+
+    async def _walk_block_tree(
+        self,
+        block_id: str,
+        max_depth: Optional[int],
+        max_blocks: Optional[int],
+        fresh: bool,
+    ) -> Dict[str, Any]:
+        walk = _BlockTreeWalk(self, max_depth, max_blocks, fresh)
+        results = await walk.children(block_id, 1)
+        return {
+            "object": "list",
+            "results": results,
+            "block_count": walk.count,
+            "truncated": walk.truncated,
+        }
+
+    async def iter_block_tree(
+        self,
+        block_id: str,
+        max_depth: Optional[int] = None,
+        max_blocks: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """与 retrieve_block_tree 相同，但按顶层子块逐页产出 (每个块连同其子树)，
+        调用方处理完一页即可释放，内存只与单页顶层块的子树大小有关"""
+        walk = _BlockTreeWalk(self, max_depth, max_blocks, False)
+        pages = self.pages(self.retrieve_block_children, block_id)
+        try:
+            async for page in pages:
+                blocks = walk.take(page.get("results", []))
+                if not walk.exhausted:
+                    await walk.expand(blocks, 1)
+                yield {
+                    "object": "list",
+                    "results": blocks,
+                    "block_count": walk.count,
+                    "truncated": walk.truncated,
+                }
+                if walk.exhausted:
+                    break
+        finally:
+            await pages.aclose()
+
+    # --- 本地全文搜索 ---
+
+    def search_local(self, query: str, limit: int = 20) -> Dict[str, Any]:
+        """在本地全文索引中搜索已获取过的页面、块和数据库行的内容"""
+        if self.search_index is None:
+            raise ValueError(
+                "Local search index is not enabled (set search_index_path)"
+            )
+        return {"object": "list", "results": self.search_index.search(query, limit)}
+
     def to_markdown(self, response: Dict[str, Any]) -> str:
         return convert_to_markdown(response)
 
@@ -1,18 +1,38 @@
-import asyncio
+import functools
 import json
 import logging
 import os
-from typing import Dict, Any, List, Optional, Set
+import time
+from typing import IO, AsyncIterator, Dict, Any, List, Optional, Set
 from mcp.server.lowlevel import Server
 from mcp.types import Tool, TextContent, CallToolRequest, ListToolsRequest
 from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
 from starlette.applications import Starlette
-from starlette.routing import Mount
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
 from starlette.types import Receive, Scope, Send
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+# 文件锁 (多 worker 时选出运行后台同步的进程)；Windows 上不可用
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore[assignment]
+
+from batchWriter import DEFAULT_CONCURRENCY
+from columnarRows import ColumnarRows
+from metrics import Metrics, labeled_stats_collector, stats_collector
 
 # 导入你之前转换好的 Notion 客户端
-from notionClient import NotionClientWrapper
+from notionClient import CLIENT_STATS, AsyncNotionClientWrapper
+from rateLimiter import PRIORITY_BULK, PRIORITY_INTERACTIVE, current_priority
+from syncEngine import SyncEngine
+from tenantPool import Tenants, TenantPool, check_tenants, resolve_token, tenant_path
+from toolRegistry import ToolRegistry
+
+import projection
 
 # 假设你有一个 schemas.py 文件定义了工具结构，或者在这里定义
 import schemas
@@ -20,215 +40,590 @@ import schemas
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 
+# 流式响应中不随每页输出、只在最后的摘要中给出的字段
+STREAM_SUMMARY_FIELDS = ("has_more", "next_cursor", "block_count", "truncated")
+
+# 当前工具调用使用的 Notion 客户端 (多租户时按请求头选择)
+current_client: ContextVar[AsyncNotionClientWrapper] = ContextVar("current_client")
+
+
+def _json_default(value: Any) -> Any:
+    # 列式表示的数据库行在输出 JSON 时才还原为 API 格式
+    if isinstance(value, ColumnarRows):
+        return value.to_list()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _acquire_lock(path: str) -> Optional[IO[str]]:
+    """非阻塞地获取文件锁，成功时返回需要一直持有的文件对象"""
+    if fcntl is None:
+        # 不支持 flock 的平台：每个进程都视为获得了锁
+        return open(path, "a")
+    lock_file = open(path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def _prepare_state_dir(path: str) -> None:
+    """创建共享状态目录：只有当前用户可以访问，否则拒绝启动
+
+    目录中的缓存与幂等键包含 Notion 内容，可被其他用户读取或篡改的目录不能使用。
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        raise ValueError(f"Shared state directory {path} is not owned by this user")
+    if info.st_mode & 0o077:
+        raise ValueError(
+            f"Shared state directory {path} is accessible by other users "
+            f"(mode {oct(info.st_mode & 0o777)}); run chmod 700 on it"
+        )
+
+
+def _client_stats(client: AsyncNotionClientWrapper) -> Dict[str, Any]:
+    return {
+        "pool": client.pool_stats(),
+        "scheduler": client.scheduler.stats(),
+        "cache": client.cache_stats(),
+        "single_flight": client.single_flight.stats(),
+        "idempotency": client.idempotency.stats(),
+        "search_index": (
+            client.search_index.stats()
+            if client.search_index is not None
+            else {"enabled": False}
+        ),
+        "local_query": (
+            client.local_queries.stats()
+            if client.local_queries is not None
+            else {"enabled": False}
+        ),
+    }
+
 
-async def create_mcp_app(
-    notion_token: str, enabled_tools_set: Set[str], enable_markdown_conversion: bool
-):
+def build_mcp_app(
+    notion_token: Optional[str],
+    enabled_tools_set: Set[str],
+    enable_markdown_conversion: bool,
+    client_options: Optional[Dict[str, Any]] = None,
+    sync_options: Optional[Dict[str, Any]] = None,
+    shared_state_dir: Optional[str] = None,
+    multi_tenant: bool = False,
+    tenants: Optional[Tenants] = None,
+    max_tenants: int = 32,
+    allow_default_token: bool = False,
+) -> Starlette:
+    """创建 ASGI 应用 (同步函数，可以在 uvicorn/gunicorn 的 worker 中作为工厂调用)
+
+    shared_state_dir：多 worker 部署时各进程共享的状态目录。限速令牌桶、二级缓存与
+    批量写入的幂等键保存在其中的 SQLite 文件里，后台同步只在持有锁的一个 worker 中运行；
+    MCP 会话使用无状态模式，请求可以落在任意 worker 上。
+
+    multi_tenant：每个请求按 X-Notion-Tenant (查 tenants 表，Bearer 头携带租户 secret)
+    或 Bearer token 选择 Notion token，每个 token 使用独立的客户端，最多保留 max_tenants 个；
+    未携带凭据的请求被拒绝，allow_default_token 为 True 时改用 notion_token。
+    """
+    multi_tenant = multi_tenant or bool(tenants)
+    if tenants:
+        check_tenants(tenants)
+    if not multi_tenant and not notion_token:
+        raise ValueError("notion_token is required unless multi_tenant is enabled")
     # 1. 初始化 Server
     server = Server("Notion MCP Server")
 
-    # 2. 初始化 Notion 客户端
-    notion_client = NotionClientWrapper(notion_token)
-
-    # 3. 注册：列出工具 (List Tools)
+    # 2. 初始化 Notion 客户端 (异步版本，避免阻塞事件循环)
+    # client_options 透传连接池配置 (max_connections / keepalive_expiry / http2 ...)
+    client_options = dict(client_options or {})
+    if shared_state_dir:
+        _prepare_state_dir(shared_state_dir)
+        client_options.setdefault(
+            "rate_limit_path", os.path.join(shared_state_dir, "ratelimit.sqlite")
+        )
+        client_options.setdefault(
+            "idempotency_path", os.path.join(shared_state_dir, "idempotency.sqlite")
+        )
+        if client_options.get("cache_max_bytes", 1):
+            client_options.setdefault(
+                "cache_path", os.path.join(shared_state_dir, "cache.sqlite")
+            )
+    if sync_options and multi_tenant:
+        logging.warning("Background sync is not supported in multi-tenant mode")
+        sync_options = None
+    if sync_options:
+        # 后台同步会在一个轮询周期内发现变化并让旧缓存失效，
+        # 因此内容类缓存可以放宽到同步允许的陈旧时间
+        staleness = sync_options.pop("staleness", 600.0)
+        client_options["cache_ttls"] = dict(
+            {kind: staleness for kind in ("page", "block", "children", "database")},
+            **client_options.get("cache_ttls", {}),
+        )
+    notion_client: Optional[AsyncNotionClientWrapper] = None
+    tenant_pool: Optional[TenantPool] = None
+    if multi_tenant:
+        # 所有租户共用一组请求指标；读缓存容量在租户之间均分，总内存有上限，
+        # 持久化缓存与本地索引每个租户一个文件
+        metrics = Metrics()
+        tenant_options = dict(client_options, metrics=metrics)
+        tenant_options["cache_max_bytes"] = tenant_options.get(
+            "cache_max_bytes", 64 * 1024 * 1024
+        ) // max(1, max_tenants)
+
+        def create_tenant_client(token: str, key: str) -> AsyncNotionClientWrapper:
+            options = dict(tenant_options)
+            for name in ("cache_path", "search_index_path", "idempotency_path"):
+                options[name] = tenant_path(options.get(name), key)
+            return AsyncNotionClientWrapper(token, **options)
+
+        tenant_pool = TenantPool(create_tenant_client, max_tenants)
+        metrics.add_collector(
+            stats_collector(
+                "notion_tenants",
+                tenant_pool.stats,
+                counters=("created", "hits", "evicted"),
+            )
+        )
+        # 各租户客户端的缓存、连接池、调度器等统计按 tenant 标签 (token 哈希) 导出
+        for prefix, (stats, counters) in CLIENT_STATS.items():
+            metrics.add_collector(
+                labeled_stats_collector(
+                    prefix,
+                    functools.partial(tenant_pool.client_stats, stats),
+                    "tenant",
+                    counters,
+                )
+            )
+    else:
+        notion_client = AsyncNotionClientWrapper(notion_token, **client_options)
+        # 工具层与 Notion 客户端共用一组指标，由 /metrics 导出
+        metrics = notion_client.metrics
+
+    # 可选的后台增量同步
+    sync_engine = SyncEngine(notion_client, **sync_options) if sync_options else None
+
+    if sync_engine is not None:
+        metrics.add_collector(
+            stats_collector(
+                "notion_sync",
+                sync_engine.stats,
+                counters=("cycles", "synced", "errors"),
+            )
+        )
+
+    # 3. 工具注册表：名字 -> 处理函数、参数校验器、调度优先级，只构建一次
+    # 交互式读取优先于写入获得限速令牌，批量写入最后
+    registry = ToolRegistry(enabled_tools_set)
+    read = functools.partial(registry.register, priority=PRIORITY_INTERACTIVE)
+    write = registry.register
+    bulk = functools.partial(registry.register, priority=PRIORITY_BULK)
+
+    # 处理函数通过 client() 取得本次调用的客户端
+    client = current_client.get
+
+    # --- 辅助函数：分页工具，fetch_all / max_items 时在服务端自动翻页 ---
+    # stream 时直接返回逐页的迭代器，由 handle_call_tool 逐页渲染
+    async def paginated(
+        arguments: Dict[str, Any], method, *args, columnar=False
+    ) -> Any:
+        max_items = arguments.get("max_items")
+        if arguments.get("stream"):
+            return client().pages(
+                method,
+                *args,
+                start_cursor=arguments.get("start_cursor"),
+                max_items=int(max_items) if max_items else None,
+            )
+        if arguments.get("fetch_all") or max_items:
+            # 数据库行跨页合并时使用列式表示
+            collect = client().collect_rows if columnar else client().collect
+            return await collect(
+                client().pages(
+                    method,
+                    *args,
+                    start_cursor=arguments.get("start_cursor"),
+                    max_items=int(max_items) if max_items else None,
+                )
+            )
+        return await method(
+            *args,
+            start_cursor=arguments.get("start_cursor"),
+            page_size=arguments.get("page_size"),
+        )
+
+    # --- Blocks ---
+
+    @write(schemas.append_block_children_tool)
+    async def append_block_children(arguments: Dict[str, Any]) -> Any:
+        return await client().append_blocks(
+            arguments["block_id"], arguments["children"], arguments.get("after")
+        )
+
+    @bulk(schemas.append_markdown_tool)
+    async def append_markdown(arguments: Dict[str, Any]) -> Any:
+        return await client().append_markdown(
+            arguments["block_id"], arguments["markdown"], arguments.get("after")
+        )
+
+    @read(schemas.retrieve_block_tool)
+    async def retrieve_block(arguments: Dict[str, Any]) -> Any:
+        return await client().retrieve_block(arguments["block_id"])
+
+    @read(schemas.retrieve_block_children_tool)
+    async def retrieve_block_children(arguments: Dict[str, Any]) -> Any:
+        block_id = arguments["block_id"]
+        if arguments.get("revalidate") and not (
+            arguments.get("fetch_all")
+            or arguments.get("max_items")
+            or arguments.get("stream")
+        ):
+            return await client().retrieve_block_children(
+                block_id,
+                arguments.get("start_cursor"),
+                arguments.get("page_size"),
+                revalidate=True,
+            )
+        return await paginated(arguments, client().retrieve_block_children, block_id)
+
+    @read(schemas.retrieve_block_tree_tool)
+    async def retrieve_block_tree(arguments: Dict[str, Any]) -> Any:
+        max_depth = arguments.get("max_depth")
+        max_blocks = arguments.get("max_blocks")
+        if arguments.get("stream"):
+            return client().iter_block_tree(
+                arguments["block_id"],
+                int(max_depth) if max_depth else None,
+                int(max_blocks) if max_blocks else None,
+            )
+        return await client().retrieve_block_tree(
+            arguments["block_id"],
+            int(max_depth) if max_depth else None,
+            int(max_blocks) if max_blocks else None,
+            revalidate=bool(arguments.get("revalidate")),
+        )
+
+    @write(schemas.delete_block_tool)
+    async def delete_block(arguments: Dict[str, Any]) -> Any:
+        return await client().delete_block(arguments["block_id"])
+
+    @write(schemas.update_block_tool)
+    async def update_block(arguments: Dict[str, Any]) -> Any:
+        return await client().update_block(arguments["block_id"], arguments["block"])
+
+    # --- Pages ---
+
+    @read(schemas.retrieve_page_tool)
+    async def retrieve_page(arguments: Dict[str, Any]) -> Any:
+        return await client().retrieve_page(arguments["page_id"])
+
+    @write(schemas.update_page_properties_tool)
+    async def update_page_properties(arguments: Dict[str, Any]) -> Any:
+        return await client().update_page_properties(
+            arguments["page_id"], arguments["properties"]
+        )
+
+    # --- Users ---
+
+    @read(schemas.list_all_users_tool)
+    async def list_all_users(arguments: Dict[str, Any]) -> Any:
+        return await paginated(arguments, client().list_all_users)
+
+    @read(schemas.retrieve_user_tool)
+    async def retrieve_user(arguments: Dict[str, Any]) -> Any:
+        return await client().retrieve_user(arguments["user_id"])
+
+    @read(schemas.retrieve_bot_user_tool)
+    async def retrieve_bot_user(arguments: Dict[str, Any]) -> Any:
+        return await client().retrieve_bot_user()
+
+    # --- Databases ---
+
+    @write(schemas.create_database_tool)
+    async def create_database(arguments: Dict[str, Any]) -> Any:
+        return await client().create_database(
+            arguments["parent"], arguments["properties"], arguments.get("title")
+        )
+
+    @read(schemas.query_database_tool)
+    async def query_database(arguments: Dict[str, Any]) -> Any:
+        return await paginated(
+            arguments,
+            functools.partial(
+                client().query_database, local=arguments.get("local", True)
+            ),
+            arguments["database_id"],
+            arguments.get("filter"),
+            arguments.get("sorts"),
+            columnar=True,
+        )
+
+    @read(schemas.retrieve_database_tool)
+    async def retrieve_database(arguments: Dict[str, Any]) -> Any:
+        return await client().retrieve_database(arguments["database_id"])
+
+    @write(schemas.update_database_tool)
+    async def update_database(arguments: Dict[str, Any]) -> Any:
+        return await client().update_database(
+            arguments["database_id"],
+            arguments.get("title"),
+            arguments.get("description"),
+            arguments.get("properties"),
+        )
+
+    @write(schemas.create_database_item_tool)
+    async def create_database_item(arguments: Dict[str, Any]) -> Any:
+        return await client().create_database_item(
+            arguments["database_id"], arguments["properties"]
+        )
+
+    @bulk(schemas.batch_create_database_items_tool)
+    async def batch_create_database_items(arguments: Dict[str, Any]) -> Any:
+        return await client().batch_create_database_items(
+            arguments["database_id"],
+            arguments["items"],
+            int(arguments.get("concurrency") or DEFAULT_CONCURRENCY),
+        )
+
+    @bulk(schemas.batch_update_page_properties_tool)
+    async def batch_update_page_properties(arguments: Dict[str, Any]) -> Any:
+        return await client().batch_update_page_properties(
+            arguments["items"],
+            int(arguments.get("concurrency") or DEFAULT_CONCURRENCY),
+        )
+
+    # --- Comments ---
+
+    @write(schemas.create_comment_tool)
+    async def create_comment(arguments: Dict[str, Any]) -> Any:
+        return await client().create_comment(
+            arguments.get("parent"),
+            arguments.get("discussion_id"),
+            arguments["rich_text"],
+        )
+
+    @read(schemas.retrieve_comments_tool)
+    async def retrieve_comments(arguments: Dict[str, Any]) -> Any:
+        return await paginated(
+            arguments, client().retrieve_comments, arguments["block_id"]
+        )
+
+    # --- Search / analytics ---
+
+    @read(schemas.search_tool)
+    async def search(arguments: Dict[str, Any]) -> Any:
+        return await paginated(
+            arguments,
+            client().search,
+            arguments.get("query"),
+            arguments.get("filter"),
+            arguments.get("sort"),
+        )
+
+    @read(schemas.local_search_tool)
+    async def local_search(arguments: Dict[str, Any]) -> Any:
+        limit = arguments.get("limit")
+        return client().search_local(arguments["query"], int(limit) if limit else 20)
+
+    @read(schemas.aggregate_database_tool)
+    async def aggregate_database(arguments: Dict[str, Any]) -> Any:
+        max_items = arguments.get("max_items")
+        return await client().aggregate_database(
+            arguments["database_id"],
+            arguments.get("filter"),
+            arguments.get("group_by"),
+            arguments.get("aggregates"),
+            int(max_items) if max_items else None,
+        )
+
+    # 4. 注册：列出工具 (List Tools)，返回缓存的已启用工具定义
     @server.list_tools()
     async def handle_list_tools() -> List[Tool]:
-        # 这里列出所有可用的工具定义 (对应 TS 中的 schemas.*)
-        all_tools = [
-            schemas.append_block_children_tool,
-            schemas.retrieve_block_tool,
-            schemas.retrieve_block_children_tool,
-            schemas.delete_block_tool,
-            schemas.update_block_tool,
-            schemas.retrieve_page_tool,
-            schemas.update_page_properties_tool,
-            schemas.list_all_users_tool,
-            schemas.retrieve_user_tool,
-            schemas.retrieve_bot_user_tool,
-            schemas.create_database_tool,
-            schemas.query_database_tool,
-            schemas.retrieve_database_tool,
-            schemas.update_database_tool,
-            schemas.create_database_item_tool,
-            schemas.create_comment_tool,
-            schemas.retrieve_comments_tool,
-            schemas.search_tool,
-        ]
-
-        # 过滤工具
-        return [tool for tool in all_tools if tool.name in enabled_tools_set]
-
-    # 4. 注册：调用工具 (Call Tool)
-    @server.call_tool()
+        return registry.list_tools()
+
+    # 单租户时总是同一个客户端；多租户时按 HTTP 请求头选择，调用期间不会被淘汰关闭
+    @asynccontextmanager
+    async def acquire_client():
+        if tenant_pool is None:
+            yield notion_client
+            return
+        request = server.request_context.request
+        headers = request.headers if request is not None else {}
+        default = notion_token if allow_default_token else None
+        async with tenant_pool.acquire(
+            resolve_token(headers, tenants, default)
+        ) as tenant_client:
+            yield tenant_client
+
+    # --- 响应格式处理 ---
+    def render(response: Any, arguments: Dict[str, Any], label: str) -> str:
+        """字段投影后转换为 Markdown 或 JSON 文本"""
+        started = time.perf_counter()
+        response = projection.project(response, arguments.get("fields"))
+        requested_format = arguments.get("format", "markdown")
+        if enable_markdown_conversion and requested_format == "markdown":
+            output_format = "markdown"
+            text = client().to_markdown(response)
+        else:
+            output_format = "json"
+            text = projection.dumps(
+                response, bool(arguments.get("compact")), default=_json_default
+            )
+        metrics.tool_serialization.observe(
+            time.perf_counter() - started, label, output_format
+        )
+        return text
+
+    async def render_pages(
+        pages: AsyncIterator[Dict[str, Any]], arguments: Dict[str, Any], label: str
+    ) -> List[str]:
+        """流式响应：每页到达后立即渲染为一段文本并释放解析后的 JSON，
+        请求带有 progressToken 时每页发送一次进度通知；分页与截断信息放在最后的摘要中"""
+        context = server.request_context
+        progress_token = context.meta.progressToken if context.meta else None
+        total = arguments.get("max_items") or arguments.get("max_blocks")
+        texts: List[str] = []
+        summary: Dict[str, Any] = {}
+        count = 0
+        try:
+            async for page in pages:
+                summary = {
+                    key: page[key] for key in STREAM_SUMMARY_FIELDS if key in page
+                }
+                results = page.get("results", [])
+                count = page.get("block_count", count + len(results))
+                text = render({"object": "list", "results": results}, arguments, label)
+                del page, results
+                if text:
+                    texts.append(text)
+                if progress_token is not None:
+                    await context.session.send_progress_notification(
+                        progress_token,
+                        count,
+                        float(total) if total else None,
+                        message=f"Fetched {count} items",
+                        related_request_id=context.request_id,
+                    )
+        finally:
+            await pages.aclose()
+        text = render(dict(object="list", results=[], **summary), arguments, label)
+        if text.strip() or not texts:
+            texts.append(text)
+        return texts
+
+    # 5. 注册：调用工具 (Call Tool)
+    # 参数由注册表中预编译的校验器检查，关闭 SDK 每次调用时的 jsonschema 校验
+    @server.call_tool(validate_input=False)
     async def handle_call_tool(name: str, arguments: dict) -> List[TextContent]:
         logging.info(f"Received CallToolRequest: {name}")
+        # 未注册的工具名统一记为 unknown，避免指标标签无限增长
+        label = name if name in registry else "unknown"
+        metrics.tool_in_flight.inc(label)
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            if not arguments:
-                raise ValueError("No arguments provided")
-
-            response: Any = None
-
-            # --- 辅助函数：安全获取必填字符串参数 ---
-            def get_required_str(key: str) -> str:
-                val = arguments.get(key)
-                if not val or not isinstance(val, str):
-                    raise ValueError(f"Missing required string argument: {key}")
-                return val
-
-            # --- 工具路由逻辑 ---
-            if name == "notion_append_block_children":
-                block_id = get_required_str("block_id")
-                children = arguments.get("children")
-                if not children:
-                    raise ValueError("Missing required argument: children")
-                response = notion_client.append_block_children(block_id, children)
-
-            elif name == "notion_retrieve_block":
-                block_id = get_required_str("block_id")
-                response = notion_client.retrieve_block(block_id)
-
-            elif name == "notion_retrieve_block_children":
-                block_id = get_required_str("block_id")
-                response = notion_client.retrieve_block_children(
-                    block_id, arguments.get("start_cursor"), arguments.get("page_size")
-                )
-
-            elif name == "notion_delete_block":
-                block_id = get_required_str("block_id")
-                response = notion_client.delete_block(block_id)
-
-            elif name == "notion_update_block":
-                block_id = get_required_str("block_id")
-                block = arguments.get("block")
-                if not block:
-                    raise ValueError("Missing required argument: block")
-                response = notion_client.update_block(block_id, block)
-
-            elif name == "notion_retrieve_page":
-                page_id = get_required_str("page_id")
-                response = notion_client.retrieve_page(page_id)
-
-            elif name == "notion_update_page_properties":
-                page_id = get_required_str("page_id")
-                properties = arguments.get("properties")
-                if not properties:
-                    raise ValueError("Missing required argument: properties")
-                response = notion_client.update_page_properties(page_id, properties)
-
-            elif name == "notion_list_all_users":
-                response = notion_client.list_all_users(
-                    arguments.get("start_cursor"), arguments.get("page_size")
-                )
-
-            elif name == "notion_retrieve_user":
-                user_id = get_required_str("user_id")
-                response = notion_client.retrieve_user(user_id)
-
-            elif name == "notion_retrieve_bot_user":
-                response = notion_client.retrieve_bot_user()
-
-            elif name == "notion_query_database":
-                database_id = get_required_str("database_id")
-                response = notion_client.query_database(
-                    database_id,
-                    arguments.get("filter"),
-                    arguments.get("sorts"),
-                    arguments.get("start_cursor"),
-                    arguments.get("page_size"),
-                )
-
-            elif name == "notion_create_database":
-                parent = arguments.get("parent")
-                properties = arguments.get("properties")
-                if not parent or not properties:
-                    raise ValueError("Missing required arguments: parent, properties")
-
-                response = notion_client.create_database(
-                    parent, properties, arguments.get("title")
-                )
-
-            elif name == "notion_retrieve_database":
-                database_id = get_required_str("database_id")
-                response = notion_client.retrieve_database(database_id)
-
-            elif name == "notion_update_database":
-                # 【你报错的地方在这里】
-                # 我们先提取并检查 database_id，确保它是 str
-                database_id = get_required_str("database_id")
-
-                response = notion_client.update_database(
-                    database_id,
-                    arguments.get("title"),
-                    arguments.get("description"),
-                    arguments.get("properties"),
-                )
-
-            elif name == "notion_create_database_item":
-                database_id = get_required_str("database_id")
-                properties = arguments.get("properties")
-                if not properties:
-                    raise ValueError("Missing required argument: properties")
-                response = notion_client.create_database_item(database_id, properties)
-
-            elif name == "notion_create_comment":
-                response = notion_client.create_comment(
-                    arguments.get("parent"),
-                    arguments.get("discussion_id"),
-                    arguments.get("rich_text"),
-                )
-
-            elif name == "notion_retrieve_comments":
-                block_id = get_required_str("block_id")
-                response = notion_client.retrieve_comments(
-                    block_id, arguments.get("start_cursor"), arguments.get("page_size")
-                )
-
-            elif name == "notion_search":
-                response = notion_client.search(
-                    arguments.get("query"),
-                    arguments.get("filter"),
-                    arguments.get("sort"),
-                    arguments.get("start_cursor"),
-                    arguments.get("page_size"),
-                )
-
-            else:
-                raise ValueError(f"Unknown tool: {name}")
-
-            # --- 响应格式处理 ---
-            requested_format = arguments.get("format", "markdown")
-            if enable_markdown_conversion and requested_format == "markdown":
-                markdown_text = notion_client.to_markdown(response)
-                return [TextContent(type="text", text=markdown_text)]
-            else:
-                json_text = json.dumps(response, indent=2, ensure_ascii=False)
-                return [TextContent(type="text", text=json_text)]
+            tool = registry.get(name)
+            current_priority.set(tool.priority)
+            async with acquire_client() as notion:
+                current_client.set(notion)
+                response = await tool(arguments)
+                arguments = arguments or {}
+                if hasattr(response, "__aiter__"):
+                    # 流式：每页一个 content 项
+                    texts = await render_pages(response, arguments, label)
+                else:
+                    texts = [render(response, arguments, label)]
+            outcome = "ok"
 
         except Exception as e:
             logging.error(f"Error executing tool: {e}")
-            error_json = json.dumps({"error": str(e)}, ensure_ascii=False)
-            return [TextContent(type="text", text=error_json)]
-
-    # 5. 设置 Streamable HTTP 传输管理器
-    session_manager = StreamableHTTPSessionManager(app=server)
+            texts = [json.dumps({"error": str(e)}, ensure_ascii=False)]
+        finally:
+            metrics.tool_in_flight.dec(label)
+            metrics.tool_duration.observe(time.perf_counter() - started, label, outcome)
+        metrics.tool_response_bytes.observe(
+            sum(len(text.encode("utf-8")) for text in texts), label
+        )
+        return [TextContent(type="text", text=text) for text in texts]
+
+    # 6. 设置 Streamable HTTP 传输管理器
+    # 多 worker 时同一会话的请求可能落在不同进程上，因此不保存会话状态
+    session_manager = StreamableHTTPSessionManager(
+        app=server, stateless=bool(shared_state_dir)
+    )
 
-    # 6. 定义 Lifespan (修正点)
+    # 7. 定义 Lifespan (修正点)
     # 必须调用 session_manager.run()，它会返回一个 Context Manager 用于初始化后台任务组
     @asynccontextmanager
     async def lifespan(app):
         async with session_manager.run():
-            yield
-
-    # 7. 定义处理 Streamable HTTP 请求的 ASGI 应用
+            # 多 worker 时只有拿到锁的一个 worker 运行后台同步，避免重复请求
+            sync_lock = None
+            if sync_engine is not None and shared_state_dir:
+                sync_lock = _acquire_lock(os.path.join(shared_state_dir, "sync.lock"))
+            run_sync = sync_engine is not None and (
+                not shared_state_dir or sync_lock is not None
+            )
+            if run_sync:
+                sync_engine.start()
+            try:
+                yield
+            finally:
+                if run_sync:
+                    await sync_engine.stop()
+                if sync_lock is not None:
+                    sync_lock.close()
+                # 关闭 Notion 客户端的连接池
+                if tenant_pool is not None:
+                    logging.info(f"Notion tenant pool stats: {tenant_pool.stats()}")
+                    await tenant_pool.aclose()
+                else:
+                    logging.info(
+                        f"Notion connection pool stats: {notion_client.pool_stats()}"
+                    )
+                    await notion_client.aclose()
+
+    # 8. 定义处理 Streamable HTTP 请求的 ASGI 应用
     async def handle_streamable_http(
         scope: Scope, receive: Receive, send: Send
     ) -> None:
         await session_manager.handle_request(scope, receive, send)
 
-    # 8. 创建 Starlette 应用
+    # 9. 运行状态 (连接池统计，用于调整连接池大小)
+    async def handle_stats(request: Request) -> JSONResponse:
+        if tenant_pool is not None:
+            return JSONResponse(
+                {
+                    "tenants": tenant_pool.stats(),
+                    "clients": {
+                        key: _client_stats(tenant_client)
+                        for key, tenant_client in tenant_pool.clients().items()
+                    },
+                }
+            )
+        return JSONResponse(
+            dict(
+                _client_stats(notion_client),
+                sync=(
+                    sync_engine.stats()
+                    if sync_engine is not None
+                    else {"enabled": False}
+                ),
+            )
+        )
+
+    # 10. Prometheus 指标
+    async def handle_metrics(request: Request) -> Response:
+        return Response(
+            metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    # 11. 创建 Starlette 应用
     starlette_app = Starlette(
         routes=[
             Mount("/mcp", app=handle_streamable_http),
+            Route("/stats", endpoint=handle_stats),
+            Route("/metrics", endpoint=handle_metrics),
         ],
         lifespan=lifespan,  # 确保传入了 lifespan
         debug=True,
@@ -236,42 +631,145 @@ async def create_mcp_app(
     return starlette_app
 
 
-# 简单的入口点示例
-if __name__ == "__main__":
-    # 从环境变量获取配置
-    TOKEN = os.environ.get("NOTION_API_TOKEN")
+async def create_mcp_app(*args: Any, **kwargs: Any) -> Starlette:
+    """兼容旧的调用方式：asyncio.run(create_mcp_app(...))"""
+    return build_mcp_app(*args, **kwargs)
+
+
+# 默认启用所有工具 (实际使用中你可以根据需求定义)
+ALL_TOOLS = {
+    "notion_append_block_children",
+    "notion_append_markdown",
+    "notion_retrieve_block",
+    "notion_retrieve_block_children",
+    "notion_retrieve_block_tree",
+    "notion_delete_block",
+    "notion_update_block",
+    "notion_retrieve_page",
+    "notion_update_page_properties",
+    "notion_list_all_users",
+    "notion_retrieve_user",
+    "notion_retrieve_bot_user",
+    "notion_query_database",
+    "notion_create_database",
+    "notion_retrieve_database",
+    "notion_update_database",
+    "notion_create_database_item",
+    "notion_batch_create_database_items",
+    "notion_batch_update_page_properties",
+    "notion_create_comment",
+    "notion_retrieve_comments",
+    "notion_search",
+    "notion_local_search",
+    "notion_aggregate_database",
+}
+
+
+def load_config() -> Dict[str, Any]:
+    """从环境变量读取 build_mcp_app 的参数"""
+    token = os.environ.get("NOTION_API_TOKEN")
+
+    # 多租户：租户表是 {"租户 ID": {"token": "Notion token", "secret": "..."}} 的 JSON 文件
+    tenants = None
+    if os.environ.get("NOTION_TENANTS_FILE"):
+        with open(os.environ["NOTION_TENANTS_FILE"], encoding="utf-8") as f:
+            tenants = json.load(f)
+    multi_tenant = os.environ.get(
+        "NOTION_MULTI_TENANT", "false"
+    ).lower() == "true" or bool(tenants)
+    if not token and not multi_tenant:
+        raise RuntimeError("NOTION_API_TOKEN environment variable not set.")
+    # 多租户模式下未携带凭据的请求默认被拒绝，显式开启后才使用 NOTION_API_TOKEN
+    allow_default_token = (
+        os.environ.get("NOTION_TENANT_DEFAULT_TOKEN", "false").lower() == "true"
+    )
     # 如果你想默认关闭 Markdown 转换，把 "true" 改成 "false" 即可。
-    ENABLE_MD = os.environ.get("ENABLE_MARKDOWN", "true").lower() == "true"
-
-    # 默认启用所有工具 (实际使用中你可以根据需求定义)
-    ALL_TOOLS = {
-        "notion_append_block_children",
-        "notion_retrieve_block",
-        "notion_retrieve_block_children",
-        "notion_delete_block",
-        "notion_update_block",
-        "notion_retrieve_page",
-        "notion_update_page_properties",
-        "notion_list_all_users",
-        "notion_retrieve_user",
-        "notion_retrieve_bot_user",
-        "notion_query_database",
-        "notion_create_database",
-        "notion_retrieve_database",
-        "notion_update_database",
-        "notion_create_database_item",
-        "notion_create_comment",
-        "notion_retrieve_comments",
-        "notion_search",
+    enable_md = os.environ.get("ENABLE_MARKDOWN", "true").lower() == "true"
+
+    # 连接池配置
+    client_options = {
+        "max_connections": int(os.environ.get("NOTION_POOL_SIZE", "10")),
+        "max_keepalive_connections": int(os.environ.get("NOTION_POOL_KEEPALIVE", "10")),
+        "keepalive_expiry": float(os.environ.get("NOTION_KEEPALIVE_EXPIRY", "30")),
+        "http2": os.environ.get("NOTION_HTTP2", "false").lower() == "true",
+        "rate_limit": float(os.environ.get("NOTION_RATE_LIMIT", "3")),
+        "max_retries": int(os.environ.get("NOTION_MAX_RETRIES", "5")),
+        "cache_max_bytes": int(
+            os.environ.get("NOTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+        ),
+        "search_index_path": os.environ.get("NOTION_SEARCH_INDEX_PATH"),
+        "local_query_ttl": float(os.environ.get("NOTION_LOCAL_QUERY_TTL", "0")),
+        "local_query_max_rows": int(
+            os.environ.get("NOTION_LOCAL_QUERY_MAX_ROWS", "10000")
+        ),
+    }
+    if os.environ.get("NOTION_CACHE_PATH"):
+        client_options["cache_path"] = os.environ["NOTION_CACHE_PATH"]
+
+    # 后台增量同步 (NOTION_SYNC_INTERVAL=0 时关闭)
+    sync_interval = float(os.environ.get("NOTION_SYNC_INTERVAL", "0"))
+    sync_options = (
+        {
+            "interval": sync_interval,
+            "budget_share": float(os.environ.get("NOTION_SYNC_BUDGET", "0.2")),
+            "max_items_per_cycle": int(os.environ.get("NOTION_SYNC_MAX_ITEMS", "100")),
+            "staleness": float(os.environ.get("NOTION_SYNC_STALENESS", "600")),
+        }
+        if sync_interval > 0
+        else None
+    )
+
+    # 多 worker 部署：共享目录必须显式指定 (目录中保存缓存的 Notion 内容)
+    shared_state_dir = os.environ.get("NOTION_SHARED_STATE_DIR")
+    if not shared_state_dir and int(os.environ.get("NOTION_WORKERS", "1")) > 1:
+        raise RuntimeError(
+            "NOTION_SHARED_STATE_DIR must be set when NOTION_WORKERS > 1"
+        )
+
+    return {
+        "notion_token": token,
+        "enabled_tools_set": ALL_TOOLS,
+        "enable_markdown_conversion": enable_md,
+        "client_options": client_options,
+        "sync_options": sync_options,
+        "shared_state_dir": shared_state_dir,
+        "multi_tenant": multi_tenant,
+        "tenants": tenants,
+        "max_tenants": int(os.environ.get("NOTION_MAX_TENANTS", "32")),
+        "allow_default_token": allow_default_token,
     }
 
-    if not TOKEN:
-        print("Error: NOTION_API_TOKEN environment variable not set.")
-    else:
-        # 创建 ASGI 应用
-        app = asyncio.run(create_mcp_app(TOKEN, ALL_TOOLS, ENABLE_MD))
 
-        # 使用 uvicorn 运行 HTTP 服务器（需安装 uvicorn: pip install uvicorn）
-        import uvicorn
+def create_app() -> Starlette:
+    """应用工厂：uvicorn notionMcpServer:create_app --factory --workers 4
+    或 gunicorn -k uvicorn.workers.UvicornWorker -w 4 "notionMcpServer:create_app()"
+    """
+    return build_mcp_app(**load_config())
 
-        uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+
+# 简单的入口点示例
+if __name__ == "__main__":
+    # 使用 uvicorn 运行 HTTP 服务器（需安装 uvicorn: pip install uvicorn）
+    import uvicorn
+
+    HOST = os.environ.get("HOST", "0.0.0.0")
+    PORT = int(os.environ.get("PORT", "8000"))
+    WORKERS = int(os.environ.get("NOTION_WORKERS", "1"))
+
+    try:
+        CONFIG = load_config()
+    except (RuntimeError, OSError, ValueError) as e:
+        print(f"Error: {e}")
+    else:
+        if WORKERS > 1:
+            # 每个 worker 进程各自调用工厂创建应用，共享状态见 load_config
+            uvicorn.run(
+                "notionMcpServer:create_app",
+                factory=True,
+                workers=WORKERS,
+                host=HOST,
+                port=PORT,
+                log_level="info",
+            )
+        else:
+            uvicorn.run(build_mcp_app(**CONFIG), host=HOST, port=PORT, log_level="info")
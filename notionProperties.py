@@ -0,0 +1,91 @@
+# notionProperties.py
+#
+# 把 Notion 页面属性 ({"type": ..., "<type>": {...}}) 转换为可比较的 Python 值，
+# 供本地查询、聚合等在数据库行上做计算的模块共用。
+
+from typing import Any, Dict, List, Optional
+
+# 文本类属性：值为字符串
+TEXT_TYPES = {"title", "rich_text", "url", "email", "phone_number"}
+# 列表类属性：值为字符串列表 (选项名或 ID)
+LIST_TYPES = {"multi_select", "people", "relation", "files"}
+# 日期类属性：值为 ISO 8601 字符串
+DATE_TYPES = {"date", "created_time", "last_edited_time"}
+
+
+def _plain_text(items: Optional[List[Dict[str, Any]]]) -> str:
+    return "".join(item.get("plain_text", "") for item in items or [])
+
+
+def property_value(prop: Optional[Dict[str, Any]]) -> Any:
+    """返回属性的标量/列表值；空值返回 None (文本为 "", 列表为 [])"""
+    if not prop:
+        return None
+    prop_type = prop.get("type")
+    value = prop.get(prop_type) if prop_type else None
+    if prop_type in ("title", "rich_text"):
+        return _plain_text(value)
+    if prop_type in ("url", "email", "phone_number"):
+        return value or ""
+    if prop_type in ("number", "checkbox", "created_time", "last_edited_time"):
+        return value
+    if prop_type in ("select", "status"):
+        return value.get("name") if value else None
+    if prop_type == "multi_select":
+        return [option.get("name") for option in value or []]
+    if prop_type in ("people", "relation"):
+        return [item.get("id") for item in value or []]
+    if prop_type in ("created_by", "last_edited_by"):
+        return [value.get("id")] if value else []
+    if prop_type == "files":
+        return [item.get("name") for item in value or []]
+    if prop_type == "date":
+        return value.get("start") if value else None
+    if prop_type == "unique_id":
+        return value.get("number") if value else None
+    if prop_type == "formula":
+        return _formula_value(value)
+    if prop_type == "rollup":
+        return _rollup_value(value)
+    return value
+
+
+def _formula_value(value: Optional[Dict[str, Any]]) -> Any:
+    if not value:
+        return None
+    inner = value.get(value.get("type", ""))
+    if value.get("type") == "date":
+        return inner.get("start") if inner else None
+    return inner
+
+
+def _rollup_value(value: Optional[Dict[str, Any]]) -> Any:
+    if not value:
+        return None
+    rollup_type = value.get("type")
+    if rollup_type == "array":
+        return [property_value(item) for item in value.get("array", [])]
+    if rollup_type == "date":
+        inner = value.get("date")
+        return inner.get("start") if inner else None
+    return value.get(rollup_type)
+
+
+def value_type(prop: Optional[Dict[str, Any]]) -> Optional[str]:
+    """属性值的逻辑类型 (formula/rollup 取其结果类型)"""
+    if not prop:
+        return None
+    prop_type = prop.get("type")
+    if prop_type == "formula":
+        inner = (prop.get("formula") or {}).get("type")
+        return {"string": "rich_text", "boolean": "checkbox"}.get(inner, inner)
+    if prop_type == "rollup":
+        return (prop.get("rollup") or {}).get("type")
+    return prop_type
+
+
+def is_empty(value: Any) -> bool:
+    """列表类值可能是 list 或 tuple (列式存储)"""
+    return (
+        value is None or value == "" or (isinstance(value, (list, tuple)) and not value)
+    )
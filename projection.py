@@ -0,0 +1,120 @@
+# projection.py
+#
+# 工具响应瘦身：按 fields 只保留需要的字段，compact 模式下去掉 null 与默认值，
+# 并以无缩进 JSON 输出。Notion 响应中大量字段 (created_by、parent、icon、
+# 每个富文本片段的 annotations…) 对调用方没有用处，却占据了大部分输出。
+
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+FieldTree = Dict[str, Any]
+
+# 投影时始终保留的字段：用于识别对象，以及块树中的嵌套子块
+_ALWAYS_KEPT = ("object", "id")
+
+# compact 模式下等于这些值的字段会被省略
+_DEFAULT_VALUES: Dict[str, Any] = {
+    "archived": False,
+    "in_trash": False,
+    "is_inline": False,
+    "color": "default",
+    "annotations": {
+        "bold": False,
+        "italic": False,
+        "strikethrough": False,
+        "underline": False,
+        "code": False,
+        "color": "default",
+    },
+}
+
+
+def parse_fields(fields: Optional[List[str]]) -> Optional[FieldTree]:
+    """["id", "properties.Name"] -> {"id": {}, "properties": {"Name": {}}}；空字典表示保留整个子树"""
+    if not fields:
+        return None
+    tree: FieldTree = {}
+    for path in fields:
+        parts = [part for part in path.split(".") if part]
+        if not parts:
+            continue
+        node = tree
+        for part in parts[:-1]:
+            if part in node and not node[part]:
+                # 已经保留了整个子树
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = {}
+    return tree
+
+
+def project_value(value: Any, tree: Optional[FieldTree]) -> Any:
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [project_value(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        key: project_value(value[key], subtree)
+        for key, subtree in tree.items()
+        if key in value
+    }
+
+
+def project_item(item: Dict[str, Any], tree: FieldTree) -> Dict[str, Any]:
+    """投影一个 API 对象；块树中的 children 用同一组字段递归投影"""
+    projected = {key: item[key] for key in _ALWAYS_KEPT if key in item}
+    projected.update(project_value(item, tree))
+    if isinstance(item.get("children"), list) and "children" not in tree:
+        projected["children"] = [
+            project_item(child, tree) for child in item["children"]
+        ]
+    return projected
+
+
+def project(response: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """对工具响应应用字段投影：列表响应投影每个结果，其他响应投影对象本身"""
+    tree = parse_fields(fields)
+    if tree is None or not isinstance(response, dict):
+        return response
+    if response.get("object") != "list":
+        return project_item(response, tree)
+    results = response.get("results", [])
+    if isinstance(results, list):
+        results = [project_item(item, tree) for item in results]
+    else:
+        # 列式表示的数据库行：只保留选中的属性列，行在输出时再投影
+        results = results.select(tree)
+    return dict(response, results=results)
+
+
+def slim(value: Any) -> Any:
+    """去掉值为 null 或默认值的字段"""
+    if isinstance(value, dict):
+        slimmed = {}
+        for key, item in value.items():
+            if item is None or (
+                key in _DEFAULT_VALUES and item == _DEFAULT_VALUES[key]
+            ):
+                continue
+            slimmed[key] = slim(item)
+        return slimmed
+    if isinstance(value, list):
+        return [slim(item) for item in value]
+    if hasattr(value, "to_list"):
+        return [slim(item) for item in value.to_list()]
+    return value
+
+
+def dumps(
+    response: Any,
+    compact: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> str:
+    if compact:
+        return json.dumps(
+            slim(response), ensure_ascii=False, separators=(",", ":"), default=default
+        )
+    return json.dumps(response, indent=2, ensure_ascii=False, default=default)
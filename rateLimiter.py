@@ -0,0 +1,287 @@
+# rateLimiter.py
+#
+# Notion 对每个 integration 限速约 3 次/秒。这里提供客户端内部的中心调度器：
+# 所有请求先从共享的令牌桶取令牌 (按优先级排队)，遇到 429/5xx 时按
+# Retry-After 或带抖动的指数退避自动重试。
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+import httpx
+
+# 优先级：数值越小越先获得令牌
+PRIORITY_INTERACTIVE = 0  # 交互式读取
+PRIORITY_NORMAL = 1  # 普通写入
+PRIORITY_BULK = 2  # 批量写入 / 后台任务
+
+# 当前请求的优先级，由 MCP 工具处理函数按工具类型设置
+current_priority: ContextVar[int] = ContextVar(
+    "current_priority", default=PRIORITY_NORMAL
+)
+
+# 可选的额外令牌桶，用于限制某类后台任务只能占用总额度的一部分
+current_budget: ContextVar[Optional["TokenBucket"]] = ContextVar(
+    "current_budget", default=None
+)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头 (秒数或 HTTP 日期)，返回需要等待的秒数"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """带抖动的指数退避重试策略"""
+
+    def __init__(
+        self, max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次重试前的等待时间；服务端给出 Retry-After 时以其为下限"""
+        delay = min(self.max_delay, self.base_delay * (2**attempt))
+        # full jitter，避免多个会话在同一时刻集体重试
+        delay = random.uniform(0, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class TokenBucket:
+    """异步令牌桶，等待者按 (优先级, 到达顺序) 获取令牌"""
+
+    def __init__(self, rate: float = 3.0, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL) -> None:
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._dispatch()
+        # 被取消的等待者留在堆中，分发时跳过
+        await future
+
+    def pause(self, seconds: float) -> None:
+        """收到 429 时暂停整个桶，所有会话共同退让"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = now
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        while self._waiters and self._tokens >= 1 and now >= self._paused_until:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+        if self._waiters and self._timer is None:
+            delay = max(self._paused_until - now, (1 - self._tokens) / self.rate, 0)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+
+class SharedTokenBucket(TokenBucket):
+    """令牌来自多进程共享的存储 (见 sqliteRateLimit.py)；进程内的等待者仍按优先级排队
+
+    存储操作可能要等待其他进程持有的文件锁，因此在线程中执行，由一个分发任务
+    逐个为等待者取令牌，不阻塞事件循环。
+    """
+
+    def __init__(
+        self, store: Any, key: str, rate: float = 3.0, capacity: Optional[float] = None
+    ):
+        super().__init__(rate, capacity)
+        self.store = store
+        self.key = key
+        self._dispatcher: Optional["asyncio.Task[None]"] = None
+        self._pausing: Set["asyncio.Task[None]"] = set()
+
+    def pause(self, seconds: float) -> None:
+        # 本进程立即退让；写入共享存储 (让其他 worker 一起退让) 在后台线程中完成
+        super().pause(seconds)
+        task = asyncio.ensure_future(
+            asyncio.to_thread(self.store.pause, self.key, seconds)
+        )
+        self._pausing.add(task)
+        task.add_done_callback(self._pausing.discard)
+
+    def _dispatch(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                return
+            paused = self._paused_until - time.monotonic()
+            if paused > 0:
+                await asyncio.sleep(paused)
+                continue
+            try:
+                wait = await asyncio.to_thread(
+                    self.store.take, self.key, self.rate, self.capacity
+                )
+            except Exception as e:
+                # 共享存储暂时不可用 (例如锁等待超时)：按本地速率稍后重试
+                logging.warning(f"Shared rate limit store unavailable: {e}")
+                wait = 1 / self.rate
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            # 取令牌期间被取消的等待者跳过，令牌交给下一个
+            while self._waiters:
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    future.set_result(None)
+                    break
+
+
+class RequestScheduler:
+    """中心调度器：限速 + 429/5xx 重试，所有 AsyncNotionClientWrapper 请求都经过这里"""
+
+    def __init__(
+        self,
+        rate: float = 3.0,
+        burst: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        bucket: Optional[TokenBucket] = None,
+    ):
+        # 多 worker 部署时传入 SharedTokenBucket，限速额度由所有进程共享
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.retry_count = 0
+        self.rate_limited_count = 0
+
+    async def run(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        priority: Optional[int] = None,
+    ) -> httpx.Response:
+        if priority is None:
+            priority = current_priority.get()
+        budget = current_budget.get()
+        attempt = 0
+        while True:
+            if budget is not None:
+                await budget.acquire(priority)
+            await self.bucket.acquire(priority)
+            response = await send()
+            if (
+                response.status_code not in RETRY_STATUSES
+                or attempt >= self.retry_policy.max_retries
+            ):
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                self.rate_limited_count += 1
+                if retry_after is not None:
+                    self.bucket.pause(retry_after)
+            delay = self.retry_policy.backoff(attempt, retry_after)
+            logging.warning(
+                f"Notion API returned {response.status_code}, "
+                f"retrying in {delay:.2f}s (attempt {attempt + 1})"
+            )
+            self.retry_count += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "retries": self.retry_count,
+            "rate_limited": self.rate_limited_count,
+            "waiting": sum(1 for _, _, f in self.bucket._waiters if not f.done()),
+        }
+
+
+class SyncRequestScheduler:
+    """同步客户端使用的线程安全版本 (不区分优先级)"""
+
+    def __init__(
+        self,
+        rate: float = 3.0,
+        burst: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def run(self, send: Callable[[], Any]) -> Any:
+        attempt = 0
+        while True:
+            self._acquire()
+            response = send()
+            if (
+                response.status_code not in RETRY_STATUSES
+                or attempt >= self.retry_policy.max_retries
+            ):
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            delay = self.retry_policy.backoff(attempt, retry_after)
+            logging.warning(
+                f"Notion API returned {response.status_code}, "
+                f"retrying in {delay:.2f}s (attempt {attempt + 1})"
+            )
+            attempt += 1
+            time.sleep(delay)
@@ -0,0 +1,185 @@
+# responseCache.py
+#
+# 进程内的读缓存：按资源类型设置 TTL，按字节大小做 LRU 淘汰。
+# 条目以序列化后的 JSON 存储，命中时重新解析，调用方拿到的永远是独立副本。
+# 可选的持久化二级存储 (见 sqliteCache.py) 在内存未命中时兜底，并在进程间共享；
+# 其中过期的条目可以由调用方按 last_edited_time 重新验证后续期 (get_expired)。
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# 各资源类型的默认 TTL (秒)
+DEFAULT_TTLS: Dict[str, float] = {
+    "page": 60.0,
+    "block": 60.0,
+    "children": 60.0,
+    "database": 300.0,
+    "user": 3600.0,
+    # 按 last_edited_time 重新验证的快照，过期时间只是兜底
+    "snapshot": 86400.0,
+}
+
+CacheKey = Tuple[str, str, str]
+
+
+def normalize_id(resource_id: str) -> str:
+    """Notion ID 带不带连字符都合法，统一成同一个键"""
+    return resource_id.replace("-", "").lower()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttls: Optional[Dict[str, float]] = None,
+        store: Optional[Any] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.store = store
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        # key -> (过期时间, 序列化后的响应)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, bytes]]" = OrderedDict()
+        # (类型, ID) -> 该资源所有变体的 key (例如子块列表的不同分页游标)
+        self._variants: Dict[Tuple[str, str], Set[CacheKey]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # 其他进程做过的失效 (kind, resource_id) 的回调：内存缓存之外的本地状态
+        # (例如本地查询快照) 据此同步
+        self.listeners: List[Callable[[str, str], None]] = []
+
+    def get(
+        self, kind: str, resource_id: str, variant: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        self.apply_shared_invalidations()
+        key = (kind, normalize_id(resource_id), variant)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return json.loads(entry[1])
+
+        if self.store is not None:
+            stored = self.store.get(key)
+            if stored is not None:
+                payload, remaining = stored
+                self._put(key, payload, remaining)
+                self.store_hits += 1
+                return json.loads(payload)
+        self.misses += 1
+        return None
+
+    def get_expired(
+        self, kind: str, resource_id: str, variant: str = ""
+    ) -> Optional[Tuple[Dict[str, Any], str, float]]:
+        """二级存储中已过期、仍在保留期内的条目：(响应, last_edited_time, 写入时间)"""
+        if self.store is None:
+            return None
+        stored = self.store.get_expired((kind, normalize_id(resource_id), variant))
+        if stored is None:
+            return None
+        payload, last_edited_time, stored_at = stored
+        return json.loads(payload), last_edited_time, stored_at
+
+    def last_edited_time(self, kind: str, resource_id: str) -> Optional[str]:
+        """内存中未过期条目的 last_edited_time (不计入命中统计)"""
+        entry = self._entries.get((kind, normalize_id(resource_id), ""))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return json.loads(entry[1]).get("last_edited_time")
+
+    def set(
+        self,
+        kind: str,
+        resource_id: str,
+        value: Dict[str, Any],
+        variant: str = "",
+        last_edited_time: Optional[str] = None,
+    ) -> None:
+        """last_edited_time 默认取自响应本身；列表类响应可以传入所属资源的时间戳"""
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+        key = (kind, normalize_id(resource_id), variant)
+        ttl = self.ttls.get(kind, 60.0)
+        if self.store is not None:
+            self.store.set(
+                key, payload, ttl, last_edited_time or value.get("last_edited_time")
+            )
+        self._put(key, payload, ttl)
+
+    def _put(self, key: CacheKey, payload: bytes, ttl: float) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, payload)
+        self._variants.setdefault(key[:2], set()).add(key)
+        self._bytes += len(payload)
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, kind: str, resource_id: str) -> None:
+        """删除一个资源的所有变体"""
+        if self.store is not None:
+            self.store.invalidate(kind, normalize_id(resource_id))
+        self._invalidate_local(kind, normalize_id(resource_id))
+
+    def _invalidate_local(self, kind: str, resource_id: str) -> None:
+        keys = self._variants.get((kind, resource_id))
+        if not keys:
+            return
+        for key in list(keys):
+            self._remove(key)
+            self.invalidations += 1
+
+    def apply_shared_invalidations(self) -> None:
+        """其他进程 (共享同一个二级存储的 worker) 做过的失效，同步到内存缓存与 listeners"""
+        if self.store is None:
+            return
+        for kind, resource_id in self.store.invalidations():
+            self._invalidate_local(kind, resource_id)
+            for listener in self.listeners:
+                listener(kind, resource_id)
+
+    def clear(self) -> None:
+        if self.store is not None:
+            self.store.clear()
+        self._entries.clear()
+        self._variants.clear()
+        self._bytes = 0
+
+    def _remove(self, key: CacheKey) -> None:
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+        variants = self._variants.get(key[:2])
+        if variants is not None:
+            variants.discard(key)
+            if not variants:
+                del self._variants[key[:2]]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.store_hits + self.misses
+        hits = self.hits + self.store_hits
+        stats = {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+        if self.store is not None:
+            stats["store"] = self.store.stats()
+        return stats
@@ -6,6 +6,12 @@ from mcp.types import Tool
 from common import (
     common_id_description,
     format_parameter,
+    fields_parameter,
+    compact_parameter,
+    fetch_all_parameter,
+    max_items_parameter,
+    revalidate_parameter,
+    stream_parameter,
     rich_text_object_schema,
     block_object_schema,
 )
@@ -14,7 +20,7 @@ from common import (
 
 append_block_children_tool = Tool(
     name="notion_append_block_children",
-    description="Append new children blocks to a specified parent block in Notion. Requires insert content capabilities. You can optionally specify the 'after' parameter to append after a certain block.",
+    description="Append new children blocks to a specified parent block in Notion. Requires insert content capabilities. You can optionally specify the 'after' parameter to append after a certain block. Any number of blocks and any nesting depth are accepted: the server splits them into requests that fit Notion's limits and keeps their order. If a request fails, the response reports the index of the first block not appended and the 'after' ID to resume from.",
     inputSchema={
         "type": "object",
         "properties": {
@@ -32,12 +38,42 @@ append_block_children_tool = Tool(
                 "description": "The ID of the existing block that the new block should be appended after."
                 + common_id_description,
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["block_id", "children"],
     },
 )
 
+append_markdown_tool = Tool(
+    name="notion_append_markdown",
+    description="Append Markdown content to a parent block in Notion. The server converts it into Notion blocks: headings, paragraphs, bulleted/numbered lists (nested by indentation), to-dos (- [ ] / - [x]), code fences, quotes, tables, dividers, and inline **bold**, *italic*, ~~strikethrough~~, `code` and [links](url). Much cheaper than writing block JSON for long documents; any length is accepted and appended in order. If a request fails, the response reports the Markdown line to resume from and the 'after' ID to pass.",
+    inputSchema={
+        "type": "object",
+        "properties": {
+            "block_id": {
+                "type": "string",
+                "description": "The ID of the parent block or page."
+                + common_id_description,
+            },
+            "markdown": {
+                "type": "string",
+                "description": "The Markdown text to append.",
+            },
+            "after": {
+                "type": "string",
+                "description": "The ID of the existing block that the new blocks should be appended after."
+                + common_id_description,
+            },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
+            "format": format_parameter,
+        },
+        "required": ["block_id", "markdown"],
+    },
+)
+
 retrieve_block_tool = Tool(
     name="notion_retrieve_block",
     description="Retrieve a block from Notion",
@@ -49,6 +85,8 @@ retrieve_block_tool = Tool(
                 "description": "The ID of the block to retrieve."
                 + common_id_description,
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["block_id"],
@@ -73,6 +111,40 @@ retrieve_block_children_tool = Tool(
                 "type": "number",
                 "description": "Number of results per page (max 100)",
             },
+            "fetch_all": fetch_all_parameter,
+            "max_items": max_items_parameter,
+            "stream": stream_parameter,
+            "revalidate": revalidate_parameter,
+            "fields": fields_parameter,
+            "compact": compact_parameter,
+            "format": format_parameter,
+        },
+        "required": ["block_id"],
+    },
+)
+
+retrieve_block_tree_tool = Tool(
+    name="notion_retrieve_block_tree",
+    description="Retrieve the full nested block tree of a page or block in one call. Nested children (toggles, columns, synced blocks, lists) are fetched server-side and returned under each block's 'children' field. Child pages and child databases are not expanded.",
+    inputSchema={
+        "type": "object",
+        "properties": {
+            "block_id": {
+                "type": "string",
+                "description": "The ID of the page or block." + common_id_description,
+            },
+            "max_depth": {
+                "type": "number",
+                "description": "Maximum nesting depth to fetch (1 = direct children only). Unlimited if omitted.",
+            },
+            "max_blocks": {
+                "type": "number",
+                "description": "Maximum total number of blocks to fetch. Unlimited if omitted.",
+            },
+            "stream": stream_parameter,
+            "revalidate": revalidate_parameter,
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["block_id"],
@@ -89,6 +161,8 @@ delete_block_tool = Tool(
                 "type": "string",
                 "description": "The ID of the block to delete." + common_id_description,
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["block_id"],
@@ -109,6 +183,8 @@ update_block_tool = Tool(
                 "type": "object",
                 "description": "The updated content for the block. Must match the block's type schema.",
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["block_id", "block"],
@@ -128,6 +204,8 @@ retrieve_page_tool = Tool(
                 "description": "The ID of the page to retrieve."
                 + common_id_description,
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["page_id"],
@@ -149,6 +227,8 @@ update_page_properties_tool = Tool(
                 "type": "object",
                 "description": "Properties to update. These correspond to the columns or fields in the database.",
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["page_id", "properties"],
@@ -171,6 +251,11 @@ list_all_users_tool = Tool(
                 "type": "number",
                 "description": "Number of users to retrieve (max 100)",
             },
+            "fetch_all": fetch_all_parameter,
+            "max_items": max_items_parameter,
+            "stream": stream_parameter,
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
     },
@@ -187,6 +272,8 @@ retrieve_user_tool = Tool(
                 "description": "The ID of the user to retrieve."
                 + common_id_description,
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["user_id"],
@@ -203,6 +290,8 @@ retrieve_bot_user_tool = Tool(
                 "type": "string",
                 "description": "Dummy parameter for no-parameter tools",
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         # 即使不需要参数，有些客户端也需要 required 不为空，这里设个 dummy 是个常见做法
@@ -231,6 +320,8 @@ create_database_tool = Tool(
                 "type": "object",
                 "description": "Property schema of database. The keys are the names of properties as they appear in Notion and the values are property schema objects.",
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["parent", "properties"],
@@ -276,6 +367,16 @@ query_database_tool = Tool(
                 "type": "number",
                 "description": "Number of results per page (max 100)",
             },
+            "fetch_all": fetch_all_parameter,
+            "max_items": max_items_parameter,
+            "stream": stream_parameter,
+            "local": {
+                "type": "boolean",
+                "description": "Allow answering from a local snapshot of the database rows when the server has one. Set to false to always query the Notion API.",
+                "default": True,
+            },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["database_id"],
@@ -293,6 +394,8 @@ retrieve_database_tool = Tool(
                 "description": "The ID of the database to retrieve."
                 + common_id_description,
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["database_id"],
@@ -324,6 +427,8 @@ update_database_tool = Tool(
                 "type": "object",
                 "description": "The properties of a database to be changed in the request, in the form of a JSON object.",
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["database_id"],
@@ -345,12 +450,94 @@ create_database_item_tool = Tool(
                 "type": "object",
                 "description": "Properties of the new database item. These should match the database schema.",
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["database_id", "properties"],
     },
 )
 
+batch_concurrency_parameter = {
+    "type": "number",
+    "description": "Maximum number of writes in flight at once (default 8). Requests are still throttled by the server's rate limit.",
+}
+
+idempotency_key_parameter = {
+    "type": "string",
+    "description": "Optional unique key for this item. If a batch is retried, items whose key already succeeded are not written again and return the original result. Keys are scoped to the target database; reusing a key with different content fails with an idempotency_conflict error.",
+}
+
+batch_create_database_items_tool = Tool(
+    name="notion_batch_create_database_items",
+    description="Create many items (pages) in a Notion database in one call. Items are written concurrently within the rate limit; the result lists the outcome of every item, so partial failures can be retried on their own.",
+    inputSchema={
+        "type": "object",
+        "properties": {
+            "database_id": {
+                "type": "string",
+                "description": "The ID of the database to add the items to."
+                + common_id_description,
+            },
+            "items": {
+                "type": "array",
+                "description": "Items to create",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "properties": {
+                            "type": "object",
+                            "description": "Properties of the new database item. These should match the database schema.",
+                        },
+                        "idempotency_key": idempotency_key_parameter,
+                    },
+                    "required": ["properties"],
+                },
+            },
+            "concurrency": batch_concurrency_parameter,
+            "fields": fields_parameter,
+            "compact": compact_parameter,
+            "format": format_parameter,
+        },
+        "required": ["database_id", "items"],
+    },
+)
+
+batch_update_page_properties_tool = Tool(
+    name="notion_batch_update_page_properties",
+    description="Update properties of many pages or database items in one call. Updates run concurrently within the rate limit and the result lists the outcome of every item.",
+    inputSchema={
+        "type": "object",
+        "properties": {
+            "items": {
+                "type": "array",
+                "description": "Updates to apply",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "page_id": {
+                            "type": "string",
+                            "description": "The ID of the page or database item to update."
+                            + common_id_description,
+                        },
+                        "properties": {
+                            "type": "object",
+                            "description": "Properties to update",
+                        },
+                        "idempotency_key": idempotency_key_parameter,
+                    },
+                    "required": ["page_id", "properties"],
+                },
+            },
+            "concurrency": batch_concurrency_parameter,
+            "fields": fields_parameter,
+            "compact": compact_parameter,
+            "format": format_parameter,
+        },
+        "required": ["items"],
+    },
+)
+
 # --- Comments Tools ---
 
 create_comment_tool = Tool(
@@ -380,6 +567,8 @@ create_comment_tool = Tool(
                 "description": "Array of rich text objects representing the comment content.",
                 "items": rich_text_object_schema,
             },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["rich_text"],
@@ -405,6 +594,11 @@ retrieve_comments_tool = Tool(
                 "type": "number",
                 "description": "Number of comments to retrieve (max 100).",
             },
+            "fetch_all": fetch_all_parameter,
+            "max_items": max_items_parameter,
+            "stream": stream_parameter,
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
         "required": ["block_id"],
@@ -459,7 +653,84 @@ search_tool = Tool(
                 "type": "number",
                 "description": "Number of results to return (max 100). ",
             },
+            "fetch_all": fetch_all_parameter,
+            "max_items": max_items_parameter,
+            "stream": stream_parameter,
+            "fields": fields_parameter,
+            "compact": compact_parameter,
+            "format": format_parameter,
+        },
+    },
+)
+
+aggregate_database_tool = Tool(
+    name="notion_aggregate_database",
+    description="Compute aggregates over the rows of a database on the server (count, sum, avg, min, max, distinct), optionally grouped by properties, and return only the small result table. Use this instead of notion_query_database to answer questions such as 'how many open tasks per assignee'.",
+    inputSchema={
+        "type": "object",
+        "properties": {
+            "database_id": {
+                "type": "string",
+                "description": "The ID of the database to aggregate."
+                + common_id_description,
+            },
+            "filter": {
+                "type": "object",
+                "description": "Filter conditions, same syntax as notion_query_database",
+            },
+            "group_by": {
+                "type": "array",
+                "description": "Property names to group by. Multi-value properties (multi_select, people, relation) count a row once per value.",
+                "items": {"type": "string"},
+            },
+            "aggregates": {
+                "type": "array",
+                "description": "Aggregates to compute for each group (default: count of rows)",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "function": {
+                            "type": "string",
+                            "enum": ["count", "sum", "avg", "min", "max", "distinct"],
+                        },
+                        "property": {
+                            "type": "string",
+                            "description": "Property to aggregate; optional for count (counts rows), otherwise required",
+                        },
+                    },
+                    "required": ["function"],
+                },
+            },
+            "max_items": {
+                "type": "number",
+                "description": "Maximum number of rows to scan",
+            },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
+            "format": format_parameter,
+        },
+        "required": ["database_id"],
+    },
+)
+
+local_search_tool = Tool(
+    name="notion_local_search",
+    description="Full-text search over the content of pages, blocks and database rows this server has already fetched, using a local index. Returns ranked matches with snippets in milliseconds without calling the Notion API. Content that has never been fetched is not indexed; use notion_search for title search across the whole workspace.",
+    inputSchema={
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "Text to search for in page titles, properties and block contents",
+            },
+            "limit": {
+                "type": "number",
+                "description": "Maximum number of matches to return (default 20)",
+            },
+            "fields": fields_parameter,
+            "compact": compact_parameter,
             "format": format_parameter,
         },
+        "required": ["query"],
     },
 )
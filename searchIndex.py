@@ -0,0 +1,224 @@
+# searchIndex.py
+#
+# 本地全文索引 (SQLite FTS5)。客户端每次拿到页面、块或数据库行时增量写入，
+# 写操作 (更新/删除块、更新页面属性) 同步更新索引。查询完全在本地完成，不消耗 API 额度。
+
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from markdownRenderer import page_title, plain_text, property_to_text
+
+_BLOCK_CHILDREN_ENDPOINT = re.compile(r"^/blocks/([^/]+)/children$")
+_BLOCK_ENDPOINT = re.compile(r"^/blocks/([^/]+)$")
+
+# trigram 分词支持中文等无空格语言的子串匹配，但查询词至少需要 3 个字符
+_MIN_TRIGRAM_LENGTH = 3
+
+
+def _trigram_available() -> bool:
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(a, tokenize='trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def block_text(block: Dict[str, Any]) -> str:
+    block_type = block.get("type", "")
+    data = block.get(block_type) or {}
+    if block_type == "table_row":
+        return " | ".join(plain_text(cell) for cell in data.get("cells", []))
+    if block_type in ("child_page", "child_database"):
+        return data.get("title", "")
+    parts = [plain_text(data.get("rich_text")), plain_text(data.get("caption"))]
+    if block_type == "equation":
+        parts.append(data.get("expression", ""))
+    return " ".join(part for part in parts if part)
+
+
+def page_text(page: Dict[str, Any]) -> str:
+    return "\n".join(
+        f"{name}: {property_to_text(prop)}"
+        for name, prop in (page.get("properties") or {}).items()
+        if prop.get("type") != "title"
+    )
+
+
+class SearchIndex:
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self.trigram = _trigram_available()
+        tokenizer = "trigram" if self.trigram else "unicode61"
+        # FTS5 表不能给 UNINDEXED 列建索引，对象元数据放在普通表里，两表通过 rowid 关联
+        self._conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS objects (
+                rowid INTEGER PRIMARY KEY,
+                object_id TEXT NOT NULL UNIQUE,
+                page_id TEXT,
+                parent_id TEXT,
+                kind TEXT NOT NULL,
+                title TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS objects_parent ON objects (parent_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents
+                USING fts5(title, body, tokenize='{tokenizer}');
+            """)
+
+    # --- 写入 ---
+
+    def observe(self, method: str, endpoint: str, response: Dict[str, Any]) -> None:
+        """根据 API 请求与响应增量更新索引"""
+        if method == "DELETE":
+            match = _BLOCK_ENDPOINT.match(endpoint)
+            if match:
+                self.remove(match.group(1))
+            return
+
+        kind = response.get("object")
+        if kind == "list":
+            match = _BLOCK_CHILDREN_ENDPOINT.match(endpoint)
+            parent_id = match.group(1) if match else None
+            with self._conn:
+                for item in response.get("results", []):
+                    self._index_object(item, parent_id)
+        elif kind in ("page", "block", "database"):
+            with self._conn:
+                self._index_object(response, None)
+
+    def _index_object(self, item: Dict[str, Any], parent_id: Optional[str]) -> None:
+        kind = item.get("object")
+        object_id = item.get("id")
+        if not object_id:
+            return
+        if item.get("archived") or item.get("in_trash"):
+            self._remove(object_id)
+            return
+        if kind == "block":
+            parent = item.get("parent") or {}
+            parent_id = parent_id or parent.get(parent.get("type", ""))
+            self._upsert(object_id, parent_id, "block", "", block_text(item))
+        elif kind in ("page", "database"):
+            self._upsert(object_id, None, kind, page_title(item), page_text(item))
+
+    def _upsert(
+        self,
+        object_id: str,
+        parent_id: Optional[str],
+        kind: str,
+        title: str,
+        body: str,
+    ) -> None:
+        if kind == "block":
+            # 块所属的页面：父级是已索引的块时沿用其页面，否则父级本身就是页面
+            row = self._conn.execute(
+                "SELECT page_id, kind FROM objects WHERE object_id = ?", (parent_id,)
+            ).fetchone()
+            page_id = row[0] if row is not None and row[1] == "block" else parent_id
+        else:
+            page_id = object_id
+        self._delete_rows("object_id = ?", (object_id,))
+        if not title and not body:
+            return
+        cursor = self._conn.execute(
+            "INSERT INTO objects (object_id, page_id, parent_id, kind, title) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (object_id, page_id, parent_id, kind, title),
+        )
+        self._conn.execute(
+            "INSERT INTO documents (rowid, title, body) VALUES (?, ?, ?)",
+            (cursor.lastrowid, title, body),
+        )
+
+    def _delete_rows(self, where: str, args: tuple) -> None:
+        self._conn.execute(
+            f"DELETE FROM documents WHERE rowid IN (SELECT rowid FROM objects WHERE {where})",
+            args,
+        )
+        self._conn.execute(f"DELETE FROM objects WHERE {where}", args)
+
+    def _remove(self, object_id: str) -> None:
+        self._delete_rows("object_id = ? OR parent_id = ?", (object_id, object_id))
+
+    def remove(self, object_id: str) -> None:
+        """删除一个对象及其已索引的直接子块"""
+        with self._conn:
+            self._remove(object_id)
+
+    # --- 查询 ---
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        terms = query.split()
+        short_terms: List[str] = []
+        if self.trigram:
+            short_terms = [term for term in terms if len(term) < _MIN_TRIGRAM_LENGTH]
+            terms = [term for term in terms if len(term) >= _MIN_TRIGRAM_LENGTH]
+        if not terms:
+            return self._search_like(query.strip(), limit)
+
+        # 每个词都加引号，避免 FTS5 查询语法被用户输入破坏
+        match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        sql = (
+            "SELECT o.object_id, o.page_id, o.kind, o.title, "
+            "snippet(documents, -1, '**', '**', '…', 16), bm25(documents) "
+            "FROM documents JOIN objects o ON o.rowid = documents.rowid "
+            "WHERE documents MATCH ?"
+        )
+        args: List[Any] = [match]
+        # trigram 无法匹配过短的词，退化为 LIKE 过滤
+        for term in short_terms:
+            sql += " AND (documents.title LIKE ? OR documents.body LIKE ?)"
+            args += [f"%{term}%", f"%{term}%"]
+        sql += " ORDER BY bm25(documents) LIMIT ?"
+        args.append(limit)
+        return [self._hit(*row) for row in self._conn.execute(sql, args).fetchall()]
+
+    def _search_like(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        if not query:
+            return []
+        pattern = f"%{query}%"
+        rows = self._conn.execute(
+            "SELECT o.object_id, o.page_id, o.kind, o.title, "
+            "substr(documents.body, 1, 120), 0 "
+            "FROM documents JOIN objects o ON o.rowid = documents.rowid "
+            "WHERE documents.title LIKE ? OR documents.body LIKE ? LIMIT ?",
+            (pattern, pattern, limit),
+        ).fetchall()
+        return [self._hit(*row) for row in rows]
+
+    def _hit(
+        self,
+        object_id: str,
+        page_id: str,
+        kind: str,
+        title: str,
+        snippet: str,
+        score: float,
+    ) -> Dict[str, Any]:
+        if not title and page_id:
+            row = self._conn.execute(
+                "SELECT title FROM objects WHERE object_id = ?", (page_id,)
+            ).fetchone()
+            title = row[0] if row else ""
+        return {
+            "object": "search_hit",
+            "id": object_id,
+            "page_id": page_id,
+            "kind": kind,
+            "title": title,
+            "snippet": snippet,
+            "score": round(-score, 4),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        count = self._conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+        return {"path": self.path, "documents": count}
+
+    def close(self) -> None:
+        self._conn.close()
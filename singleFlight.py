@@ -0,0 +1,57 @@
+# singleFlight.py
+#
+# 请求合并 (single-flight)：同一时刻完全相同的只读请求只向上游发出一次，
+# 其余调用者等待同一个结果。缓存失效后的"惊群"不会把限速额度耗尽。
+
+import asyncio
+import copy
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def request_key(
+    method: str,
+    endpoint: str,
+    body: Optional[Dict[str, Any]] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> str:
+    """method + endpoint + 规范化的 body/params (键排序) 作为合并键"""
+    canonical = json.dumps(
+        [body or None, params or None], sort_keys=True, separators=(",", ":")
+    )
+    return f"{method} {endpoint} {canonical}"
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            # 后来者拿到独立副本，避免多个调用者修改同一个对象
+            return copy.deepcopy(await asyncio.shield(future))
+
+        future = asyncio.ensure_future(fn())
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        # shield：某个调用者被取消时不影响其他等待同一请求的调用者
+        return await asyncio.shield(future)
+
+    def _forget(self, key: str, future: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # 所有等待者都被取消时，避免 "exception was never retrieved" 警告
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,315 @@
+# sqliteCache.py
+#
+# ResponseCache 的持久化二级存储：本地 SQLite 文件 (WAL 模式)。
+# 服务器重启后缓存仍然有效，同一台机器上的多个 uvicorn worker 共享同一个文件；
+# 失效操作写入日志表，各 worker 在查询缓存前读取日志，清理自己内存中的旧条目。
+# 条目在内存 TTL 过期后继续保留 retention 秒：过期条目不直接返回，但调用方可以
+# 按 last_edited_time 重新验证后续期 (重启后无需重新拉取未变化的内容)。
+# 读写在事件循环中同步调用，但只等待很短的锁超时 (WAL 模式下读不被写阻塞)：
+# 另一个 worker 长时间持有写锁时，读取按未命中处理、写入直接放弃，不阻塞事件循环。
+# 失效不能丢弃：拿不到锁时转到后台线程 (独立连接，正常的锁超时) 中重试，
+# 完成之前本进程把该资源视为未命中。定期维护同样在后台线程中执行。
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    kind TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    last_edited_time TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    retain_until REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, resource_id, variant)
+);
+CREATE INDEX IF NOT EXISTS cache_entries_stored ON cache_entries (stored_at);
+CREATE TABLE IF NOT EXISTS cache_invalidations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    invalidated_at REAL NOT NULL
+);
+"""
+
+# 过期条目的默认保留时间 (秒)
+DEFAULT_RETENTION = 7 * 86400.0
+
+# 每写入多少次检查一次过期条目和总容量
+_MAINTENANCE_INTERVAL = 500
+
+# 失效日志的保留时间 (秒)，超过内存缓存最长 TTL 的记录已无意义
+_INVALIDATION_RETENTION = 86400.0
+
+# 事件循环中的操作等待其他进程释放写锁的最长时间 (秒)
+DEFAULT_BUSY_TIMEOUT = 0.05
+
+# 后台线程中的操作 (失效重试、维护) 等待写锁的最长时间 (秒)
+_BACKGROUND_TIMEOUT = 5.0
+
+
+class SqliteCacheStore:
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 1024 * 1024 * 1024,
+        retention: float = DEFAULT_RETENTION,
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.retention = retention
+        # 建表与迁移在启动时执行，使用正常的锁超时
+        self._conn = self._connect(_BACKGROUND_TIMEOUT)
+        self._conn.executescript(_SCHEMA)
+        # 旧版本创建的文件没有 retain_until 列
+        columns = {
+            row[1] for row in self._conn.execute("PRAGMA table_info(cache_entries)")
+        }
+        if "retain_until" not in columns:
+            self._conn.execute(
+                "ALTER TABLE cache_entries "
+                "ADD COLUMN retain_until REAL NOT NULL DEFAULT 0"
+            )
+            self._conn.execute("UPDATE cache_entries SET retain_until = expires_at")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_entries_retain "
+            "ON cache_entries (retain_until)"
+        )
+        self._writes = 0
+        # 已读到的失效日志位置：从当前末尾开始，之前的失效与本进程的内存缓存无关
+        self._invalidation_seq = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM cache_invalidations"
+        ).fetchone()[0]
+        self._conn.execute(f"PRAGMA busy_timeout={int(busy_timeout * 1000)}")
+        # 后台线程使用的连接 (按需创建)，由锁串行化
+        self._background: Optional[sqlite3.Connection] = None
+        self._background_lock = threading.Lock()
+        self._tasks: Set["asyncio.Future[None]"] = set()
+        # 尚未写入的失效 (kind, resource_id)：写入完成前本进程不读取这些资源的条目
+        self._pending: Set[Tuple[str, str]] = set()
+        self._closed = False
+        # 因锁竞争按未命中处理或放弃的操作数
+        self.busy = 0
+
+    def _connect(self, timeout: float) -> sqlite3.Connection:
+        # isolation_level=None：自动提交，每条语句都是一个短事务，减少多进程间的锁持有时间
+        conn = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False, timeout=timeout
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        return conn
+
+    def _in_background(self, fn: Callable[[sqlite3.Connection], Any]) -> None:
+        """在后台线程中用独立连接执行 fn；没有运行中的事件循环时直接执行"""
+
+        def run() -> None:
+            with self._background_lock:
+                if self._closed:
+                    return
+                if self._background is None:
+                    self._background = self._connect(_BACKGROUND_TIMEOUT)
+                try:
+                    fn(self._background)
+                except sqlite3.Error:
+                    logger.exception("Cache store background operation failed")
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            run()
+            return
+        task = loop.create_task(asyncio.to_thread(run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def get(self, key: CacheKey) -> Optional[Tuple[bytes, float]]:
+        """返回 (payload, 剩余有效秒数)，不存在、已过期或拿不到锁时返回 None"""
+        if (key[0], key[1]) in self._pending:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM cache_entries "
+                "WHERE kind = ? AND resource_id = ? AND variant = ?",
+                key,
+            ).fetchone()
+        except sqlite3.OperationalError:
+            self.busy += 1
+            return None
+        if row is None:
+            return None
+        remaining = row[1] - time.time()
+        if remaining <= 0:
+            return None
+        return row[0], remaining
+
+    def get_expired(self, key: CacheKey) -> Optional[Tuple[bytes, str, float]]:
+        """已过期但仍在保留期内的条目：返回 (payload, last_edited_time, 写入时间)
+
+        没有记录 last_edited_time 的条目无法重新验证，返回 None。
+        """
+        if (key[0], key[1]) in self._pending:
+            return None
+        now = time.time()
+        try:
+            row = self._conn.execute(
+                "SELECT payload, last_edited_time, stored_at FROM cache_entries "
+                "WHERE kind = ? AND resource_id = ? AND variant = ? "
+                "AND expires_at <= ? AND retain_until > ?",
+                (*key, now, now),
+            ).fetchone()
+        except sqlite3.OperationalError:
+            self.busy += 1
+            return None
+        if row is None or not row[1]:
+            return None
+        return row[0], row[1], row[2]
+
+    def set(
+        self,
+        key: CacheKey,
+        payload: bytes,
+        ttl: float,
+        last_edited_time: Optional[str] = None,
+    ) -> None:
+        if (key[0], key[1]) in self._pending:
+            # 失效尚未写入：写入的新条目可能随后被失效删除，也可能在其之前被其他进程读到
+            return
+        now = time.time()
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries "
+                "(kind, resource_id, variant, payload, last_edited_time, stored_at, "
+                "expires_at, retain_until) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    *key,
+                    payload,
+                    last_edited_time,
+                    now,
+                    now + ttl,
+                    now + ttl + self.retention,
+                ),
+            )
+        except sqlite3.OperationalError:
+            # 二级缓存只是加速：拿不到锁时放弃这次写入
+            self.busy += 1
+            return
+        self._writes += 1
+        if self._writes % _MAINTENANCE_INTERVAL == 0:
+            self._in_background(self._maintain)
+
+    def invalidate(self, kind: str, resource_id: str) -> None:
+        try:
+            seq = self._invalidate(self._conn, kind, resource_id)
+        except sqlite3.OperationalError:
+            self.busy += 1
+            self._pending.add((kind, resource_id))
+
+            def retry(conn: sqlite3.Connection) -> None:
+                self._invalidate(conn, kind, resource_id)
+                self._pending.discard((kind, resource_id))
+
+            self._in_background(retry)
+            return
+        if seq == self._invalidation_seq + 1:
+            # 中间没有其他进程的记录：本进程已经清理过内存缓存，不必再读回
+            self._invalidation_seq = seq
+
+    @staticmethod
+    def _invalidate(conn: sqlite3.Connection, kind: str, resource_id: str) -> int:
+        conn.execute(
+            "DELETE FROM cache_entries WHERE kind = ? AND resource_id = ?",
+            (kind, resource_id),
+        )
+        # 记入失效日志，其他 worker 据此清理各自的内存缓存
+        return conn.execute(
+            "INSERT INTO cache_invalidations (kind, resource_id, invalidated_at) "
+            "VALUES (?, ?, ?)",
+            (kind, resource_id, time.time()),
+        ).lastrowid
+
+    def invalidations(self) -> List[Tuple[str, str]]:
+        """上次调用以来 (任意进程) 记录的失效 (kind, resource_id)
+
+        拿不到锁时返回空列表，位置不变，下次调用时再读取。
+        """
+        try:
+            rows = self._conn.execute(
+                "SELECT seq, kind, resource_id FROM cache_invalidations WHERE seq > ? "
+                "ORDER BY seq",
+                (self._invalidation_seq,),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            self.busy += 1
+            return []
+        if rows:
+            self._invalidation_seq = rows[-1][0]
+        return [(kind, resource_id) for _, kind, resource_id in rows]
+
+    def clear(self) -> None:
+        try:
+            self._conn.execute("DELETE FROM cache_entries")
+        except sqlite3.OperationalError:
+            self.busy += 1
+            self._in_background(lambda conn: conn.execute("DELETE FROM cache_entries"))
+
+    def maintain(self) -> None:
+        """删除超过保留期的条目；超过容量时按写入时间淘汰最旧的条目"""
+        self._in_background(self._maintain)
+
+    def _maintain(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM cache_entries WHERE retain_until < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM cache_invalidations WHERE invalidated_at < ?",
+            (time.time() - _INVALIDATION_RETENTION,),
+        )
+        total = conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM cache_entries"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        rows = conn.execute(
+            "SELECT kind, resource_id, variant, LENGTH(payload) FROM cache_entries "
+            "ORDER BY stored_at"
+        )
+        doomed = []
+        for kind, resource_id, variant, size in rows:
+            doomed.append((kind, resource_id, variant))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany(
+            "DELETE FROM cache_entries WHERE kind = ? AND resource_id = ? AND variant = ?",
+            doomed,
+        )
+
+    def stats(self) -> dict:
+        stats = {"path": self.path, "busy": self.busy, "pending": len(self._pending)}
+        try:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM cache_entries"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return stats
+        stats.update(entries=count, bytes=size)
+        return stats
+
+    def close(self) -> None:
+        self._conn.close()
+        with self._background_lock:
+            self._closed = True
+            if self._background is not None:
+                self._background.close()
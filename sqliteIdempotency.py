@@ -0,0 +1,103 @@
+# sqliteIdempotency.py
+#
+# IdempotencyStore 的持久化存储：本地 SQLite 文件 (WAL 模式)。
+# 同一台机器上的多个 worker 共享幂等键，服务器重启后已成功的写入仍然会被重放。
+# 执行写入前先认领键 (带租约)：另一个 worker 正在执行同一个键时，后来者等待其结果；
+# 认领者崩溃后租约到期，键可以被重新认领。
+# 每个操作都是单条语句的短事务，由调用方放到线程中执行，不阻塞事件循环。
+
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    response TEXT,
+    stored_at REAL NOT NULL,
+    claimed_until REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idempotency_keys_stored ON idempotency_keys (stored_at);
+"""
+
+# 每写入多少次清理一次过期的键
+_MAINTENANCE_INTERVAL = 500
+
+# claim 的结果：(状态, 内容指纹, 响应)
+# 状态为 "claimed" (本进程认领成功)、"done" (已有结果) 或 "pending" (其他进程正在执行)
+Claim = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+class SqliteIdempotencyStore:
+    def __init__(self, path: str, ttl: float = 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._conn = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False, timeout=5.0
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+        self._writes = 0
+
+    def claim(self, key: str, digest: str, lease: float) -> Claim:
+        """认领一个键；已有未过期的结果或其他进程持有租约时返回现有状态"""
+        now = time.time()
+        # 单条语句完成“不存在或已失效则认领”：结果过期、或未完成且租约到期的键可以重新认领
+        claimed = self._conn.execute(
+            "INSERT INTO idempotency_keys "
+            "(key, digest, response, stored_at, claimed_until) VALUES (?, ?, NULL, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET digest = excluded.digest, response = NULL, "
+            "stored_at = excluded.stored_at, claimed_until = excluded.claimed_until "
+            "WHERE (response IS NOT NULL AND stored_at < ?) "
+            "OR (response IS NULL AND claimed_until < ?)",
+            (key, digest, now, now + lease, now - self.ttl, now),
+        ).rowcount
+        if claimed:
+            self._wrote()
+            return "claimed", digest, None
+        row = self._conn.execute(
+            "SELECT digest, response FROM idempotency_keys WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            # 刚被其他进程释放：下次重试时再认领
+            return "pending", digest, None
+        if row[1] is None:
+            return "pending", row[0], None
+        return "done", row[0], json.loads(row[1])
+
+    def complete(self, key: str, digest: str, response: Dict[str, Any]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO idempotency_keys "
+            "(key, digest, response, stored_at, claimed_until) VALUES (?, ?, ?, ?, 0)",
+            (key, digest, json.dumps(response, ensure_ascii=False), time.time()),
+        )
+        self._wrote()
+
+    def release(self, key: str) -> None:
+        """写入失败：删除未完成的认领，键可以立即重试"""
+        self._conn.execute(
+            "DELETE FROM idempotency_keys WHERE key = ? AND response IS NULL", (key,)
+        )
+
+    def _wrote(self) -> None:
+        self._writes += 1
+        if self._writes % _MAINTENANCE_INTERVAL == 0:
+            self.maintain()
+
+    def maintain(self) -> None:
+        """删除过期的结果与早已失效的认领"""
+        self._conn.execute(
+            "DELETE FROM idempotency_keys WHERE stored_at < ? AND claimed_until < ?",
+            (time.time() - self.ttl, time.time()),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        row = self._conn.execute("SELECT COUNT(*) FROM idempotency_keys").fetchone()
+        return {"path": self.path, "keys": row[0]}
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,92 @@
+# sqliteRateLimit.py
+#
+# 多进程共享的令牌桶状态：本地 SQLite 文件 (WAL 模式)。
+# 同一台机器上的多个 worker 从同一个桶取令牌，Notion 按 integration 限速，
+# 因此桶以 token 的哈希为键；收到 429 时的暂停也写入桶中，所有 worker 一起退让。
+# 每次取令牌是一个很短的 IMMEDIATE 事务；等待其他进程的锁最长可达 busy_timeout，
+# 因此由 SharedTokenBucket 放到线程中调用，连接上的操作用锁串行化。
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    paused_until REAL NOT NULL
+);
+"""
+
+
+def bucket_key(token: str) -> str:
+    """桶的键：不把 token 明文写入文件"""
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+class SqliteRateLimitStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False, timeout=5.0
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+        # 连接在多个线程间共用：显式事务期间不能插入其他语句
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        """尝试取一个令牌：成功返回 0，否则返回需要等待的秒数"""
+        with self._lock:
+            return self._take(key, rate, capacity)
+
+    def _take(self, key: str, rate: float, capacity: float) -> float:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = self._conn.execute(
+                "SELECT tokens, updated, paused_until FROM token_buckets WHERE key = ?",
+                (key,),
+            ).fetchone()
+            tokens, updated, paused_until = row if row else (capacity, now, 0.0)
+            tokens = min(capacity, tokens + max(now - updated, 0.0) * rate)
+            if now < paused_until:
+                wait = paused_until - now
+            elif tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._conn.execute(
+                "INSERT OR REPLACE INTO token_buckets (key, tokens, updated, paused_until) "
+                "VALUES (?, ?, ?, ?)",
+                (key, tokens, now, paused_until),
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def pause(self, key: str, seconds: float) -> None:
+        """所有共享该桶的 worker 暂停 seconds 秒，并清空令牌"""
+        with self._lock:
+            self._pause(key, seconds)
+
+    def _pause(self, key: str, seconds: float) -> None:
+        now = time.time()
+        self._conn.execute(
+            "INSERT INTO token_buckets (key, tokens, updated, paused_until) "
+            "VALUES (?, 0, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET tokens = 0, updated = excluded.updated, "
+            "paused_until = MAX(paused_until, excluded.paused_until)",
+            (key, now, now + seconds),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,133 @@
+# syncEngine.py
+#
+# 后台增量同步：按 last_edited_time 倒序轮询 search，遇到已同步过的条目就停止，
+# 只重新获取发生变化的页面/数据库并写入缓存。变化在一个轮询周期内被发现并使旧缓存失效，
+# 因此读工具可以放心使用较长的缓存 TTL，陈旧时间以轮询周期为上界。
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from rateLimiter import PRIORITY_BULK, TokenBucket, current_budget, current_priority
+
+_SORT_BY_EDITED = {"direction": "descending", "timestamp": "last_edited_time"}
+
+
+class SyncEngine:
+    def __init__(
+        self,
+        client: Any,
+        interval: float = 60.0,
+        budget_share: float = 0.2,
+        max_items_per_cycle: int = 100,
+    ):
+        self.client = client
+        self.interval = interval
+        self.max_items_per_cycle = max_items_per_cycle
+        # 同步任务只能使用总限速额度的一部分，并且优先级最低
+        rate = client.scheduler.bucket.rate * budget_share
+        self.budget = TokenBucket(rate, capacity=max(rate, 1.0))
+        # 水位线：此时间之前的变化都已同步；_synced 记录水位线之上已同步条目的时间戳
+        self.watermark: Optional[str] = None
+        self._synced: Dict[str, str] = {}
+        self.cycles = 0
+        self.synced = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        current_priority.set(PRIORITY_BULK)
+        current_budget.set(self.budget)
+        while True:
+            try:
+                await self.sync_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"Workspace sync failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sync_once(self) -> int:
+        """执行一次增量同步，返回本轮同步的条目数
+
+        每轮最多同步 max_items_per_cycle 条；没有扫描到水位线的轮次不推进水位线，
+        剩余的变化 (以及首次启动时的全量回填) 在后续轮次中继续处理。
+        """
+        changed = []
+        newest: Optional[str] = None
+        complete = True
+        items = self.client.iter_search(sort=_SORT_BY_EDITED)
+        try:
+            async for item in items:
+                stamp = item.get("last_edited_time") or ""
+                if newest is None:
+                    newest = stamp
+                if self.watermark is not None and stamp < self.watermark:
+                    break
+                # last_edited_time 只精确到分钟，与水位线相同的条目仍需逐个比较
+                if self._synced.get(item["id"]) == stamp:
+                    continue
+                if len(changed) >= self.max_items_per_cycle:
+                    complete = False
+                    break
+                changed.append(item)
+        finally:
+            await items.aclose()
+
+        for item in changed:
+            await self._sync_item(item)
+            self._synced[item["id"]] = item.get("last_edited_time") or ""
+
+        if complete and newest is not None:
+            # 水位线之上的变化已全部同步，推进水位线并丢弃更旧的记录
+            self.watermark = newest
+            self._synced = {
+                object_id: stamp
+                for object_id, stamp in self._synced.items()
+                if stamp >= newest
+            }
+        self.cycles += 1
+        self.synced += len(changed)
+        return len(changed)
+
+    async def _sync_item(self, item: Dict[str, Any]) -> None:
+        client = self.client
+        object_id = item["id"]
+        if item.get("object") == "database":
+            client.invalidate("database", object_id)
+            if client.local_queries is not None:
+                client.local_queries.invalidate(object_id)
+            await client.retrieve_database(object_id)
+            return
+
+        # 页面：元数据直接使用 search 结果，内容树按需重新获取
+        client.invalidate("page", object_id)
+        client.invalidate("block", object_id)
+        if client.cache is not None:
+            client.cache.set("page", object_id, item)
+        # 数据库行：直接更新本地查询快照
+        if client.local_queries is not None:
+            client.local_queries.upsert_row(item)
+        await client.retrieve_block_tree(object_id, revalidate=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "watermark": self.watermark,
+            "cycles": self.cycles,
+            "synced": self.synced,
+            "errors": self.errors,
+        }
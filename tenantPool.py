@@ -0,0 +1,166 @@
+# tenantPool.py
+#
+# 多租户模式：每个 Notion token 一个客户端 (各自的令牌桶、读缓存和连接池)，
+# 互不影响；一个租户被限速或占满连接时其他租户照常工作。
+# 客户端按 LRU 保留最多 max_tenants 个，被淘汰时关闭；正在执行工具调用的客户端
+# 延迟到调用结束后再关闭。
+# token 来自 MCP 请求的 HTTP 头：X-Notion-Tenant (在租户表中查找，Bearer 头携带该租户的
+# secret) 或 Authorization: Bearer <Notion token>。
+
+import hmac
+import logging
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Mapping,
+    Optional,
+    Set,
+)
+
+from notionClient import AsyncNotionClientWrapper
+from sqliteRateLimit import bucket_key
+
+TENANT_HEADER = "x-notion-tenant"
+
+ClientFactory = Callable[[str, str], AsyncNotionClientWrapper]
+
+
+# 租户表：租户 ID -> {"token": Notion token, "secret": 请求需携带的 Bearer secret}
+Tenants = Dict[str, Dict[str, str]]
+
+
+def check_tenants(tenants: Tenants) -> None:
+    """每个租户都必须配置 token 与 secret，否则拒绝启动"""
+    for tenant, entry in tenants.items():
+        if not isinstance(entry, dict) or not entry.get("token"):
+            raise ValueError(f"Tenant {tenant!r} has no Notion token")
+        if not entry.get("secret"):
+            raise ValueError(f"Tenant {tenant!r} has no secret")
+
+
+def resolve_token(
+    headers: Mapping[str, str],
+    tenants: Optional[Tenants] = None,
+    default: Optional[str] = None,
+) -> str:
+    """从请求头取出 Notion token：租户 ID 优先，其次 Bearer token，最后是默认 token
+
+    X-Notion-Tenant 请求必须在 Authorization: Bearer 头中携带该租户的 secret；
+    default 为 None 时没有携带凭据的请求被拒绝。
+    """
+    authorization = headers.get("authorization", "")
+    scheme, _, credentials = authorization.partition(" ")
+    credentials = credentials.strip() if scheme.lower() == "bearer" else ""
+    tenant = headers.get(TENANT_HEADER)
+    if tenant:
+        entry = (tenants or {}).get(tenant)
+        # 未知租户与 secret 错误返回同样的错误，不泄露租户 ID 是否存在
+        if entry is None or not hmac.compare_digest(
+            credentials.encode(), entry["secret"].encode()
+        ):
+            raise ValueError(f"Invalid credentials for tenant: {tenant}")
+        return entry["token"]
+    if credentials:
+        return credentials
+    if default:
+        return default
+    raise ValueError(
+        "Missing Notion token: send an X-Notion-Tenant or Authorization: Bearer header"
+    )
+
+
+def tenant_path(path: Optional[str], key: str) -> Optional[str]:
+    """每个租户独立的 SQLite 文件：cache.sqlite -> cache.<key>.sqlite"""
+    if not path or path == ":memory:":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{key[:16]}{ext}"
+
+
+class TenantPool:
+    def __init__(self, factory: ClientFactory, max_tenants: int = 32):
+        # factory(token, key) 创建一个租户的客户端，key 是 token 的哈希
+        self.factory = factory
+        self.max_tenants = max(1, max_tenants)
+        self._clients: "OrderedDict[str, AsyncNotionClientWrapper]" = OrderedDict()
+        # 正在使用的客户端 -> 进行中的调用数
+        self._in_use: Dict[AsyncNotionClientWrapper, int] = {}
+        # 已被淘汰、等待最后一个调用结束后关闭的客户端
+        self._retired: Set[AsyncNotionClientWrapper] = set()
+        self.created = 0
+        self.hits = 0
+        self.evicted = 0
+
+    @asynccontextmanager
+    async def acquire(self, token: str) -> AsyncIterator[AsyncNotionClientWrapper]:
+        """取得 token 对应的客户端，在 async with 块内不会被关闭"""
+        key = bucket_key(token)
+        client = self._clients.get(key)
+        created = client is None
+        if client is None:
+            client = self.factory(token, key)
+            self._clients[key] = client
+            self.created += 1
+        else:
+            self._clients.move_to_end(key)
+            self.hits += 1
+        # 先标记为使用中再淘汰：_evict 中的 await 期间其他 acquire 可能插入新客户端，
+        # 使本客户端成为最久未用的一个，此时它只会被延迟关闭
+        self._in_use[client] = self._in_use.get(client, 0) + 1
+        try:
+            if created:
+                await self._evict()
+            yield client
+        finally:
+            remaining = self._in_use[client] - 1
+            if remaining:
+                self._in_use[client] = remaining
+            else:
+                del self._in_use[client]
+                if client in self._retired:
+                    self._retired.discard(client)
+                    await client.aclose()
+
+    async def _evict(self) -> None:
+        while len(self._clients) > self.max_tenants:
+            _, client = self._clients.popitem(last=False)
+            self.evicted += 1
+            if client in self._in_use:
+                self._retired.add(client)
+            else:
+                await client.aclose()
+
+    def clients(self) -> Dict[str, AsyncNotionClientWrapper]:
+        """当前保留的客户端，键为 token 哈希的前 12 位 (不暴露 token)"""
+        return {key[:12]: client for key, client in self._clients.items()}
+
+    def client_stats(
+        self, stats: Callable[[AsyncNotionClientWrapper], Optional[Dict[str, Any]]]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """对每个保留的客户端取一份统计，键同 clients()"""
+        return {key: stats(client) for key, client in self.clients().items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tenants": len(self._clients),
+            "max_tenants": self.max_tenants,
+            "in_use": len(self._in_use),
+            "created": self.created,
+            "hits": self.hits,
+            "evicted": self.evicted,
+        }
+
+    async def aclose(self) -> None:
+        for client in list(self._clients.values()) + list(self._retired):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logging.warning(f"Failed to close tenant client: {e}")
+        self._clients.clear()
+        self._retired.clear()
+        self._in_use.clear()
@@ -0,0 +1,75 @@
+# conftest.py
+#
+# 测试使用的 Notion API 替身：通过 httpx.MockTransport 接入客户端，不访问网络。
+# 按 (方法, 路径) 注册处理函数，记录每个请求，便于断言 API 调用次数。
+
+import inspect
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notionClient import AsyncNotionClientWrapper  # noqa: E402
+
+Handler = Callable[[httpx.Request], Any]
+
+
+class FakeNotion:
+    def __init__(self) -> None:
+        self.routes: Dict[Tuple[str, str], Handler] = {}
+        self.requests: List[httpx.Request] = []
+
+    def route(self, method: str, path: str, handler: Any) -> None:
+        """handler 可以是返回 JSON 的函数 (或协程函数)，也可以直接是 JSON 响应"""
+        self.routes[(method, path)] = (
+            handler if callable(handler) else (lambda request: handler)
+        )
+
+    def calls(self, method: str = "", path: str = "") -> List[httpx.Request]:
+        return [
+            request
+            for request in self.requests
+            if (not method or request.method == method)
+            and (not path or request.url.path == "/v1" + path)
+        ]
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        path = request.url.path[len("/v1") :]
+        handler = self.routes.get((request.method, path))
+        if handler is None:
+            return httpx.Response(404, json={"object": "error", "status": 404})
+        body = handler(request)
+        if inspect.isawaitable(body):
+            # MockTransport 在异步客户端中会 await 返回的协程
+            return self._respond_later(body)
+        return self._respond(body)
+
+    async def _respond_later(self, body: Any) -> httpx.Response:
+        return self._respond(await body)
+
+    @staticmethod
+    def _respond(body: Any) -> httpx.Response:
+        if isinstance(body, httpx.Response):
+            return body
+        return httpx.Response(200, json=body)
+
+    def client(self, **options: Any) -> AsyncNotionClientWrapper:
+        options.setdefault("rate_limit", 1000)
+        return AsyncNotionClientWrapper(
+            "test-token", transport=httpx.MockTransport(self.handle), **options
+        )
+
+
+def request_json(request: httpx.Request) -> Dict[str, Any]:
+    return json.loads(request.content or b"{}")
+
+
+@pytest.fixture
+def notion() -> FakeNotion:
+    return FakeNotion()
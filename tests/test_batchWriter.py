@@ -0,0 +1,132 @@
+import asyncio
+
+from batchWriter import IdempotencyStore, run_batch
+from sqliteIdempotency import SqliteIdempotencyStore
+
+
+def _writer(calls):
+    async def write(item):
+        calls.append(item)
+        return {"id": f"page-{len(calls)}"}
+
+    return write
+
+
+def test_retried_batch_replays_succeeded_items():
+    async def run():
+        calls, store = [], IdempotencyStore()
+        items = [{"properties": {"n": 1}, "idempotency_key": "a"}]
+        first = await run_batch(items, _writer(calls), store, scope="db1")
+        second = await run_batch(items, _writer(calls), store, scope="db1")
+        assert len(calls) == 1
+        assert second["results"][0]["id"] == first["results"][0]["id"]
+        assert second["results"][0]["replayed"] is True
+
+    asyncio.run(run())
+
+
+def test_keys_are_scoped():
+    async def run():
+        calls, store = [], IdempotencyStore()
+        items = [{"properties": {"n": 1}, "idempotency_key": "a"}]
+        await run_batch(items, _writer(calls), store, scope="db1")
+        result = await run_batch(items, _writer(calls), store, scope="db2")
+        assert len(calls) == 2
+        assert result["results"][0]["replayed"] is False
+
+    asyncio.run(run())
+
+
+def test_reused_key_with_different_payload_is_rejected():
+    async def run():
+        calls, store = [], IdempotencyStore()
+        write = _writer(calls)
+        await run_batch(
+            [{"properties": {"n": 1}, "idempotency_key": "a"}], write, store, scope="db"
+        )
+        result = await run_batch(
+            [{"properties": {"n": 2}, "idempotency_key": "a"}], write, store, scope="db"
+        )
+        assert len(calls) == 1
+        assert result["failed"] == 1
+        assert result["results"][0]["error"]["code"] == "idempotency_conflict"
+        assert store.stats()["conflicts"] == 1
+
+    asyncio.run(run())
+
+
+def test_persisted_keys_survive_restart_and_are_shared(tmp_path):
+    path = str(tmp_path / "idempotency.sqlite")
+
+    async def run():
+        calls = []
+        items = [{"properties": {"n": 1}, "idempotency_key": "a"}]
+        first = IdempotencyStore(store=SqliteIdempotencyStore(path))
+        await run_batch(items, _writer(calls), first, scope="db")
+        first.close()
+
+        # 另一个 worker (或重启后的进程) 打开同一个文件
+        second = IdempotencyStore(store=SqliteIdempotencyStore(path))
+        other = IdempotencyStore(store=SqliteIdempotencyStore(path))
+        try:
+            result = await run_batch(items, _writer(calls), second, scope="db")
+            assert result["results"][0]["replayed"] is True
+            conflict = [{"properties": {"n": 2}, "idempotency_key": "a"}]
+            result = await run_batch(conflict, _writer(calls), other, scope="db")
+            assert result["results"][0]["error"]["code"] == "idempotency_conflict"
+            assert len(calls) == 1
+        finally:
+            second.close()
+            other.close()
+
+    asyncio.run(run())
+
+
+def test_concurrent_workers_write_once(tmp_path):
+    path = str(tmp_path / "idempotency.sqlite")
+
+    async def run():
+        calls = []
+
+        async def slow_write(item):
+            calls.append(item)
+            await asyncio.sleep(0.2)
+            return {"id": "page-1"}
+
+        items = [{"properties": {"n": 1}, "idempotency_key": "a"}]
+        workers = [
+            IdempotencyStore(store=SqliteIdempotencyStore(path)) for _ in range(3)
+        ]
+        try:
+            results = await asyncio.gather(
+                *(run_batch(items, slow_write, store, scope="db") for store in workers)
+            )
+            assert len(calls) == 1
+            assert {r["results"][0]["id"] for r in results} == {"page-1"}
+        finally:
+            for store in workers:
+                store.close()
+
+    asyncio.run(run())
+
+
+def test_failed_write_releases_the_key(tmp_path):
+    store = IdempotencyStore(
+        store=SqliteIdempotencyStore(str(tmp_path / "idempotency.sqlite"))
+    )
+
+    async def run():
+        async def failing(item):
+            raise ValueError("boom")
+
+        calls = []
+        items = [{"properties": {"n": 1}, "idempotency_key": "a"}]
+        result = await run_batch(items, failing, store, scope="db")
+        assert result["failed"] == 1
+        result = await run_batch(items, _writer(calls), store, scope="db")
+        assert result["succeeded"] == 1 and len(calls) == 1
+
+    try:
+        asyncio.run(run())
+    finally:
+        store.close()
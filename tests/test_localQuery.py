@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+
+from conftest import request_json
+
+with open(
+    os.path.join(os.path.dirname(__file__), "fixtures", "database_query.json")
+) as f:
+    FIXTURE = json.load(f)
+
+DATABASE = FIXTURE["database"]
+DB = DATABASE["id"]
+ROWS = {row["id"]: row for row in FIXTURE["rows"]}
+QUERIES = FIXTURE["queries"]
+
+
+def _serve(notion) -> None:
+    """按录制的请求体回放 API 响应，分页与游标行为与 API 一致"""
+
+    def query(request: httpx.Request):
+        body = request_json(request)
+        cursor = body.pop("start_cursor", None)
+        page_size = body.pop("page_size", 100)
+        for recorded in QUERIES:
+            if recorded["request"] == body:
+                break
+        else:
+            return httpx.Response(400, json={"object": "error", "status": 400})
+        ids = recorded["results"]
+        offset = ids.index(cursor) if cursor else 0
+        window = ids[offset : offset + page_size]
+        has_more = offset + page_size < len(ids)
+        return {
+            "object": "list",
+            "results": [ROWS[row_id] for row_id in window],
+            "has_more": has_more,
+            "next_cursor": ids[offset + page_size] if has_more else None,
+        }
+
+    notion.route("GET", f"/databases/{DB}", DATABASE)
+    notion.route("POST", f"/databases/{DB}/query", query)
+
+
+async def _settle(client) -> None:
+    while client.local_queries.stats()["building"]:
+        await asyncio.sleep(0.01)
+
+
+async def _collect(client, recorded, page_size=None):
+    request = recorded["request"]
+    ids, cursor = [], None
+    while True:
+        response = await client.query_database(
+            DB,
+            filter=request.get("filter"),
+            sorts=request.get("sorts"),
+            start_cursor=cursor,
+            page_size=page_size,
+        )
+        ids.extend(row["id"] for row in response["results"])
+        if not response["has_more"]:
+            return ids
+        cursor = response["next_cursor"]
+
+
+async def _warm(client) -> None:
+    # 达到阈值的第二次查询触发后台构建，等待快照就绪
+    for _ in range(client.local_queries.threshold):
+        await client.query_database(DB)
+    await _settle(client)
+    assert client.local_queries.get(DB) is not None
+
+
+@pytest.mark.parametrize("recorded", QUERIES, ids=[q["name"] for q in QUERIES])
+def test_local_query_matches_recorded_api(notion, recorded):
+    _serve(notion)
+
+    async def run():
+        client = notion.client(local_query_ttl=300)
+        try:
+            assert await _collect(client, recorded) == recorded["results"]
+            await _warm(client)
+            before = len(notion.calls("POST"))
+            assert await _collect(client, recorded) == recorded["results"]
+            assert len(notion.calls("POST")) == before
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 4])
+def test_local_pagination_matches_recorded_api(notion, page_size):
+    _serve(notion)
+
+    async def run():
+        client = notion.client(local_query_ttl=300)
+        try:
+            await _warm(client)
+            for recorded in QUERIES:
+                local = await _collect(client, recorded, page_size)
+                assert local == recorded["results"], recorded["name"]
+            assert client.local_queries.fallbacks == 0
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_snapshot_builds_in_background(notion):
+    _serve(notion)
+    query = notion.routes[("POST", f"/databases/{DB}/query")]
+
+    async def run():
+        release = asyncio.Event()
+
+        async def slow_query(request):
+            # 快照拉取全部行 (page_size=100) 的请求被挂起，直到测试放行
+            if request_json(request).get("page_size") == 100:
+                await release.wait()
+            return query(request)
+
+        notion.route("POST", f"/databases/{DB}/query", slow_query)
+        client = notion.client(local_query_ttl=300)
+        try:
+            await client.query_database(DB)
+            # 触发构建的查询与构建期间的查询都不等待快照，照常走 API
+            for _ in range(2):
+                response = await asyncio.wait_for(client.query_database(DB), 5)
+                assert [row["id"] for row in response["results"]] == list(ROWS)
+            assert client.local_queries.get(DB) is None
+            release.set()
+            await _settle(client)
+            assert client.local_queries.get(DB) is not None
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_oversized_database_stays_on_api(notion):
+    _serve(notion)
+
+    async def run():
+        client = notion.client(local_query_ttl=300, local_query_max_rows=len(ROWS) - 1)
+        try:
+            for _ in range(3):
+                await client.query_database(DB)
+            await _settle(client)
+            assert client.local_queries.get(DB) is None
+            assert client.local_queries.oversized == 1
+            before = len(notion.calls("POST"))
+            # 超出上限的数据库在 TTL 内不再尝试建快照
+            await client.query_database(DB)
+            await client.query_database(DB)
+            await _settle(client)
+            assert len(notion.calls("POST")) == before + 2
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_write_on_another_worker_drops_snapshot(notion, tmp_path):
+    _serve(notion)
+    row = dict(FIXTURE["rows"][0], id="99999999-9999-4999-8999-999999999999")
+    notion.route("POST", "/pages", row)
+    # 两个 worker 共享同一个二级缓存文件
+    options = dict(local_query_ttl=300, cache_path=str(tmp_path / "cache.sqlite"))
+
+    async def run():
+        writer, reader = notion.client(**options), notion.client(**options)
+        try:
+            await _warm(reader)
+            await writer.create_database_item(DB, row["properties"])
+            before = len(notion.calls("POST", f"/databases/{DB}/query"))
+            await reader.query_database(DB)
+            # 快照被丢弃：这次查询走 API，并重新开始构建
+            assert len(notion.calls("POST", f"/databases/{DB}/query")) > before
+            assert reader.local_queries.get(DB) is None
+        finally:
+            await writer.aclose()
+            await reader.aclose()
+
+    asyncio.run(run())
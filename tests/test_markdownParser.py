@@ -0,0 +1,61 @@
+from markdownParser import MAX_RICH_TEXT_ITEMS, iter_lines, parse_markdown
+
+# 每个粗体片段与其后的空格各是一个 rich text 元素
+LONG = " ".join("**b**" for _ in range(120))
+
+
+def _text(block):
+    data = block[block["type"]]
+    return "".join(item["text"]["content"] for item in data["rich_text"])
+
+
+def test_long_list_item_is_split_into_siblings():
+    blocks = parse_markdown(f"- {LONG}\n  - child")
+    assert [block["type"] for block in blocks] == ["bulleted_list_item"] * 3
+    assert all(
+        len(block["bulleted_list_item"]["rich_text"]) <= MAX_RICH_TEXT_ITEMS
+        for block in blocks
+    )
+    assert "".join(_text(block) for block in blocks) == LONG.replace("**", "")
+    # 子项挂在最后一个拆分出的块下
+    assert "children" not in blocks[0]["bulleted_list_item"]
+    assert _text(blocks[-1]["bulleted_list_item"]["children"][0]) == "child"
+
+
+def test_continuation_overflow_is_kept():
+    markdown = f"1. first\n   {LONG}\n   - child\n2. second"
+    blocks = parse_markdown(markdown)
+    texts = [_text(block) for block in blocks]
+    assert "".join(texts[:-1]) == "first " + LONG.replace("**", "")
+    assert texts[-1] == "second"
+    assert all(
+        len(block["numbered_list_item"]["rich_text"]) <= MAX_RICH_TEXT_ITEMS
+        for block in blocks
+    )
+    assert _text(blocks[-2]["numbered_list_item"]["children"][0]) == "child"
+
+
+def test_nested_long_item_stays_nested():
+    blocks = parse_markdown(f"- [ ] parent\n  - [x] {LONG}")
+    assert len(blocks) == 1
+    children = blocks[0]["to_do"]["children"]
+    assert len(children) == 3
+    assert all(child["to_do"]["checked"] for child in children)
+
+
+def test_iter_lines_matches_splitlines():
+    for text in ("", "a", "a\n", "a\n\nb", "a\r\nb\r\n", "\n\n"):
+        assert [line.rstrip("\r") for line in iter_lines(text)] == text.splitlines()
+
+
+def test_heading_keeps_trailing_hash_in_text():
+    blocks = parse_markdown("## Learn C#\n### Title ###")
+    assert [_text(block) for block in blocks] == ["Learn C#", "Title"]
+
+
+def test_spaced_asterisks_are_not_italic():
+    (block,) = parse_markdown("a * b * c and *d*")
+    rich_text = block["paragraph"]["rich_text"]
+    assert _text(block) == "a * b * c and d"
+    styled = [item["text"]["content"] for item in rich_text if "annotations" in item]
+    assert styled == ["d"]
@@ -0,0 +1,39 @@
+from markdownRenderer import convert_to_markdown
+
+
+def _text(content, **annotations):
+    return {
+        "type": "text",
+        "text": {"content": content, "link": None},
+        "plain_text": content,
+        "annotations": annotations,
+    }
+
+
+def _block(block_type, data, children=None):
+    block = {"object": "block", "type": block_type, block_type: data}
+    if children is not None:
+        block["children"] = children
+    return block
+
+
+def test_code_block_renders_plain_text_without_annotations():
+    code = _block(
+        "code",
+        {
+            "language": "python",
+            "rich_text": [
+                _text("def f():\n", bold=True),
+                _text("    return x", code=True, italic=True),
+            ],
+        },
+    )
+    markdown = convert_to_markdown({"object": "list", "results": [code]})
+    assert markdown.strip() == "```python\ndef f():\n    return x\n```"
+
+
+def test_nested_code_block_keeps_indentation():
+    code = _block("code", {"language": "", "rich_text": [_text("a\nb")]})
+    toggle = _block("toggle", {"rich_text": [_text("t")]}, [code])
+    markdown = convert_to_markdown({"object": "list", "results": [toggle]})
+    assert "```\n  a\n  b\n  ```" in markdown
@@ -0,0 +1,62 @@
+import asyncio
+
+from metrics import Metrics, labeled_stats_collector, stats_collector
+from notionClient import CLIENT_STATS
+from sqliteRateLimit import bucket_key
+from tenantPool import TenantPool
+
+
+def test_stats_collector_output_is_unchanged():
+    metrics = Metrics()
+    metrics.add_collector(
+        stats_collector("demo", lambda: {"hits": 3, "ratio": 0.5}, counters=("hits",))
+    )
+    rendered = metrics.render()
+    assert "# TYPE demo_hits_total counter\ndemo_hits_total 3\n" in rendered
+    assert "# TYPE demo_ratio gauge\ndemo_ratio 0.5\n" in rendered
+
+
+def test_labeled_stats_share_one_metric_family():
+    metrics = Metrics()
+    metrics.add_collector(
+        labeled_stats_collector(
+            "demo",
+            lambda: {"a": {"hits": 1}, "b": {"hits": 2}, "c": None},
+            "tenant",
+            counters=("hits",),
+        )
+    )
+    rendered = metrics.render()
+    assert rendered.count("# TYPE demo_hits_total counter") == 1
+    assert 'demo_hits_total{tenant="a"} 1' in rendered
+    assert 'demo_hits_total{tenant="b"} 2' in rendered
+
+
+def test_tenant_client_stats_are_exported(notion):
+    notion.route("GET", "/users/me", {"object": "user", "id": "bot"})
+    metrics = Metrics()
+
+    async def run():
+        pool = TenantPool(lambda token, key: notion.client(metrics=metrics))
+        for prefix, (stats, counters) in CLIENT_STATS.items():
+            metrics.add_collector(
+                labeled_stats_collector(
+                    prefix,
+                    lambda stats=stats: pool.client_stats(stats),
+                    "tenant",
+                    counters,
+                )
+            )
+        try:
+            for token in ("token-a", "token-b", "token-a"):
+                async with pool.acquire(token) as client:
+                    await client.retrieve_bot_user()
+            a, b = bucket_key("token-a")[:12], bucket_key("token-b")[:12]
+            rendered = metrics.render()
+            assert f'notion_pool_requests_total{{tenant="{a}"}} 2' in rendered
+            assert f'notion_pool_requests_total{{tenant="{b}"}} 1' in rendered
+            assert f'notion_cache_hits_total{{tenant="{a}"}}' in rendered
+        finally:
+            await pool.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,28 @@
+import os
+import stat
+
+import pytest
+
+from notionMcpServer import _prepare_state_dir, load_config
+
+
+def test_state_dir_is_created_private(tmp_path):
+    path = str(tmp_path / "state")
+    _prepare_state_dir(path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o700
+
+
+def test_state_dir_readable_by_others_is_refused(tmp_path):
+    path = tmp_path / "state"
+    path.mkdir(mode=0o755)
+    os.chmod(path, 0o755)
+    with pytest.raises(ValueError, match="accessible by other users"):
+        _prepare_state_dir(str(path))
+
+
+def test_workers_require_explicit_state_dir(monkeypatch):
+    monkeypatch.setenv("NOTION_API_TOKEN", "secret_test")
+    monkeypatch.setenv("NOTION_WORKERS", "2")
+    monkeypatch.delenv("NOTION_SHARED_STATE_DIR", raising=False)
+    with pytest.raises(RuntimeError, match="NOTION_SHARED_STATE_DIR"):
+        load_config()
@@ -0,0 +1,187 @@
+import asyncio
+import sqlite3
+import time
+
+import httpx
+import pytest
+
+from rateLimiter import RequestScheduler, RetryPolicy, SharedTokenBucket
+from sqliteRateLimit import SqliteRateLimitStore
+
+
+def test_shared_bucket_does_not_block_the_event_loop(tmp_path):
+    path = str(tmp_path / "ratelimit.sqlite")
+    store = SqliteRateLimitStore(path)
+    # 另一个 worker 持有写锁：取令牌要等到锁释放
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    async def run():
+        bucket = SharedTokenBucket(store, "key", rate=100)
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        acquire = asyncio.ensure_future(bucket.acquire())
+        asyncio.get_running_loop().call_later(0.3, other.execute, "COMMIT")
+        started = time.monotonic()
+        await asyncio.wait_for(acquire, 5)
+        ticker.cancel()
+        assert time.monotonic() - started >= 0.25
+        # 等待锁期间事件循环照常运行
+        assert ticks >= 10
+
+    try:
+        asyncio.run(run())
+    finally:
+        other.close()
+        store.close()
+
+
+def test_shared_bucket_serves_waiters_in_priority_order(tmp_path):
+    store = SqliteRateLimitStore(str(tmp_path / "ratelimit.sqlite"))
+
+    async def run():
+        bucket = SharedTokenBucket(store, "key", rate=50, capacity=1)
+        order = []
+
+        async def wait(priority, name):
+            await bucket.acquire(priority)
+            order.append(name)
+
+        await bucket.acquire()  # 取走唯一的令牌，后续等待者排队
+        await asyncio.gather(wait(2, "bulk"), wait(0, "interactive"), wait(1, "normal"))
+        assert order == ["interactive", "normal", "bulk"]
+
+    try:
+        asyncio.run(run())
+    finally:
+        store.close()
+
+
+def test_pause_is_applied_locally_and_shared(tmp_path):
+    path = str(tmp_path / "ratelimit.sqlite")
+    store = SqliteRateLimitStore(path)
+    other = SqliteRateLimitStore(path)
+
+    async def run():
+        bucket = SharedTokenBucket(store, "key", rate=100)
+        bucket.pause(5)
+        # 本进程立即退让
+        try:
+            await asyncio.wait_for(bucket.acquire(), 0.1)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError("acquired a token while paused")
+        # 其他 worker 读到同一个暂停 (写入在后台线程中完成)
+        for _ in range(100):
+            wait = other.take("key", 100, 100)
+            if wait > 1:
+                break
+            await asyncio.sleep(0.01)
+        assert wait > 1
+
+    try:
+        asyncio.run(run())
+    finally:
+        store.close()
+        other.close()
+
+
+PAGE_A = "11111111-1111-4111-8111-111111111111"
+PAGE_B = "22222222-2222-4222-8222-222222222222"
+
+RATE_LIMITED = {"object": "error", "status": 429, "code": "rate_limited"}
+
+
+def _scheduler(max_retries: int) -> RequestScheduler:
+    return RequestScheduler(1000, retry_policy=RetryPolicy(max_retries, 0.01, 0.05))
+
+
+def _page(page_id: str) -> dict:
+    return {"object": "page", "id": page_id}
+
+
+def test_scheduler_retries_rate_limited_requests(notion):
+    responses = [httpx.Response(429, json=RATE_LIMITED)] * 2 + [_page(PAGE_A)]
+    notion.route("GET", f"/pages/{PAGE_A}", lambda request: responses.pop(0))
+
+    async def run():
+        scheduler = _scheduler(max_retries=3)
+        client = notion.client(scheduler=scheduler)
+        try:
+            assert (await client.retrieve_page(PAGE_A))["id"] == PAGE_A
+        finally:
+            await client.aclose()
+        assert len(notion.calls("GET", f"/pages/{PAGE_A}")) == 3
+        assert scheduler.stats()["retries"] == 2
+        assert scheduler.stats()["rate_limited"] == 2
+
+    asyncio.run(run())
+
+
+def test_scheduler_honours_retry_after_for_all_requests(notion):
+    sent = {}
+    limited = asyncio.Event()
+    responses = [httpx.Response(429, json=RATE_LIMITED, headers={"Retry-After": "0.3"})]
+
+    def page(page_id):
+        def handler(request):
+            sent.setdefault(page_id, []).append(time.monotonic())
+            if page_id == PAGE_A and responses:
+                limited.set()
+                return responses.pop()
+            return _page(page_id)
+
+        return handler
+
+    notion.route("GET", f"/pages/{PAGE_A}", page(PAGE_A))
+    notion.route("GET", f"/pages/{PAGE_B}", page(PAGE_B))
+
+    async def run():
+        scheduler = _scheduler(max_retries=3)
+        client = notion.client(scheduler=scheduler)
+        try:
+            first = asyncio.ensure_future(client.retrieve_page(PAGE_A))
+            await limited.wait()
+            await asyncio.sleep(0.01)
+            # 429 之后发起的其他请求同样等到 Retry-After 结束
+            await client.retrieve_page(PAGE_B)
+            await first
+        finally:
+            await client.aclose()
+        assert scheduler.stats()["retries"] == 1
+        assert scheduler.stats()["rate_limited"] == 1
+        limited_at = sent[PAGE_A][0]
+        assert sent[PAGE_A][1] - limited_at >= 0.3
+        assert sent[PAGE_B][0] - limited_at >= 0.3
+
+    asyncio.run(run())
+
+
+def test_scheduler_gives_up_after_retry_limit(notion):
+    notion.route(
+        "GET",
+        f"/pages/{PAGE_A}",
+        lambda request: httpx.Response(429, json=RATE_LIMITED),
+    )
+
+    async def run():
+        scheduler = _scheduler(max_retries=2)
+        client = notion.client(scheduler=scheduler)
+        try:
+            with pytest.raises(httpx.HTTPStatusError) as error:
+                await client.retrieve_page(PAGE_A)
+        finally:
+            await client.aclose()
+        assert error.value.response.status_code == 429
+        assert len(notion.calls("GET", f"/pages/{PAGE_A}")) == 3
+        assert scheduler.stats()["retries"] == 2
+
+    asyncio.run(run())
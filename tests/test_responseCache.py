@@ -0,0 +1,153 @@
+import asyncio
+import sqlite3
+import time
+
+from sqliteCache import SqliteCacheStore
+
+PAGE_ID = "55555555-5555-4555-8555-555555555555"
+
+
+def _page(edited: str) -> dict:
+    return {"object": "page", "id": PAGE_ID, "last_edited_time": edited}
+
+
+def _workspace(notion, page: dict) -> None:
+    notion.route("GET", f"/pages/{PAGE_ID}", lambda request: page)
+    notion.route(
+        "GET",
+        f"/blocks/{PAGE_ID}/children",
+        {"object": "list", "results": [], "has_more": False, "next_cursor": None},
+    )
+
+
+def test_expired_children_are_restored_after_restart(notion, tmp_path):
+    page = _page("2024-01-01T00:00:00.000Z")
+    _workspace(notion, page)
+    # 子块列表在内存中立即过期，只能从二级存储中重新验证后取回
+    options = dict(
+        cache_path=str(tmp_path / "cache.sqlite"), cache_ttls={"children": 0}
+    )
+
+    async def run():
+        client = notion.client(**options)
+        await client.retrieve_page(PAGE_ID)
+        await client.retrieve_block_children(PAGE_ID)
+        await client.aclose()
+
+        client = notion.client(**options)
+        try:
+            await client.retrieve_block_children(PAGE_ID)
+            assert len(notion.calls("GET", f"/blocks/{PAGE_ID}/children")) == 1
+            assert client.revalidation_stats["restored"] == 1
+
+            # 页面被编辑过：重新拉取子块列表
+            page["last_edited_time"] = "2024-01-02T00:00:00.000Z"
+            await client.retrieve_block_children(PAGE_ID)
+            assert len(notion.calls("GET", f"/blocks/{PAGE_ID}/children")) == 2
+            assert client.revalidation_stats["changed"] == 1
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_children_without_page_stamp_are_refetched(notion, tmp_path):
+    _workspace(notion, _page("2024-01-01T00:00:00.000Z"))
+    options = dict(
+        cache_path=str(tmp_path / "cache.sqlite"), cache_ttls={"children": 0}
+    )
+
+    async def run():
+        client = notion.client(**options)
+        try:
+            # 拉取子块列表时不知道所在页面的时间戳，过期后无法重新验证
+            await client.retrieve_block_children(PAGE_ID)
+            await client.retrieve_block_children(PAGE_ID)
+            assert len(notion.calls("GET", f"/blocks/{PAGE_ID}/children")) == 2
+            assert not notion.calls("GET", f"/pages/{PAGE_ID}")
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def _block(block_type: str) -> dict:
+    return {
+        "object": "block",
+        "id": PAGE_ID,
+        "type": block_type,
+        "has_children": True,
+        "last_edited_time": "2024-01-01T00:00:00.000Z",
+    }
+
+
+def test_revalidate_reuses_unchanged_page(notion):
+    _workspace(notion, _page("2024-01-01T00:00:00.000Z"))
+    notion.route("GET", f"/blocks/{PAGE_ID}", _block("child_page"))
+
+    async def run():
+        client = notion.client()
+        try:
+            for _ in range(2):
+                await client.retrieve_block_children(PAGE_ID, revalidate=True)
+            assert len(notion.calls("GET", f"/blocks/{PAGE_ID}/children")) == 1
+            assert client.revalidation_stats["unchanged"] == 1
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_revalidate_fetches_non_page_blocks_in_full(notion):
+    _workspace(notion, _page("2024-01-01T00:00:00.000Z"))
+    notion.route("GET", f"/blocks/{PAGE_ID}", _block("toggle"))
+
+    async def run():
+        client = notion.client()
+        try:
+            for _ in range(2):
+                await client.retrieve_block_children(PAGE_ID, revalidate=True)
+            # 普通块的时间戳不反映嵌套编辑：每次都完整获取，块类型只查询一次
+            assert len(notion.calls("GET", f"/blocks/{PAGE_ID}/children")) == 2
+            assert len(notion.calls("GET", f"/blocks/{PAGE_ID}")) == 1
+            assert client.revalidation_stats["not_page"] == 2
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_locked_store_does_not_block_event_loop(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    store = SqliteCacheStore(path)
+    key = ("page", PAGE_ID, "")
+    store.set(key, b"old", 60)
+    # 另一个 worker 持有写锁
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    async def run():
+        started = time.monotonic()
+        # WAL 模式下读取不被写锁阻塞
+        assert store.get(key)[0] == b"old"
+        store.set(("page", "other", ""), b"new", 60)
+        store.invalidate("page", PAGE_ID)
+        # 失效尚未写入：本进程不再读取旧条目
+        assert store.get(key) is None
+        assert time.monotonic() - started < 1
+        assert store.stats()["pending"] == 1
+        assert store.busy == 2
+
+        other.execute("COMMIT")
+        while store.stats()["pending"]:
+            await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(run())
+        assert other.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] == 0
+        assert other.execute(
+            "SELECT kind, resource_id FROM cache_invalidations"
+        ).fetchall() == [("page", PAGE_ID)]
+    finally:
+        other.close()
+        store.close()
@@ -0,0 +1,91 @@
+import asyncio
+
+from syncEngine import SyncEngine
+
+PAGE_ID = "11111111-1111-4111-8111-111111111111"
+EDITED = "2024-01-01T00:00:00.000Z"
+
+
+def _paragraph(index: int) -> dict:
+    return {
+        "object": "block",
+        "id": f"22222222-2222-4222-8222-{index:012d}",
+        "type": "paragraph",
+        "has_children": False,
+        "last_edited_time": EDITED,
+        "paragraph": {"rich_text": []},
+    }
+
+
+def _workspace(notion) -> None:
+    page = {
+        "object": "page",
+        "id": PAGE_ID,
+        "last_edited_time": EDITED,
+        "properties": {},
+    }
+    notion.route(
+        "POST",
+        "/search",
+        {"object": "list", "results": [page], "has_more": False, "next_cursor": None},
+    )
+    notion.route(
+        "GET",
+        f"/blocks/{PAGE_ID}",
+        {
+            "object": "block",
+            "id": PAGE_ID,
+            "type": "child_page",
+            "has_children": True,
+            "last_edited_time": EDITED,
+        },
+    )
+    notion.route(
+        "GET",
+        f"/blocks/{PAGE_ID}/children",
+        {
+            "object": "list",
+            "results": [_paragraph(i) for i in range(3)],
+            "has_more": False,
+            "next_cursor": None,
+        },
+    )
+
+
+def test_synced_page_is_served_without_api_calls(notion):
+    _workspace(notion)
+
+    async def run():
+        client = notion.client()
+        engine = SyncEngine(client, budget_share=1.0)
+        try:
+            assert await engine.sync_once() == 1
+            synced_requests = len(notion.requests)
+
+            # 工具的默认调用 (不带 page_size) 命中同步写入的缓存
+            children = await client.retrieve_block_children(PAGE_ID)
+            page = await client.retrieve_page(PAGE_ID)
+            assert len(children["results"]) == 3
+            assert page["id"] == PAGE_ID
+            assert len(notion.requests) == synced_requests
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_unchanged_workspace_is_not_refetched(notion):
+    _workspace(notion)
+
+    async def run():
+        client = notion.client()
+        engine = SyncEngine(client, budget_share=1.0)
+        try:
+            await engine.sync_once()
+            before = len(notion.calls("GET"))
+            assert await engine.sync_once() == 0
+            assert len(notion.calls("GET")) == before
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from tenantPool import TenantPool, check_tenants, resolve_token
+
+
+class _Client:
+    def __init__(self, token: str):
+        self.token = token
+        self.closed = False
+
+    async def aclose(self) -> None:
+        # 关闭需要时间：期间其他 acquire 可以插入新客户端
+        await asyncio.sleep(0.01)
+        self.closed = True
+
+
+def test_new_client_is_not_closed_by_a_concurrent_eviction():
+    async def run():
+        pool = TenantPool(lambda token, key: _Client(token), max_tenants=1)
+        seen = []
+
+        async def use(token):
+            async with pool.acquire(token) as client:
+                seen.append(client)
+                assert not client.closed
+                await asyncio.sleep(0.02)
+                assert not client.closed
+
+        async with pool.acquire("t0"):
+            pass
+        await asyncio.gather(*(use(f"t{i}") for i in range(1, 4)))
+        await pool.aclose()
+        assert all(client.closed for client in seen)
+        assert not pool.stats()["in_use"]
+
+    asyncio.run(run())
+
+
+TENANTS = {"acme": {"token": "secret_acme", "secret": "s3cret"}}
+
+
+def test_tenant_header_requires_secret():
+    headers = {"x-notion-tenant": "acme", "authorization": "Bearer s3cret"}
+    assert resolve_token(headers, TENANTS) == "secret_acme"
+    for authorization in ("", "Bearer wrong", "Basic s3cret"):
+        headers = {"x-notion-tenant": "acme", "authorization": authorization}
+        with pytest.raises(ValueError, match="Invalid credentials"):
+            resolve_token(headers, TENANTS, default="secret_default")
+    headers = {"x-notion-tenant": "other", "authorization": "Bearer s3cret"}
+    with pytest.raises(ValueError, match="Invalid credentials"):
+        resolve_token(headers, TENANTS)
+
+
+def test_default_token_is_opt_in():
+    with pytest.raises(ValueError, match="Missing Notion token"):
+        resolve_token({}, TENANTS)
+    assert resolve_token({}, TENANTS, default="secret_default") == "secret_default"
+    bearer = {"authorization": "Bearer secret_own"}
+    assert resolve_token(bearer, TENANTS) == "secret_own"
+
+
+def test_tenant_without_secret_is_refused():
+    with pytest.raises(ValueError, match="no secret"):
+        check_tenants({"acme": {"token": "secret_acme"}})
+    with pytest.raises(ValueError, match="no Notion token"):
+        check_tenants({"acme": "secret_acme"})
@@ -0,0 +1,157 @@
+# toolRegistry.py
+#
+# 工具注册表：工具名 -> (处理函数, 预编译的参数校验器, 调度优先级)。
+# 在创建应用时构建一次，调用工具时按名字 O(1) 查找；list_tools 的结果也只计算一次。
+# 参数校验器由 schemas.py 中各工具的 inputSchema 编译而来，支持 JSON Schema 的
+# type / enum / required / properties / items 子集。
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from mcp.types import Tool
+
+from rateLimiter import PRIORITY_NORMAL
+
+Arguments = Dict[str, Any]
+Handler = Callable[[Arguments], Awaitable[Any]]
+# 校验并返回参数值 (数字字符串会被转换为数字)；不合法时抛出 ValueError
+Validator = Callable[[Any, str], Any]
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda value: isinstance(value, str),
+    "boolean": lambda value: isinstance(value, bool),
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "null": lambda value: value is None,
+    "number": lambda value: isinstance(value, (int, float))
+    and not isinstance(value, bool),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+}
+
+
+def _is_missing(value: Any) -> bool:
+    # 与原先的检查一致：必填参数为 None、空字符串、空数组或空对象都视为缺失
+    return value is None or (isinstance(value, (str, list, dict)) and not value)
+
+
+def _coerce_number(value: Any, types: Tuple[str, ...]) -> Any:
+    """客户端常把数字作为字符串传入，按 schema 转换"""
+    if not isinstance(value, str) or not ({"number", "integer"} & set(types)):
+        return value
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() else number
+
+
+def _label(path: str) -> str:
+    return path or "arguments"
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """把一个 JSON Schema 编译为校验函数，返回的函数不再解析 schema"""
+    declared = schema.get("type")
+    types: Tuple[str, ...] = (
+        tuple(declared)
+        if isinstance(declared, list)
+        else (declared,) if declared else ()
+    )
+    checks = [_TYPE_CHECKS[name] for name in types if name in _TYPE_CHECKS]
+    enum = tuple(schema["enum"]) if "enum" in schema else None
+    required = tuple(schema.get("required", ()))
+    properties = {
+        name: compile_schema(subschema)
+        for name, subschema in (schema.get("properties") or {}).items()
+    }
+    items = compile_schema(schema["items"]) if "items" in schema else None
+
+    def validate(value: Any, path: str) -> Any:
+        value = _coerce_number(value, types)
+        if checks and not any(check(value) for check in checks):
+            raise ValueError(
+                f"Invalid argument {_label(path)}: expected {' or '.join(types)}"
+            )
+        if enum is not None and value not in enum:
+            raise ValueError(
+                f"Invalid argument {_label(path)}: expected one of "
+                f"{', '.join(map(str, enum))}"
+            )
+        if isinstance(value, dict) and (required or properties):
+            prefix = f"{path}." if path else ""
+            for name in required:
+                if _is_missing(value.get(name)):
+                    raise ValueError(f"Missing required argument: {prefix}{name}")
+            coerced = None
+            for name, check in properties.items():
+                item = value.get(name)
+                if item is None:
+                    continue
+                checked = check(item, prefix + name)
+                if checked is not item:
+                    coerced = coerced or dict(value)
+                    coerced[name] = checked
+            return coerced or value
+        if isinstance(value, list) and items is not None:
+            checked_items = [
+                items(item, f"{path}[{i}]") for i, item in enumerate(value)
+            ]
+            if any(new is not old for new, old in zip(checked_items, value)):
+                return checked_items
+        return value
+
+    return validate
+
+
+class RegisteredTool:
+    __slots__ = ("tool", "handler", "validate", "priority")
+
+    def __init__(self, tool: Tool, handler: Handler, priority: int):
+        self.tool = tool
+        self.handler = handler
+        self.validate = compile_schema(tool.inputSchema)
+        self.priority = priority
+
+    async def __call__(self, arguments: Optional[Arguments]) -> Any:
+        return await self.handler(self.validate(arguments or {}, ""))
+
+
+class ToolRegistry:
+    def __init__(self, enabled: Optional[Iterable[str]] = None):
+        self.enabled = set(enabled) if enabled is not None else None
+        self._tools: Dict[str, RegisteredTool] = {}
+        self._listed: Optional[List[Tool]] = None
+
+    def register(
+        self, tool: Tool, priority: int = PRIORITY_NORMAL
+    ) -> Callable[[Handler], Handler]:
+        """装饰器：@registry.register(schemas.xxx_tool, PRIORITY_INTERACTIVE)"""
+
+        def decorator(handler: Handler) -> Handler:
+            if tool.name in self._tools:
+                raise ValueError(f"Tool already registered: {tool.name}")
+            self._tools[tool.name] = RegisteredTool(tool, handler, priority)
+            self._listed = None
+            return handler
+
+        return decorator
+
+    def get(self, name: str) -> RegisteredTool:
+        if name not in self:
+            raise ValueError(f"Unknown tool: {name}")
+        return self._tools[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools and (self.enabled is None or name in self.enabled)
+
+    def list_tools(self) -> List[Tool]:
+        """已启用的工具定义，按注册顺序；结果缓存"""
+        if self._listed is None:
+            self._listed = [
+                registered.tool
+                for name, registered in self._tools.items()
+                if self.enabled is None or name in self.enabled
+            ]
+        return self._listed
+
+    def names(self) -> List[str]:
+        return list(self._tools)